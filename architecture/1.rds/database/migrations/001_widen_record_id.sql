@@ -0,0 +1,16 @@
+-- record_id was a SMALLINT identity, which runs out after 32,767 recordings (under half a
+-- day at 55 plants a minute). The primary key is rebuilt as non-clustered so the table can
+-- be clustered on time instead.
+DECLARE @pk_name NVARCHAR(128) = (
+    SELECT name FROM sys.key_constraints
+    WHERE type = 'PK' AND parent_object_id = OBJECT_ID('record')
+);
+IF @pk_name IS NOT NULL
+    EXEC('ALTER TABLE record DROP CONSTRAINT ' + QUOTENAME(@pk_name));
+GO
+
+ALTER TABLE record ALTER COLUMN record_id BIGINT NOT NULL;
+GO
+
+ALTER TABLE record ADD CONSTRAINT pk_record PRIMARY KEY NONCLUSTERED (record_id);
+GO
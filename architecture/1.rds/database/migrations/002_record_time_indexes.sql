@@ -0,0 +1,8 @@
+-- Recordings are inserted in time order and read by time range (the archive query and the
+-- dashboard), so the table is clustered on the recording time. The record_id makes the key
+-- unique and keeps inserts appending to the end of the index.
+CREATE CLUSTERED INDEX ix_record_timestamp ON record (record_timestamp, record_id);
+GO
+
+CREATE NONCLUSTERED INDEX ix_record_plant_id ON record (plant_id) INCLUDE (record_timestamp);
+GO
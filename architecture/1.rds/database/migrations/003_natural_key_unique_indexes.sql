@@ -0,0 +1,11 @@
+-- Unique indexes on the natural keys matched by the loader's MERGE statements and key
+-- cache. Continent, country and city names already have unique constraints.
+CREATE UNIQUE NONCLUSTERED INDEX ux_plant_plant_number ON plant (plant_number);
+GO
+
+CREATE UNIQUE NONCLUSTERED INDEX ux_plant_type_name ON plant_type (plant_type_name);
+GO
+
+CREATE UNIQUE NONCLUSTERED INDEX ux_botanist_natural_key
+    ON botanist (botanist_name, botanist_email, botanist_phone);
+GO
@@ -0,0 +1,11 @@
+-- The loader only updates plant_last_watered when it changes, and keeps each change here
+-- so the watering history isn't lost on overwrite. Keyed on the plant and time, so a
+-- replayed batch adds nothing.
+CREATE TABLE watering_event(
+    plant_id SMALLINT NOT NULL,
+    watered_at DATETIME NOT NULL,
+    CONSTRAINT pk_watering_event PRIMARY KEY (plant_id, watered_at),
+    CONSTRAINT fk_watering_event_plant FOREIGN KEY (plant_id) 
+        REFERENCES plant (plant_id)
+);
+GO
@@ -0,0 +1,140 @@
+'''
+    Benchmark of the queries the pipelines and dashboard run against the record and plant
+    tables, before and after the pending migrations. For each query the estimated plan is
+    printed, and the median run time is compared. Run it against a copy of the RDS: it
+    applies the migrations, and with --populate it inserts synthetic recordings.
+
+    Usage: python3 benchmark_migrations.py --populate 30000 --runs 5
+'''
+
+import argparse
+from datetime import datetime, timedelta
+import random
+import statistics
+import time
+from migrate import MigrationRunner, make_connection
+
+
+QUERIES = {
+    'archive': '''
+        SELECT record_id, record_soil_moisture, record_temperature, record_timestamp, plant_id
+        FROM record
+        WHERE record_timestamp < DATEADD(hour, -24, GETDATE());
+    ''',
+    'dashboard': '''
+        SELECT p.plant_number, r.record_soil_moisture, r.record_temperature,
+               r.record_timestamp
+        FROM record AS r
+        JOIN plant AS p ON p.plant_id = r.plant_id
+        WHERE r.record_timestamp >= DATEADD(hour, -1, GETDATE());
+    ''',
+    'plant_history': '''
+        SELECT record_timestamp FROM record
+        WHERE plant_id = (SELECT plant_id FROM plant WHERE plant_number = 1);
+    ''',
+    'plant_lookup': 'SELECT plant_id FROM plant WHERE plant_number = 1;',
+}
+INSERT_RECORDING = '''
+    INSERT INTO record (record_soil_moisture, record_temperature, record_timestamp, plant_id)
+    VALUES (%s, %s, %s, %s);
+'''
+
+
+def populate(connection, count: int, hours: int = 48, seed: int = 0) -> None:
+    '''Insert synthetic recordings for the existing plants, spread evenly over the last
+    hours, in time order like the pipeline inserts them.'''
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT plant_id FROM plant;')
+        plant_ids = [row[0] for row in cursor.fetchall()]
+        if not plant_ids:
+            raise ValueError('The plant table must have rows to populate recordings.')
+        rng = random.Random(seed)
+        start = datetime.now() - timedelta(hours=hours)
+        step = timedelta(hours=hours) / count
+        rows = [(rng.uniform(0, 100), rng.uniform(5, 30), start + step * i,
+                 plant_ids[i % len(plant_ids)]) for i in range(count)]
+        cursor.executemany(INSERT_RECORDING, rows)
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def get_plan(connection, query: str) -> list[str]:
+    '''Return the lines of the estimated plan for a query, without running it.'''
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SET SHOWPLAN_TEXT ON;')
+        cursor.execute(query)
+        lines = []
+        while True:
+            lines += [row[0] for row in cursor.fetchall()]
+            if not cursor.nextset():
+                break
+        return lines[1:]
+    finally:
+        cursor.execute('SET SHOWPLAN_TEXT OFF;')
+        cursor.close()
+
+
+def time_query(connection, query: str, runs: int) -> float:
+    '''Return the median time taken to run a query and fetch its rows.'''
+    cursor = connection.cursor()
+    run_times = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            cursor.execute(query)
+            cursor.fetchall()
+            run_times.append(time.perf_counter() - start)
+    finally:
+        cursor.close()
+    return statistics.median(run_times)
+
+
+def benchmark(connection, runs: int) -> dict:
+    '''Print the plan of every query, and return their median run times.'''
+    timings = {}
+    for name, query in QUERIES.items():
+        print(f"-- {name}")
+        for line in get_plan(connection, query):
+            print(line.rstrip())
+        timings[name] = time_query(connection, query, runs)
+    return timings
+
+
+def print_comparison(before: dict, after: dict) -> None:
+    '''Print the median run times before and after the migrations as a table.'''
+    print(f"{'query':<16}{'before (ms)':>14}{'after (ms)':>14}{'speed-up':>10}")
+    for name in QUERIES:
+        speed_up = before[name] / after[name] if after[name] else float('inf')
+        print(f"{name:<16}{before[name] * 1000:>14.1f}{after[name] * 1000:>14.1f}"
+              f"{speed_up:>9.1f}x")
+
+
+def parse_inputs() -> argparse.Namespace:
+    '''Parse the benchmark settings from the command line.'''
+    parser = argparse.ArgumentParser(description='Benchmark the record queries before and '
+                                                 'after the pending migrations.')
+    parser.add_argument('--populate', type=int, default=0,
+                        help='number of synthetic recordings to insert first (at most 32,767 '
+                             'fit before the record ids are widened)')
+    parser.add_argument('--runs', type=int, default=5, help='number of runs per query')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_inputs()
+    conn = make_connection()
+    try:
+        if args.populate:
+            populate(conn, args.populate)
+        print('Before migrating:')
+        before_timings = benchmark(conn, args.runs)
+        applied = MigrationRunner(conn).migrate()
+        print(f"Applied: {', '.join(applied) if applied else 'none'}")
+        print('After migrating:')
+        after_timings = benchmark(conn, args.runs)
+    finally:
+        conn.close()
+    print_comparison(before_timings, after_timings)
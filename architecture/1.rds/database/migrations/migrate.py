@@ -0,0 +1,136 @@
+'''
+    Versioned schema migrations for the RDS. Each migration is a numbered .sql file in this
+    directory, split into batches on GO lines as sqlcmd does. Applied versions are recorded
+    in a schema_migrations table, so each migration runs once, in order, in its own
+    transaction.
+
+    Usage: python3 migrate.py [--dry-run] [--target 002]
+'''
+
+import argparse
+from os import environ as ENV
+import os
+import re
+
+
+MIGRATIONS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_\w+\.sql$')
+GO_PATTERN = re.compile(r'^\s*GO\s*;?\s*$', re.IGNORECASE | re.MULTILINE)
+
+
+def split_batches(migration_sql: str) -> list[str]:
+    '''Split a migration into the batches separated by GO lines, dropping empty batches.'''
+    return [batch.strip() for batch in GO_PATTERN.split(migration_sql) if batch.strip()]
+
+
+def get_migrations(directory: str = MIGRATIONS_DIRECTORY) -> list[tuple[str, str]]:
+    '''Return the (version, path) of every migration in the directory, in version order.
+    The version is the file name without its extension, e.g. 001_widen_record_id.'''
+    migrations = []
+    for name in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(name)
+        if match:
+            migrations.append((int(match.group(1)), name[:-len('.sql')],
+                               os.path.join(directory, name)))
+    numbers = [number for number, _, _ in migrations]
+    if len(numbers) != len(set(numbers)):
+        raise ValueError('Two migrations have the same number.')
+    return [(version, path) for _, version, path in sorted(migrations)]
+
+
+class MigrationRunner:
+    '''Class which applies the pending migrations to a database connection.'''
+
+    CREATE_MIGRATIONS_TABLE = '''
+        IF OBJECT_ID('schema_migrations') IS NULL
+            CREATE TABLE schema_migrations (
+                version VARCHAR(100) PRIMARY KEY,
+                applied_at DATETIME NOT NULL DEFAULT GETDATE()
+            );
+    '''
+    GET_APPLIED_VERSIONS = 'SELECT version FROM schema_migrations;'
+    RECORD_VERSION = 'INSERT INTO schema_migrations (version) VALUES (%s);'
+
+    def __init__(self, connection, directory: str = MIGRATIONS_DIRECTORY):
+        '''The connection is any DB-API connection to SQL Server, such as from pymssql.'''
+        self.connection = connection
+        self.directory = directory
+
+    def get_applied_versions(self) -> set[str]:
+        '''Create the migrations table if needed, and return the versions it records.'''
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(self.CREATE_MIGRATIONS_TABLE)
+            self.connection.commit()
+            cursor.execute(self.GET_APPLIED_VERSIONS)
+            return {row[0] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def get_pending(self, target: str = None) -> list[tuple[str, str]]:
+        '''Return the migrations not yet applied, up to and including the target number.'''
+        applied = self.get_applied_versions()
+        return [(version, path) for version, path in get_migrations(self.directory)
+                if version not in applied
+                and (target is None or int(version.split('_')[0]) <= int(target))]
+
+    def apply(self, version: str, path: str) -> None:
+        '''Apply one migration and record it, in a single transaction. On failure the
+        migration is rolled back and the error raised.'''
+        with open(path, 'r', encoding='utf-8') as file:
+            batches = split_batches(file.read())
+        cursor = self.connection.cursor()
+        try:
+            for batch in batches:
+                cursor.execute(batch)
+            cursor.execute(self.RECORD_VERSION, (version,))
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def migrate(self, target: str = None, dry_run: bool = False) -> list[str]:
+        '''Apply every pending migration in order, stopping at the first failure. Returns
+        the versions applied, or which would be applied in a dry run.'''
+        applied = []
+        for version, path in self.get_pending(target):
+            if not dry_run:
+                self.apply(version, path)
+            applied.append(version)
+        return applied
+
+
+def make_connection():
+    '''Get a new connection to the RDS, using credentials from the .env file.'''
+    from dotenv import load_dotenv
+    import pymssql
+    load_dotenv()
+    return pymssql.connect(
+        server=ENV['DB_HOST'],
+        user=ENV['DB_USERNAME'],
+        password=ENV['DB_PASSWORD'],
+        database=ENV['DB_NAME'],
+        port=ENV['DB_PORT']
+    )
+
+
+def parse_inputs() -> argparse.Namespace:
+    '''Parse the migration settings from the command line.'''
+    parser = argparse.ArgumentParser(description='Apply pending schema migrations.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='list the pending migrations without applying them')
+    parser.add_argument('--target', help='number of the last migration to apply')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_inputs()
+    conn = make_connection()
+    try:
+        versions = MigrationRunner(conn).migrate(target=args.target, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    action = 'Pending' if args.dry_run else 'Applied'
+    print(f"{action}: {', '.join(versions) if versions else 'none'}")
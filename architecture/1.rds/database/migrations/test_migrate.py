@@ -0,0 +1,99 @@
+import pytest
+from unittest.mock import MagicMock
+from migrate import split_batches, get_migrations, MigrationRunner
+
+
+@pytest.fixture
+def migrations_directory(tmp_path):
+    (tmp_path / '002_second.sql').write_text('SELECT 2;\nGO\n')
+    (tmp_path / '001_first.sql').write_text('SELECT 1;\nGO\nSELECT 11;\ngo;\n')
+    (tmp_path / '010_tenth.sql').write_text('SELECT 10;')
+    (tmp_path / 'notes.txt').write_text('not a migration')
+    return tmp_path
+
+
+@pytest.fixture
+def mock_connection():
+    connection = MagicMock()
+    connection.cursor.return_value.fetchall.return_value = [('001_first',)]
+    return connection
+
+
+def test_split_batches():
+    assert split_batches('SELECT 1;\nGO\n\nGO\nSELECT 2;\n  go ;\n') == ['SELECT 1;', 'SELECT 2;']
+
+
+def test_split_batches_ignores_go_within_lines():
+    assert split_batches('SELECT 1 AS GO;') == ['SELECT 1 AS GO;']
+
+
+def test_get_migrations_sorted_by_number(migrations_directory):
+    migrations = get_migrations(str(migrations_directory))
+    assert [version for version, _ in migrations] == ['001_first', '002_second', '010_tenth']
+    assert migrations[0][1] == str(migrations_directory / '001_first.sql')
+
+
+def test_get_migrations_duplicate_number(migrations_directory):
+    (migrations_directory / '002_again.sql').write_text('SELECT 2;')
+    with pytest.raises(ValueError):
+        get_migrations(str(migrations_directory))
+
+
+def test_get_migrations_in_repo():
+    versions = [version for version, _ in get_migrations()]
+    assert versions[:3] == ['001_widen_record_id', '002_record_time_indexes',
+                            '003_natural_key_unique_indexes']
+
+
+def test_get_pending_skips_applied(migrations_directory, mock_connection):
+    runner = MigrationRunner(mock_connection, str(migrations_directory))
+    assert [version for version, _ in runner.get_pending()] == ['002_second', '010_tenth']
+
+
+def test_get_pending_up_to_target(migrations_directory, mock_connection):
+    runner = MigrationRunner(mock_connection, str(migrations_directory))
+    assert [version for version, _ in runner.get_pending(target='2')] == ['002_second']
+
+
+def test_apply_runs_batches_and_records_version(migrations_directory, mock_connection):
+    runner = MigrationRunner(mock_connection, str(migrations_directory))
+    runner.apply('001_first', str(migrations_directory / '001_first.sql'))
+    cursor = mock_connection.cursor.return_value
+    statements = [call.args[0] for call in cursor.execute.call_args_list]
+    assert statements == ['SELECT 1;', 'SELECT 11;', MigrationRunner.RECORD_VERSION]
+    assert cursor.execute.call_args.args[1] == ('001_first',)
+    mock_connection.commit.assert_called_once()
+    mock_connection.rollback.assert_not_called()
+
+
+def test_apply_rolls_back_on_failure(migrations_directory, mock_connection):
+    cursor = mock_connection.cursor.return_value
+    cursor.execute.side_effect = [None, Exception('Failed')]
+    runner = MigrationRunner(mock_connection, str(migrations_directory))
+    with pytest.raises(Exception):
+        runner.apply('001_first', str(migrations_directory / '001_first.sql'))
+    mock_connection.rollback.assert_called_once()
+    mock_connection.commit.assert_not_called()
+    cursor.close.assert_called_once()
+
+
+def test_migrate_applies_pending_in_order(migrations_directory, mock_connection):
+    runner = MigrationRunner(mock_connection, str(migrations_directory))
+    runner.apply = MagicMock()
+    assert runner.migrate() == ['002_second', '010_tenth']
+    assert [call.args[0] for call in runner.apply.call_args_list] == ['002_second', '010_tenth']
+
+
+def test_migrate_dry_run(migrations_directory, mock_connection):
+    runner = MigrationRunner(mock_connection, str(migrations_directory))
+    runner.apply = MagicMock()
+    assert runner.migrate(dry_run=True) == ['002_second', '010_tenth']
+    runner.apply.assert_not_called()
+
+
+def test_migrate_stops_at_failure(migrations_directory, mock_connection):
+    runner = MigrationRunner(mock_connection, str(migrations_directory))
+    runner.apply = MagicMock(side_effect=[Exception('Failed'), None])
+    with pytest.raises(Exception):
+        runner.migrate()
+    runner.apply.assert_called_once()
@@ -1,3 +1,5 @@
+DROP TABLE IF EXISTS schema_migrations;
+DROP TABLE IF EXISTS watering_event;
 DROP TABLE IF EXISTS record;
 DROP TABLE IF EXISTS plant;
 DROP TABLE IF EXISTS plant_type;
@@ -37,6 +39,8 @@ CREATE TABLE plant_type (
     plant_type_image_url VARCHAR(200)
 );
 
+CREATE UNIQUE NONCLUSTERED INDEX ux_plant_type_name ON plant_type (plant_type_name);
+
 CREATE TABLE botanist(
     botanist_id SMALLINT IDENTITY(1,1) PRIMARY KEY,
     botanist_name VARCHAR(50) NOT NULL,
@@ -44,6 +48,9 @@ CREATE TABLE botanist(
     botanist_phone VARCHAR(50) NOT NULL
 );
 
+CREATE UNIQUE NONCLUSTERED INDEX ux_botanist_natural_key
+    ON botanist (botanist_name, botanist_email, botanist_phone);
+
 CREATE TABLE plant(
     plant_id SMALLINT IDENTITY(1,1) PRIMARY KEY,
     plant_type_id SMALLINT NOT NULL,
@@ -59,8 +66,18 @@ CREATE TABLE plant(
         REFERENCES city (city_id) 
 );
 
+CREATE UNIQUE NONCLUSTERED INDEX ux_plant_plant_number ON plant (plant_number);
+
+CREATE TABLE watering_event(
+    plant_id SMALLINT NOT NULL,
+    watered_at DATETIME NOT NULL,
+    CONSTRAINT pk_watering_event PRIMARY KEY (plant_id, watered_at),
+    CONSTRAINT fk_watering_event_plant FOREIGN KEY (plant_id) 
+        REFERENCES plant (plant_id)
+);
+
 CREATE TABLE record(
-    record_id SMALLINT IDENTITY(1,1) PRIMARY KEY,
+    record_id BIGINT IDENTITY(1,1) CONSTRAINT pk_record PRIMARY KEY NONCLUSTERED,
     record_soil_moisture FLOAT,
     record_temperature FLOAT,
     record_timestamp DATETIME NOT NULL,
@@ -69,6 +86,23 @@ CREATE TABLE record(
         REFERENCES plant (plant_id)
 );
 
+CREATE CLUSTERED INDEX ix_record_timestamp ON record (record_timestamp, record_id);
+
+CREATE NONCLUSTERED INDEX ix_record_plant_id ON record (plant_id) INCLUDE (record_timestamp);
+
+-- The schema already includes these migrations, so migrate.py skips them on a new database
+CREATE TABLE schema_migrations (
+    version VARCHAR(100) PRIMARY KEY,
+    applied_at DATETIME NOT NULL DEFAULT GETDATE()
+);
+
+INSERT INTO schema_migrations (version)
+VALUES
+    ('001_widen_record_id'),
+    ('002_record_time_indexes'),
+    ('003_natural_key_unique_indexes'),
+    ('004_watering_event');
+
 INSERT INTO continent (continent_name) 
 VALUES 
     ('Africa'),
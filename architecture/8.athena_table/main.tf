@@ -7,115 +7,130 @@ terraform {
   }
 }
 
+locals {
+  # The storage settings of each archive format written by data pipeline 2
+  formats = {
+    csv = {
+      parameters = {
+        EXTERNAL                 = "TRUE"
+        "skip.header.line.count" = "1"
+        "classification"         = "csv"
+      }
+      input_format          = "org.apache.hadoop.mapred.TextInputFormat"
+      output_format         = "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat"
+      serde_name            = "LazySimpleSerDe"
+      serialization_library = "org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe"
+      serde_parameters      = { "field.delim" = "," }
+    }
+    parquet = {
+      parameters = {
+        EXTERNAL                 = "TRUE"
+        "classification"         = "parquet"
+        "parquet.compression"    = "ZSTD"
+      }
+      input_format          = "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat"
+      output_format         = "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat"
+      serde_name            = "ParquetHiveSerDe"
+      serialization_library = "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
+      serde_parameters      = { "serialization.format" = "1" }
+    }
+  }
+  format = local.formats[var.ARCHIVE_FORMAT]
+
+  # Objects are written under Hive-style partitions of the hour they were recorded, and
+  # optionally a bucket of plant numbers. Partition projection computes the partitions from
+  # the query's predicates, so no partitions need to be registered.
+  partition_keys = concat(
+    [
+      { name = "year", type = "int" },
+      { name = "month", type = "int" },
+      { name = "day", type = "int" },
+      { name = "hour", type = "int" },
+    ],
+    var.ARCHIVE_PLANT_BUCKETS > 0 ? [{ name = "plant_bucket", type = "int" }] : []
+  )
+  location_template = join("", [
+    "${trimsuffix(var.BUCKET_LOCATION, "/")}/year=$${year}/month=$${month}/day=$${day}/hour=$${hour}",
+    var.ARCHIVE_PLANT_BUCKETS > 0 ? "/plant_bucket=$${plant_bucket}" : ""
+  ])
+  projection_parameters = merge(
+    {
+      "projection.enabled"        = "true"
+      "projection.year.type"      = "integer"
+      "projection.year.range"     = "${var.ARCHIVE_FIRST_YEAR},2100"
+      "projection.month.type"     = "integer"
+      "projection.month.range"    = "1,12"
+      "projection.month.digits"   = "2"
+      "projection.day.type"       = "integer"
+      "projection.day.range"      = "1,31"
+      "projection.day.digits"     = "2"
+      "projection.hour.type"      = "integer"
+      "projection.hour.range"     = "0,23"
+      "projection.hour.digits"    = "2"
+      "storage.location.template" = local.location_template
+    },
+    var.ARCHIVE_PLANT_BUCKETS > 0 ? tomap({
+      "projection.plant_bucket.type"  = "integer"
+      "projection.plant_bucket.range" = "0,${var.ARCHIVE_PLANT_BUCKETS - 1}"
+    }) : tomap({})
+  )
+
+  # Parquet files are typed, so the plant number and last watered time keep their types
+  columns = [
+    { name = "plant_number", type = var.ARCHIVE_FORMAT == "parquet" ? "int" : "string" },
+    { name = "plant_last_watered", type = var.ARCHIVE_FORMAT == "parquet" ? "timestamp" : "string" },
+    { name = "record_soil_moisture", type = "double" },
+    { name = "record_temperature", type = "double" },
+    { name = "record_timestamp", type = "timestamp" },
+    { name = "plant_type_name", type = "string" },
+    { name = "plant_type_scientific_name", type = "string" },
+    { name = "plant_type_image_url", type = "string" },
+    { name = "botanist_name", type = "string" },
+    { name = "botanist_email", type = "string" },
+    { name = "botanist_phone", type = "string" },
+    { name = "city_name", type = "string" },
+    { name = "city_latitude", type = "double" },
+    { name = "city_longitude", type = "double" },
+    { name = "country_name", type = "string" },
+    { name = "country_capital", type = "string" },
+    { name = "continent_name", type = "string" },
+  ]
+}
+
 resource "aws_glue_catalog_table" "athena_table" {
   name          = var.ATHENA_TABLE_NAME
   database_name = var.ATHENA_DB_NAME
   
   table_type = "EXTERNAL_TABLE"
   
-  parameters = {
-    EXTERNAL              = "TRUE"
-    "skip.header.line.count" = "1"
-    "classification"      = "csv"
+  parameters = merge(local.format.parameters, local.projection_parameters)
+
+  dynamic "partition_keys" {
+    for_each = local.partition_keys
+    content {
+      name = partition_keys.value.name
+      type = partition_keys.value.type
+    }
   }
 
   storage_descriptor {
     location      = var.BUCKET_LOCATION  
-    input_format  = "org.apache.hadoop.mapred.TextInputFormat"
-    output_format = "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat"
+    input_format  = local.format.input_format
+    output_format = local.format.output_format
 
     ser_de_info {
-      name                  = "LazySimpleSerDe"
-      serialization_library = "org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe"
-
-      parameters = {
-        "field.delim" = ","
-      }
-    }
-
-    columns {
-      name = "plant_number"
-      type = "string"
-    }
-
-    columns {
-      name = "plant_last_watered"
-      type = "string"
-    }
-
-    columns {
-      name = "record_soil_moisture"
-      type = "double"
-    }
-
-    columns {
-      name = "record_temperature"
-      type = "double"
-    }
-
-    columns {
-      name = "record_timestamp"
-      type = "timestamp"
-    }
-
-    columns {
-      name = "plant_type_name"
-      type = "string"
-    }
-
-    columns {
-      name = "plant_type_scientific_name"
-      type = "string"
-    }
-
-    columns {
-      name = "plant_type_image_url"
-      type = "string"
-    }
-
-    columns {
-      name = "botanist_name"
-      type = "string"
-    }
-
-    columns {
-      name = "botanist_email"
-      type = "string"
-    }
-
-    columns {
-      name = "botanist_phone"
-      type = "string"
-    }
-
-    columns {
-      name = "city_name"
-      type = "string"
-    }
-
-    columns {
-      name = "city_latitude"
-      type = "double"
-    }
-
-    columns {
-      name = "city_longitude"
-      type = "double"
-    }
+      name                  = local.format.serde_name
+      serialization_library = local.format.serialization_library
 
-    columns {
-      name = "country_name"
-      type = "string"
+      parameters = local.format.serde_parameters
     }
 
-    columns {
-      name = "country_capital"
-      type = "string"
-    }
-
-    columns {
-      name = "continent_name"
-      type = "string"
+    dynamic "columns" {
+      for_each = local.columns
+      content {
+        name = columns.value.name
+        type = columns.value.type
+      }
     }
   }
 }
\ No newline at end of file
@@ -16,5 +16,25 @@ variable "BUCKET_LOCATION" {
   default = "s3://c16-trenet-s3/"
 }
 
+variable "ARCHIVE_FORMAT" {
+  description = "Format of the archived files, csv or parquet, matching ARCHIVE_FORMAT in data pipeline 2"
+  type = string
+  default = "csv"
 
+  validation {
+    condition     = contains(["csv", "parquet"], var.ARCHIVE_FORMAT)
+    error_message = "The ARCHIVE_FORMAT must be csv or parquet."
+  }
+}
 
+variable "ARCHIVE_PLANT_BUCKETS" {
+  description = "Number of plant number buckets the archive is partitioned into, matching ARCHIVE_PLANT_BUCKETS in data pipeline 2, or 0 for none"
+  type = number
+  default = 0
+}
+
+variable "ARCHIVE_FIRST_YEAR" {
+  description = "Earliest year of the partitions projected for the archive"
+  type = number
+  default = 2025
+}
@@ -1,5 +1,5 @@
 import os
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import time
 import boto3
 from dotenv import load_dotenv
@@ -10,10 +10,17 @@ class AthenaManager:
     BASE_QUERY = """
     SELECT * FROM c16_trenet_athena_table
     WHERE 
+    ({partition_filter})
+    AND 
     record_timestamp > TIMESTAMP '{start_filter}' 
     AND 
     record_timestamp < TIMESTAMP '{end_filter}'; 
     """
+    # The archive is partitioned by year, month, day and hour of record_timestamp
+    HOURS_PARTITION = "(year = {year} AND month = {month} AND day = {day} AND hour BETWEEN {first_hour} AND {last_hour})"
+    DAYS_PARTITION = "(year = {year} AND month = {month} AND day BETWEEN {first_day} AND {last_day})"
+    MONTHS_PARTITION = "(year = {year} AND month BETWEEN {first_month} AND {last_month})"
+    YEARS_PARTITION = "(year BETWEEN {first_year} AND {last_year})"
     SLEEP_SECONDS = 3
 
     def __init__(self):
@@ -27,9 +34,85 @@ class AthenaManager:
     def _convert_datetime_to_string(self, timestamp_in: datetime) -> str:
         return timestamp_in.strftime('%Y-%m-%d %H:%M:%S')
 
+    def _get_partition_filter(self, start_timestamp: datetime, end_timestamp: datetime) -> str:
+        """Returns a predicate on the partition columns matching only the partitions which
+        overlap the range, so Athena reads only those rather than the whole archive. The hours
+        of the first and last days are matched hour by hour, and the whole days between them
+        as ranges of days, months and years, so the predicate stays short however long the
+        range is."""
+        if end_timestamp < start_timestamp:
+            raise ValueError('The end timestamp is before the start timestamp.')
+        start_day, end_day = start_timestamp.date(), end_timestamp.date()
+        if start_day == end_day:
+            return self._get_hours_filter(start_day, start_timestamp.hour, end_timestamp.hour)
+        partitions = []
+        first_whole_day, last_whole_day = start_day, end_day
+        if start_timestamp.hour != 0:
+            partitions.append(self._get_hours_filter(start_day, start_timestamp.hour, 23))
+            first_whole_day += timedelta(days=1)
+        if end_timestamp.hour != 23:
+            partitions.append(self._get_hours_filter(end_day, 0, end_timestamp.hour))
+            last_whole_day -= timedelta(days=1)
+        if first_whole_day <= last_whole_day:
+            partitions += self._get_days_filters(first_whole_day, last_whole_day)
+        return ' OR '.join(partitions)
+
+    def _get_hours_filter(self, day: date, first_hour: int, last_hour: int) -> str:
+        """Returns a predicate matching a range of hours in one day."""
+        return self.HOURS_PARTITION.format(year=day.year, month=day.month, day=day.day,
+                                           first_hour=first_hour, last_hour=last_hour)
+
+    def _get_days_filters(self, first_day: date, last_day: date) -> list[str]:
+        """Returns predicates matching every hour of a range of whole days: the days at
+        either end outside a whole month, and the whole months between them."""
+        if (first_day.year, first_day.month) == (last_day.year, last_day.month):
+            return [self.DAYS_PARTITION.format(year=first_day.year, month=first_day.month,
+                                               first_day=first_day.day, last_day=last_day.day)]
+        partitions = []
+        first_month, last_month = (first_day.year, first_day.month), (last_day.year, last_day.month)
+        if first_day.day != 1:
+            partitions.append(self.DAYS_PARTITION.format(
+                year=first_day.year, month=first_day.month, first_day=first_day.day, last_day=31))
+            first_month = self._add_months(first_month, 1)
+        if (last_day + timedelta(days=1)).day != 1:
+            partitions.append(self.DAYS_PARTITION.format(
+                year=last_day.year, month=last_day.month, first_day=1, last_day=last_day.day))
+            last_month = self._add_months(last_month, -1)
+        if first_month <= last_month:
+            partitions += self._get_months_filters(first_month, last_month)
+        return partitions
+
+    def _get_months_filters(self, first_month: tuple, last_month: tuple) -> list[str]:
+        """Returns predicates matching every hour of a range of whole (year, month)s: the
+        months at either end outside a whole year, and the whole years between them."""
+        (first_year, first_month_number), (last_year, last_month_number) = first_month, last_month
+        if first_year == last_year:
+            return [self.MONTHS_PARTITION.format(year=first_year, first_month=first_month_number,
+                                                 last_month=last_month_number)]
+        partitions = []
+        if first_month_number != 1:
+            partitions.append(self.MONTHS_PARTITION.format(
+                year=first_year, first_month=first_month_number, last_month=12))
+            first_year += 1
+        if last_month_number != 12:
+            partitions.append(self.MONTHS_PARTITION.format(
+                year=last_year, first_month=1, last_month=last_month_number))
+            last_year -= 1
+        if first_year <= last_year:
+            partitions.append(self.YEARS_PARTITION.format(first_year=first_year,
+                                                          last_year=last_year))
+        return partitions
+
+    @staticmethod
+    def _add_months(month: tuple, months: int) -> tuple:
+        """Returns the (year, month) the given number of months after another."""
+        year, month_number = divmod(month[0] * 12 + month[1] - 1 + months, 12)
+        return year, month_number + 1
+
     def query_athena(self, start_timestamp: datetime, end_timestamp: datetime) -> None:
         load_dotenv()
         query_string_athena = self.BASE_QUERY.format(
+            partition_filter=self._get_partition_filter(start_timestamp, end_timestamp),
             start_filter=self._convert_datetime_to_string(start_timestamp),
             end_filter=self._convert_datetime_to_string(end_timestamp)
         )
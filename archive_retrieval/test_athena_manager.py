@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import re
+from unittest.mock import patch
+import pytest
+from athena_manager import AthenaManager
+
+
+@pytest.fixture
+@patch('athena_manager.AthenaManager._get_client')
+def athena_manager(mock_client):
+    return AthenaManager()
+
+
+def matches(partition_filter: str, hour: datetime) -> bool:
+    '''Evaluate a partition predicate against the partition of an hour.'''
+    expression = re.sub(r'(\w+) BETWEEN (\d+) AND (\d+)', r'\2 <= \1 <= \3', partition_filter)
+    expression = expression.replace(' = ', ' == ').replace(' AND ', ' and ').replace(' OR ', ' or ')
+    return eval(expression, {'year': hour.year, 'month': hour.month, 'day': hour.day,
+                             'hour': hour.hour})
+
+
+def assert_matches_exactly(partition_filter: str, start: datetime, end: datetime):
+    '''The predicate matches every hour in the range, and none of the surrounding days.'''
+    start_hour = start.replace(minute=0, second=0)
+    hour = start_hour - timedelta(days=2)
+    while hour <= end + timedelta(days=2):
+        assert matches(partition_filter, hour) == (start_hour <= hour <= end), hour
+        hour += timedelta(hours=1)
+
+
+def test_same_day(athena_manager):
+    start, end = datetime(2025, 4, 1, 9, 30), datetime(2025, 4, 1, 17, 5)
+    partition_filter = athena_manager._get_partition_filter(start, end)
+    assert partition_filter == \
+        '(year = 2025 AND month = 4 AND day = 1 AND hour BETWEEN 9 AND 17)'
+    assert_matches_exactly(partition_filter, start, end)
+
+
+def test_across_month_boundary(athena_manager):
+    start, end = datetime(2025, 3, 30, 22), datetime(2025, 4, 2, 3)
+    partition_filter = athena_manager._get_partition_filter(start, end)
+    assert partition_filter.count(' OR ') == 3
+    assert_matches_exactly(partition_filter, start, end)
+
+
+def test_across_year_boundary(athena_manager):
+    start, end = datetime(2024, 12, 31, 12), datetime(2025, 1, 1, 6)
+    partition_filter = athena_manager._get_partition_filter(start, end)
+    assert partition_filter == \
+        '(year = 2024 AND month = 12 AND day = 31 AND hour BETWEEN 12 AND 23) OR ' \
+        '(year = 2025 AND month = 1 AND day = 1 AND hour BETWEEN 0 AND 6)'
+    assert_matches_exactly(partition_filter, start, end)
+
+
+def test_long_range_stays_short(athena_manager):
+    start, end = datetime(2023, 11, 14, 5), datetime(2025, 2, 27, 20)
+    partition_filter = athena_manager._get_partition_filter(start, end)
+    assert partition_filter.count(' OR ') <= 7
+    assert '(year BETWEEN 2024 AND 2024)' in partition_filter
+    assert_matches_exactly(partition_filter, start, end)
+
+
+def test_whole_days(athena_manager):
+    start, end = datetime(2025, 2, 1, 0), datetime(2025, 2, 28, 23, 59)
+    partition_filter = athena_manager._get_partition_filter(start, end)
+    assert partition_filter == '(year = 2025 AND month = 2 AND day BETWEEN 1 AND 28)'
+    assert_matches_exactly(partition_filter, start, end)
+
+
+def test_end_before_start(athena_manager):
+    with pytest.raises(ValueError):
+        athena_manager._get_partition_filter(datetime(2025, 4, 2), datetime(2025, 4, 1))
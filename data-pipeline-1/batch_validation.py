@@ -0,0 +1,178 @@
+'''
+    A columnar alternative to validating each response by building Plant objects. The
+    responses are flattened into columns once, and every check runs over a whole column at a
+    time, so a large number of readings can be validated at a fraction of the per-object cost.
+    The rules match the clean methods in models.py.
+'''
+
+from datetime import datetime
+from models import Botanist, Location, Recording, PlantType, Plant, get_country_names
+
+
+PHONE_PATTERN = r'\d{3}-\d{3}-\d{3}-\d{4}x\d{3}|\(\d{3}\)\d{3}-\d{4}x\d{5}'
+LAST_WATERED_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
+RECORDING_TAKEN_FORMAT = '%Y-%m-%d %H:%M:%S'
+LOCATION_FIELDS = ['latitude', 'longitude', 'city', 'country_code', 'continent_capital']
+
+
+class BatchValidator:
+    '''Class which validates a list of json responses as columns. Valid rows are returned
+    cleaned, and every invalid row is returned with the reason it was rejected.'''
+
+    def __init__(self, responses: list[dict]):
+        '''Initialise with the list of responses.'''
+        self.responses = responses
+
+    def flatten_responses(self):
+        '''Flatten the nested responses into a DataFrame with one column per field. Fields
+        with the wrong shape are left empty, so they are rejected by the checks.'''
+        import pandas as pd
+        columns = {name: [] for name in [
+            'plant_id', 'last_watered', 'botanist_is_dict', 'botanist_name',
+            'botanist_email', 'botanist_phone', 'location_is_list', *LOCATION_FIELDS,
+            'soil_moisture', 'temperature', 'recording_taken', 'plant_type_name',
+            'scientific_name', 'image_url']}
+        for response in self.responses:
+            botanist = response.get('botanist')
+            is_dict = isinstance(botanist, dict)
+            location = response.get('origin_location')
+            is_list = isinstance(location, list) \
+                and len(location) == Location.COUNT_OF_LOCATION_ATTRIBUTES
+            images = response.get('images')
+            columns['plant_id'].append(response.get('plant_id'))
+            columns['last_watered'].append(response.get('last_watered'))
+            columns['botanist_is_dict'].append(is_dict)
+            columns['botanist_name'].append(botanist.get('name') if is_dict else None)
+            columns['botanist_email'].append(botanist.get('email') if is_dict else None)
+            columns['botanist_phone'].append(botanist.get('phone') if is_dict else None)
+            columns['location_is_list'].append(is_list)
+            for index, field in enumerate(LOCATION_FIELDS):
+                columns[field].append(location[index] if is_list else None)
+            columns['soil_moisture'].append(response.get('soil_moisture'))
+            columns['temperature'].append(response.get('temperature'))
+            columns['recording_taken'].append(response.get('recording_taken'))
+            columns['plant_type_name'].append(response.get('name'))
+            columns['scientific_name'].append(response.get('scientific_name'))
+            columns['image_url'].append(
+                images.get('original_url') if isinstance(images, dict) else None)
+        return pd.DataFrame(columns, dtype=object)
+
+    def validate(self):
+        '''Run every check over the columns. Returns a DataFrame of the valid rows with
+        cleaned values, and a DataFrame of the plant id and rejection reason of each invalid
+        row. Only the first failed check is given as the reason.'''
+        import pandas as pd
+        data = self.flatten_responses()
+        now = pd.Timestamp(datetime.now())
+        reasons = pd.Series(None, index=data.index, dtype=object)
+
+        def reject(failed, reason: str) -> None:
+            reasons.mask(reasons.isna() & failed.fillna(True).astype(bool), reason,
+                         inplace=True)
+
+        def is_text(column):
+            return data[column].map(lambda value: isinstance(value, str)).astype(bool)
+
+        last_watered = pd.to_datetime(data['last_watered'].where(is_text('last_watered')),
+                                      format=LAST_WATERED_FORMAT, errors='coerce')
+        reject(last_watered.isna(), 'last_watered is missing or in an invalid format')
+        reject(last_watered > now, 'last_watered is in the future')
+        reject(data['plant_id'].isna(), 'plant_id is missing')
+
+        reject(~data['botanist_is_dict'].astype(bool), 'botanist is not a dict')
+        emails = data['botanist_email'].where(is_text('botanist_email'))
+        reject(~emails.str.contains('@', regex=False, na=False), 'botanist email is invalid')
+        names = data['botanist_name'].where(is_text('botanist_name'))
+        reject(~(names.str.len() > 0), 'botanist name is invalid')
+        phones = data['botanist_phone'].where(is_text('botanist_phone'))
+        reject(~phones.str.fullmatch(PHONE_PATTERN, na=False), 'botanist phone is invalid')
+
+        reject(~data['location_is_list'].astype(bool),
+               'origin_location is not a list of five values')
+        latitude = pd.to_numeric(data['latitude'], errors='coerce')
+        longitude = pd.to_numeric(data['longitude'], errors='coerce')
+        reject(latitude.isna() | longitude.isna(), 'coordinates are invalid')
+        reject(data['city'].isna(), 'city is missing')
+        countries = data['country_code'].where(is_text('country_code')) \
+            .str.upper().map(dict(get_country_names()))
+        reject(countries.isna(), 'country code is not recognised')
+        continent_capital = data['continent_capital'] \
+            .where(is_text('continent_capital')).str.split('/')
+        continents, capitals = continent_capital.str[0], continent_capital.str[1]
+        reject(capitals.isna(), 'continent and capital are invalid')
+
+        soil_moisture = pd.to_numeric(data['soil_moisture'], errors='coerce')
+        reject(soil_moisture.isna(), 'soil moisture is missing')
+        reject((soil_moisture < Recording.MIN_SOIL_MOISTURE) |
+               (soil_moisture > Recording.MAX_SOIL_MOISTURE), 'soil moisture is out of range')
+        temperature = pd.to_numeric(data['temperature'], errors='coerce')
+        reject(temperature.isna(), 'temperature is missing')
+        taken = pd.to_datetime(data['recording_taken'].where(is_text('recording_taken')),
+                               format=RECORDING_TAKEN_FORMAT, errors='coerce')
+        reject(taken.isna(), 'recording_taken is missing or in an invalid format')
+        reject(taken > now, 'recording_taken is in the future')
+
+        plant_type_names = data['plant_type_name'].where(is_text('plant_type_name'))
+        reject(~(plant_type_names.str.len() > 0), 'plant type name is invalid')
+        scientific_names = data['scientific_name']
+        has_scientific_name = scientific_names.map(bool)
+        reject(has_scientific_name & ~scientific_names.map(
+            lambda value: isinstance(value, list)).astype(bool),
+            'scientific name is not a list')
+        image_urls = data['image_url'].where(is_text('image_url'))
+        keep_image = image_urls.str.startswith('https://', na=False) \
+            & image_urls.str.endswith('jpg', na=False)
+
+        valid = reasons.isna()
+        cleaned = pd.DataFrame({
+            'plant_number': data['plant_id'],
+            'last_watered': last_watered,
+            'botanist_name': names,
+            'botanist_email': emails,
+            'botanist_phone': phones,
+            'latitude': latitude,
+            'longitude': longitude,
+            'city': data['city'],
+            'country': countries,
+            'continent': continents,
+            'capital': capitals,
+            'soil_moisture': soil_moisture.round(2),
+            'temperature': temperature.round(2),
+            'taken': taken,
+            'plant_type_name': plant_type_names,
+            'scientific_name': scientific_names.where(has_scientific_name).str[0],
+            'image_url': image_urls.where(keep_image),
+        })[valid].reset_index(drop=True)
+        rejections = pd.DataFrame({'plant_id': data['plant_id'], 'reason': reasons})[~valid] \
+            .reset_index(drop=True)
+        return cleaned, rejections
+
+    @staticmethod
+    def make_plants(cleaned) -> list[Plant]:
+        '''Build Plant objects from the cleaned rows without checking them again. Rows with
+        the same botanist, location or plant type share a single object.'''
+        botanists, locations, plant_types = {}, {}, {}
+        plants = []
+        for row in cleaned.astype(object).where(cleaned.notna(), None) \
+                .itertuples(index=False):
+            botanist_key = (row.botanist_name, row.botanist_email, row.botanist_phone)
+            if botanist_key not in botanists:
+                botanists[botanist_key] = Botanist.from_values(*botanist_key)
+            location_key = (float(row.latitude), float(row.longitude), row.city, row.country,
+                            row.continent, row.capital)
+            if location_key not in locations:
+                locations[location_key] = Location.from_values(*location_key)
+            plant_type_key = (row.plant_type_name, row.scientific_name, row.image_url)
+            if plant_type_key not in plant_types:
+                plant_types[plant_type_key] = PlantType.from_values(*plant_type_key)
+            plants.append(Plant.from_values(
+                plant_number=row.plant_number,
+                last_watered=row.last_watered.to_pydatetime(),
+                botanist=botanists[botanist_key],
+                location=locations[location_key],
+                record=Recording.from_values(
+                    float(row.soil_moisture), float(row.temperature),
+                    row.taken.to_pydatetime()),
+                plant_type=plant_types[plant_type_key],
+            ))
+        return plants
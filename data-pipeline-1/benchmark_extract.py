@@ -0,0 +1,125 @@
+'''
+    Benchmarks for the extraction part of the first data pipeline. Each extraction strategy
+    is run repeatedly against the local fake plants API, and the throughput, median and p99
+    run times and success rate are reported for each.
+
+    Usage: python3 benchmark_extract.py --plants 500 --runs 10 --latency-median 0.2
+'''
+
+import argparse
+import math
+import statistics
+import time
+from extract import RecordingAPIExtractor
+from fake_plants_api import FakePlantsAPI
+from request_policy import RequestPolicy
+from resources import ResourceManager
+
+
+def make_extractor(strategy: str, api_url: str, plant_count: int, concurrency: int,
+                   timeout_seconds: float, resources: ResourceManager) -> RecordingAPIExtractor:
+    '''Build the extractor for a strategy. The plain asyncio strategy never hedges or
+    retries, so the effect of the request policy can be compared.'''
+    if strategy == 'asyncio':
+        policy = RequestPolicy(timeout_seconds=timeout_seconds, hedge_percentile=None,
+                               retry_budget_ratio=0, min_retry_budget=0)
+    else:
+        policy = RequestPolicy(timeout_seconds=timeout_seconds)
+    return RecordingAPIExtractor(
+        api_url=api_url,
+        min_plant_id=1,
+        max_plant_id=plant_count,
+        max_concurrency=concurrency,
+        policy=policy,
+        resources=resources if strategy == 'asyncio_shared_session' else None,
+    )
+
+
+def run_strategy(strategy: str, extractor: RecordingAPIExtractor) -> list[dict]:
+    '''Run a single extraction with the given strategy.'''
+    if strategy == 'multiprocessing':
+        return extractor.extract_api_data()
+    return extractor.extract_api_data_async()
+
+
+def percentile(values: list[float], percent: float) -> float:
+    '''Return the given percentile of the values, using the nearest rank.'''
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def benchmark_strategy(strategy: str, api: FakePlantsAPI, runs: int, concurrency: int,
+                       timeout_seconds: float) -> dict:
+    '''Run a strategy several times and summarise the results. One extractor is used for
+    every run, so that latency history and shared sessions carry over like in a warm Lambda.'''
+    resources = ResourceManager(http_connection_limit=concurrency)
+    extractor = make_extractor(strategy, api.url, api.plant_count, concurrency,
+                               timeout_seconds, resources)
+    run_times, successes = [], 0
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            responses = run_strategy(strategy, extractor)
+            run_times.append(time.perf_counter() - start)
+            successes += len(responses)
+    finally:
+        resources.close()
+    return {
+        'strategy': strategy,
+        'throughput': successes / sum(run_times),
+        'p50': statistics.median(run_times),
+        'p99': percentile(run_times, 99),
+        'success_rate': successes / (api.plant_count * runs),
+    }
+
+
+def print_results(results: list[dict]) -> None:
+    '''Print the results as a table.'''
+    print(f"{'strategy':<24}{'plants/s':>10}{'p50 (s)':>10}{'p99 (s)':>10}{'success':>10}")
+    for result in results:
+        print(f"{result['strategy']:<24}{result['throughput']:>10.1f}{result['p50']:>10.3f}"
+              f"{result['p99']:>10.3f}{result['success_rate']:>10.1%}")
+
+
+STRATEGIES = ['multiprocessing', 'asyncio', 'asyncio_hedged', 'asyncio_shared_session']
+
+
+def parse_inputs() -> argparse.Namespace:
+    '''Parse the benchmark settings from the command line.'''
+    parser = argparse.ArgumentParser(description='Benchmark the extraction strategies.')
+    parser.add_argument('--plants', type=int, default=55,
+                        help='number of plants served by the fake API')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='number of extractions per strategy')
+    parser.add_argument('--concurrency', type=int, default=20,
+                        help='max requests in flight for the asyncio strategies')
+    parser.add_argument('--latency-median', type=float, default=0.2,
+                        help='median request latency in seconds')
+    parser.add_argument('--latency-sigma', type=float, default=0.5,
+                        help='spread of the log-normal latency distribution')
+    parser.add_argument('--error-rate', type=float, default=0.02,
+                        help='fraction of requests answered with a 500')
+    parser.add_argument('--timeout-rate', type=float, default=0.01,
+                        help='fraction of requests which hang past the client timeout')
+    parser.add_argument('--timeout-seconds', type=float, default=4,
+                        help='client timeout per request')
+    parser.add_argument('--strategies', nargs='+', choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_inputs()
+    fake_api = FakePlantsAPI(
+        plant_count=args.plants,
+        latency_median_seconds=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds * 2,
+        seed=args.seed,
+    )
+    with fake_api:
+        print_results([benchmark_strategy(strategy, fake_api, args.runs, args.concurrency,
+                                          args.timeout_seconds)
+                       for strategy in args.strategies])
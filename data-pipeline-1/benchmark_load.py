@@ -0,0 +1,220 @@
+'''
+    Benchmarks for the loading part of the first data pipeline. Synthetic plant populations
+    are loaded with each load strategy into an in-memory SQLite database, standing in for
+    the RDS, and the statements issued, rows written, wall time and commit time are reported
+    for each.
+
+    Usage: python3 benchmark_load.py --plants 100 1000 10000 --runs 3
+'''
+
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+from dimension_cache import DimensionKeyCache
+from micro_batching import MicroBatcher
+from models import Botanist, Location, Recording, PlantType, Plant
+from sqlite_backend import SQLiteDatabaseManager, make_sqlite_connection
+
+
+CONTINENTS = ['Africa', 'Asia', 'Europe', 'North America', 'Oceania', 'South America']
+# The plants served by the API in one invocation
+INVOCATION_SIZE = 55
+
+
+def make_population(plant_count: int, seed: int = 0) -> list[Plant]:
+    '''Make a population of plants with roughly the dimension cardinality of the real API:
+    one botanist per 15 plants, one plant type per 2 plants, cities shared by a few plants
+    and at most 195 countries. Shared dimensions are shared objects, as after interning.'''
+    rng = random.Random(seed)
+    countries = [(f'Country {i}', f'Capital {i}', CONTINENTS[i % len(CONTINENTS)])
+                 for i in range(min(195, max(1, plant_count // 3)))]
+    locations = []
+    for i in range(max(1, plant_count * 2 // 3)):
+        country, capital, continent = countries[i % len(countries)]
+        locations.append(Location.from_values(
+            round(rng.uniform(-90, 90), 5), round(rng.uniform(-180, 180), 5), f'City {i}',
+            country, continent, capital))
+    botanists = [Botanist.from_values(f'Botanist {i}', f'botanist.{i}@lnhm.co.uk',
+                                      f'001-{i:07d}')
+                 for i in range(max(1, plant_count // 15))]
+    plant_types = [PlantType.from_values(f'Plant Type {i}', f'Plantae typica {i}', None)
+                   for i in range(max(1, plant_count // 2))]
+    now = datetime.now().replace(microsecond=0)
+    return [Plant.from_values(
+        plant_number=plant_number,
+        last_watered=now - timedelta(minutes=rng.randrange(1, 24 * 60)),
+        botanist=rng.choice(botanists),
+        location=rng.choice(locations),
+        record=Recording.from_values(rng.uniform(10, 100), rng.uniform(5, 30), now),
+        plant_type=rng.choice(plant_types),
+    ) for plant_number in range(1, plant_count + 1)]
+
+
+class CountingCursor:
+    '''A cursor which counts the statements sent and rows written through it.'''
+
+    def __init__(self, cursor, connection: 'CountingConnection'):
+        self.cursor = cursor
+        self.connection = connection
+
+    def execute(self, query: str, *args):
+        self.connection.statements += 1
+        self.cursor.execute(query, *args)
+        self.connection.count_rows(self.cursor)
+
+    def executemany(self, query: str, values):
+        # executemany sends one statement per row of values
+        values = list(values)
+        self.connection.statements += len(values)
+        self.cursor.executemany(query, values)
+        self.connection.count_rows(self.cursor)
+
+    def __getattr__(self, name: str):
+        return getattr(self.cursor, name)
+
+
+class CountingConnection:
+    '''A connection which counts the statements sent and rows written over it, and times
+    its commits.'''
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.statements = 0
+        self.rows_written = 0
+        self.commit_seconds = 0.0
+
+    def count_rows(self, cursor) -> None:
+        '''Add the rows changed by the cursor's last statement. SELECTs report -1.'''
+        self.rows_written += max(cursor.rowcount, 0)
+
+    def cursor(self) -> CountingCursor:
+        return CountingCursor(self.connection.cursor(), self)
+
+    def commit(self) -> None:
+        start = time.perf_counter()
+        self.connection.commit()
+        self.commit_seconds += time.perf_counter() - start
+
+    def __getattr__(self, name: str):
+        return getattr(self.connection, name)
+
+
+def get_invocations(plants: list[Plant]) -> list[list[Plant]]:
+    '''Split the plants into the batches served by successive invocations.'''
+    return [plants[start:start + INVOCATION_SIZE]
+            for start in range(0, len(plants), INVOCATION_SIZE)]
+
+
+def run_strategy(strategy: str, plants: list[Plant], connection: CountingConnection,
+                 key_cache: DimensionKeyCache) -> None:
+    '''Load the plants with a strategy:
+    - cold: one batch into an empty database with an empty key cache
+    - warm: one batch of plants already in the database, with a warm key cache
+    - per_invocation: every invocation's plants in their own transaction
+    - micro_batched: invocations buffered and flushed ten at a time'''
+    if strategy in ('cold', 'warm'):
+        if not SQLiteDatabaseManager(plants, connection=connection,
+                                     key_cache=key_cache).load_batch(plants):
+            raise ValueError(f'The {strategy} load failed.')
+    elif strategy == 'per_invocation':
+        for invocation in get_invocations(plants):
+            if not SQLiteDatabaseManager(invocation, connection=connection,
+                                         key_cache=key_cache).load_batch(invocation):
+                raise ValueError('The per invocation load failed.')
+    elif strategy == 'micro_batched':
+        batcher = MicroBatcher(
+            lambda: SQLiteDatabaseManager([], connection=connection, key_cache=key_cache),
+            max_batch_size=INVOCATION_SIZE * 10)
+        for invocation in get_invocations(plants):
+            batcher.add(invocation)
+        if not batcher.flush():
+            raise ValueError('The micro-batched load failed.')
+    else:
+        raise ValueError(f'The strategy {strategy} is not known.')
+
+
+def benchmark_strategy(strategy: str, plants: list[Plant], runs: int,
+                       on_disk: bool = False) -> dict:
+    '''Run a strategy several times, each into a new database, and summarise the results.
+    The warm strategy's database is loaded with the plants first, untimed. An in-memory
+    database is used unless on disk is set, in which case commits include syncing a file.
+    Every run must send the same statements and write the same rows.'''
+    if runs < 1:
+        raise ValueError('A strategy must be run at least once.')
+    run_times, commit_times, counts = [], [], set()
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(runs):
+            path = os.path.join(directory, f'benchmark-{run}.db') if on_disk else ':memory:'
+            connection = CountingConnection(make_sqlite_connection(path))
+            key_cache = DimensionKeyCache()
+            # The loader's progress messages are left out of the results
+            with redirect_stdout(io.StringIO()):
+                if strategy == 'warm':
+                    SQLiteDatabaseManager(plants, connection=connection,
+                                          key_cache=key_cache).load_batch(plants)
+                    connection.statements, connection.rows_written = 0, 0
+                    connection.commit_seconds = 0.0
+                start = time.perf_counter()
+                run_strategy(strategy, plants, connection, key_cache)
+                run_times.append(time.perf_counter() - start)
+            commit_times.append(connection.commit_seconds)
+            counts.add((connection.statements, connection.rows_written))
+            connection.close()
+    if len(counts) > 1:
+        raise ValueError(f'The {strategy} runs wrote different amounts: {sorted(counts)}.')
+    statements, rows_written = counts.pop()
+    return {
+        'strategy': strategy,
+        'plants': len(plants),
+        'statements': statements,
+        'rows_written': rows_written,
+        'wall_time': statistics.median(run_times),
+        'commit_time': statistics.median(commit_times),
+    }
+
+
+def print_results(results: list[dict]) -> None:
+    '''Print the results as a table.'''
+    print(f"{'strategy':<16}{'plants':>8}{'statements':>12}{'rows':>10}{'wall (ms)':>12}"
+          f"{'commit (ms)':>13}{'plants/s':>11}")
+    for result in results:
+        print(f"{result['strategy']:<16}{result['plants']:>8}{result['statements']:>12}"
+              f"{result['rows_written']:>10}{result['wall_time'] * 1000:>12.1f}"
+              f"{result['commit_time'] * 1000:>13.1f}"
+              f"{result['plants'] / result['wall_time']:>11.0f}")
+
+
+STRATEGIES = ['cold', 'warm', 'per_invocation', 'micro_batched']
+
+
+def parse_inputs() -> argparse.Namespace:
+    '''Parse the benchmark settings from the command line.'''
+    parser = argparse.ArgumentParser(description='Benchmark the load strategies.')
+    parser.add_argument('--plants', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='sizes of the plant populations to load')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='number of loads per strategy and population')
+    parser.add_argument('--strategies', nargs='+', choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument('--on-disk', action='store_true',
+                        help='use a database file rather than memory, so commits are synced')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error('--runs must be at least 1')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_inputs()
+    results = []
+    for plant_count in args.plants:
+        population = make_population(plant_count, args.seed)
+        results += [benchmark_strategy(strategy, population, args.runs, args.on_disk)
+                    for strategy in args.strategies]
+    print_results(results)
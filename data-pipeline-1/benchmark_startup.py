@@ -0,0 +1,92 @@
+'''
+    Benchmark for the cold start of the first data pipeline. Each module is imported in a
+    fresh Python process with -X importtime, as a cold Lambda would, and the time taken to
+    import it (including everything it imports) is reported. The slowest imports pulled in
+    by the Lambda handler are listed too, to show where the remaining time goes.
+
+    Usage: python3 benchmark_startup.py --runs 5 --top 15
+'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+MODULES = ['lambda_handler', 'pipeline', 'extract', 'transform', 'models', 'load',
+           'dimension_cache', 'load_spool', 'micro_batching', 'resources', 'plant_registry',
+           'request_policy', 'change_cache', 'streaming', 'batch_validation']
+# Modules which the hot path must never import
+HEAVY_MODULES = ['pandas', 'numpy', 'requests', 'lambda_multiprocessing', 'dotenv']
+# Modules which every invocation uses, so they are imported eagerly on purpose: every run
+# loads into the RDS over pymssql and extracts over aiohttp. Their cost is reported instead
+EAGER_MODULES = ['pymssql', 'aiohttp']
+
+
+def get_import_times(module: str) -> dict[str, int]:
+    '''Import a module in a fresh process and return the cumulative import time, in
+    microseconds, of every module imported along the way.'''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    return parse_import_times(result.stderr)
+
+
+def parse_import_times(importtime_output: str) -> dict[str, int]:
+    '''Parse the output of -X importtime into a dict of module name -> cumulative time.
+    Lines look like: "import time:       243 |     146514 |   pipeline".'''
+    import_times = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        import_times[fields[2].strip()] = int(fields[1])
+    return import_times
+
+
+def get_loaded_modules(module: str) -> list[str]:
+    '''Return the heavy modules which importing the given module loads.'''
+    check = (f'import sys, {module}; '
+             f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+    result = subprocess.run(
+        [sys.executable, '-c', check], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    return [name for name in result.stdout.strip().split(',') if name]
+
+
+def benchmark_modules(modules: list[str], runs: int) -> list[tuple[str, float]]:
+    '''Return the median cold import time, in milliseconds, of each module.'''
+    return [(module, statistics.median(get_import_times(module)[module]
+                                       for _ in range(runs)) / 1000)
+            for module in modules]
+
+
+def parse_inputs() -> argparse.Namespace:
+    '''Parse the benchmark settings from the command line.'''
+    parser = argparse.ArgumentParser(description='Benchmark cold start import times.')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='number of fresh processes per module')
+    parser.add_argument('--top', type=int, default=15,
+                        help='number of slowest dependencies of the handler to list')
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_inputs()
+    print(f"{'module':<20}{'import (ms)':>12}")
+    for name, milliseconds in benchmark_modules(args.modules, args.runs):
+        print(f"{name:<20}{milliseconds:>12.1f}")
+    print("\nSlowest imports under lambda_handler:")
+    handler_times = get_import_times('lambda_handler')
+    for name, microseconds in sorted(handler_times.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<40}{microseconds / 1000:>12.1f}")
+    print("\nImported eagerly, as every invocation needs them:")
+    for name in EAGER_MODULES:
+        print(f"{name:<40}{handler_times.get(name, 0) / 1000:>12.1f}")
+    heavy = get_loaded_modules('lambda_handler')
+    print(f"\nHeavy modules on the hot path: {', '.join(heavy) if heavy else 'none'}")
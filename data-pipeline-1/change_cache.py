@@ -0,0 +1,86 @@
+'''
+    A cache of the last reading loaded for each plant. The API often returns the same reading
+    for a plant on consecutive polls; those responses are filtered out before the transform
+    and load stages, so only new readings are processed.
+'''
+
+import hashlib
+import json
+import os
+
+
+class RecordingChangeCache:
+    '''Class which remembers a fingerprint of the last loaded response for each plant. The
+    fingerprint is the time the recording was taken, plus a hash of the plant's reference
+    data, so a changed botanist or watering time is still loaded.'''
+
+    DEFAULT_PATH = '/tmp/recording_fingerprints.json'
+    REFERENCE_FIELDS = ('botanist', 'origin_location', 'name', 'scientific_name',
+                        'images', 'last_watered')
+
+    def __init__(self, path: str = None):
+        '''If a path is given, the fingerprints are persisted to that file as well as
+        being held in memory.'''
+        self.path = path
+        self.fingerprints = {}
+        # Responses buffered to be loaded, which are held in memory only until they are
+        self.pending = {}
+        self._load()
+
+    def _load(self) -> None:
+        '''Load the fingerprints from the file, if it exists. A corrupt file is ignored.'''
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.fingerprints = {plant_id: tuple(fingerprint)
+                                     for plant_id, fingerprint in json.load(file).items()}
+        except (ValueError, TypeError, AttributeError):
+            self.fingerprints = {}
+
+    def save(self) -> None:
+        '''Persist the fingerprints, replacing the file atomically.'''
+        if self.path is None:
+            return
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self.fingerprints, file)
+        os.replace(temporary_path, self.path)
+
+    @classmethod
+    def get_fingerprint(cls, response: dict) -> tuple[str]:
+        '''Return the fingerprint of a response: (recording_taken, reference data hash).'''
+        reference_data = {field: response.get(field)
+                          for field in cls.REFERENCE_FIELDS}
+        reference_hash = hashlib.sha1(
+            json.dumps(reference_data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return (response.get('recording_taken'), reference_hash)
+
+    @staticmethod
+    def _get_key(response: dict) -> str:
+        '''The cache key for a response. Strings are used, as JSON object keys must be.'''
+        return str(response.get('plant_id'))
+
+    def filter_changed(self, responses: list[dict]) -> list[dict]:
+        '''Return only the responses which differ from the last one loaded, or waiting to
+        be loaded, for their plant.'''
+        return [response for response in responses
+                if self.pending.get(self._get_key(response),
+                                    self.fingerprints.get(self._get_key(response)))
+                != self.get_fingerprint(response)]
+
+    def mark_pending(self, responses: list[dict]) -> None:
+        '''Remember the responses as waiting to be loaded, so they are not buffered again.
+        They are not persisted, so if the process dies first they are polled again.'''
+        for response in responses:
+            self.pending[self._get_key(response)] = self.get_fingerprint(response)
+
+    def update(self, responses: list[dict]) -> None:
+        '''Remember the responses as loaded. This should only be called once the load has
+        committed, otherwise a failed load would never be retried.'''
+        for response in responses:
+            key, fingerprint = self._get_key(response), self.get_fingerprint(response)
+            self.fingerprints[key] = fingerprint
+            if self.pending.get(key) == fingerprint:
+                del self.pending[key]
+        self.save()
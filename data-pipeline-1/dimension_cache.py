@@ -0,0 +1,87 @@
+'''
+    An in-process cache of the ids of the reference (dimension) rows in the RDS, keyed on
+    their natural keys. It is loaded in bulk with one query per table, and kept at module
+    level so it stays warm between Lambda invocations. The loader uses it to skip rows which
+    already exist and to insert plants and recordings with ids rather than lookups. Each
+    plant's last watered time is cached too, so the loader only writes real changes.
+    Natural keys are matched the way the RDS collation compares them, ignoring case and
+    trailing spaces.
+'''
+
+
+class DimensionKeyCache:
+    '''Class holding, for each reference table, a dict of natural key -> surrogate id.'''
+
+    # The first column is the id, the remaining columns make up the natural key, except for
+    # the plant's last watered time which is cached separately
+    QUERIES = {
+        'continent': 'SELECT continent_id, continent_name FROM continent;',
+        'country': 'SELECT country_id, country_name FROM country;',
+        'city': 'SELECT city_id, city_name FROM city;',
+        'botanist': '''SELECT botanist_id, botanist_name, botanist_email, botanist_phone
+                       FROM botanist;''',
+        'plant_type': 'SELECT plant_type_id, plant_type_name FROM plant_type;',
+        'plant': 'SELECT plant_id, plant_number, plant_last_watered FROM plant;',
+    }
+
+    def __init__(self):
+        '''The cache starts empty, and is loaded on first use.'''
+        self.ids = {}
+        self.last_watered = {}
+
+    def is_loaded(self) -> bool:
+        '''Whether every table has been loaded.'''
+        return all(table in self.ids for table in self.QUERIES)
+
+    def load(self, cursor, tables: list[str] = None) -> None:
+        '''Load the ids of the given tables, or of every table, replacing what was held.'''
+        for table in tables or self.QUERIES:
+            if table not in self.QUERIES:
+                raise ValueError(f'The table {table} is not a cached reference table.')
+            cursor.execute(self.QUERIES[table])
+            rows = cursor.fetchall()
+            if table == 'plant':
+                self.last_watered = {row[1]: row[2] for row in rows}
+                rows = [row[:2] for row in rows]
+            self.ids[table] = {self.normalise_key(self.get_key(row)): row[0] for row in rows}
+
+    @staticmethod
+    def get_key(row: tuple):
+        '''The natural key of a row: a single value, or a tuple if the key has several
+        columns.'''
+        return row[1] if len(row) == 2 else tuple(row[1:])
+
+    @classmethod
+    def normalise_key(cls, key):
+        '''Normalise a natural key as the default SQL Server collation compares it, so keys
+        the MERGE statements treat as equal are equal here too: strings lose their trailing
+        spaces and case.'''
+        if isinstance(key, tuple):
+            return tuple(cls.normalise_key(value) for value in key)
+        if isinstance(key, str):
+            return key.rstrip(' ').casefold()
+        return key
+
+    def contains(self, table: str, key) -> bool:
+        '''Whether a row with the natural key is cached.'''
+        return self.normalise_key(key) in self.ids.get(table, {})
+
+    def get_id(self, table: str, key) -> int:
+        '''Return the id of the row with the natural key. Raises error if it isn't cached.'''
+        try:
+            return self.ids[table][self.normalise_key(key)]
+        except KeyError as exc:
+            raise ValueError(f'No {table} with the key {key} is cached.') from exc
+
+    def get_last_watered(self, plant_number: int):
+        '''Return the last watered time stored for the plant, or None if it isn't cached.'''
+        return self.last_watered.get(plant_number)
+
+    def set_last_watered(self, plant_number: int, last_watered) -> None:
+        '''Cache the last watered time written for the plant.'''
+        self.last_watered[plant_number] = last_watered
+
+    def clear(self) -> None:
+        '''Forget every id, for example after a rolled back load, so they are reloaded.'''
+        self.ids = {}
+        self.last_watered = {}
@@ -1,39 +1,251 @@
 '''
-    The extraction part of the first data pipeline. The source of data is an API, 
-    which provided readings from on around 50 different plants. The data for each 
+    The extraction part of the first data pipeline. The source of data is an API,
+    which provided readings from on around 50 different plants. The data for each
     plant is read and stored in a Python list.
 '''
 
-from lambda_multiprocessing import Pool
-import requests
+import asyncio
+import time
+import aiohttp
+from plant_registry import PlantRegistry
+from request_policy import RequestPolicy
+from resources import ResourceManager
 
 
 class RecordingAPIExtractor:
-    '''The APIExtractor class extracts data recorded from the plants API across 
+    '''The APIExtractor class extracts data recorded from the plants API across
     all specified plant ids.'''
 
-    def __init__(self, api_url: str, min_plant_id: int = 1, max_plant_id: int = 55):
-        '''The minimum and maximum values represent the range of plant ids checked to have data.'''
+    def __init__(self, api_url: str, min_plant_id: int = 1, max_plant_id: int = 55,
+                 max_concurrency: int = 20, registry: PlantRegistry = None,
+                 policy: RequestPolicy = None, resources: ResourceManager = None):
+        '''The minimum and maximum values represent the range of plant ids checked to have data.
+        The max concurrency is the number of requests allowed in flight at once when extracting
+        asynchronously. If a registry is given, it decides which ids are requested instead of
+        the range, and is updated with the results of each extraction. The policy sets the
+        timeouts, hedging and retries used when extracting asynchronously. If resources are
+        given, their event loop and HTTP session are reused between extractions.'''
+        if max_concurrency < 1:
+            raise ValueError(
+                f'The max concurrency must be at least 1, not {max_concurrency}.')
         self.api_url = api_url
         self.min_plant_id = min_plant_id
         self.max_plant_id = max_plant_id
+        self.max_concurrency = max_concurrency
+        self.registry = registry
+        self.policy = policy if policy is not None else RequestPolicy()
+        self.resources = resources
+        self._retries_remaining = 0
 
-    def _make_request(self, plant_id: int) -> dict:
+    def _get_plant_ids(self) -> list[int]:
+        '''Return the list of plant ids to be requested.'''
+        if self.registry is not None:
+            return self.registry.get_plant_ids_to_poll()
+        return list(range(self.min_plant_id, self.max_plant_id+1))
+
+    def _filter_results(self, plant_ids: list[int], fetched_data: list[dict]) -> list[dict]:
+        '''Filter the None results out of the fetched data. If there is a registry, it is
+        told which of the requested ids responded and then saved.'''
+        if self.registry is not None:
+            found_plant_ids = [plant_id for plant_id, json_obj in zip(plant_ids, fetched_data)
+                               if json_obj is not None]
+            self.registry.record_results(plant_ids, found_plant_ids)
+            self.registry.save()
+        return [json_obj for json_obj in fetched_data if json_obj is not None]
+
+    def _make_request(self, plant_id: int, retries: int = 0) -> dict:
         '''Given a plant_id, make a get request to the endpoint and return the result.
         If the request returns anything other than a success code, None is returned; this
-        can happen if the plant_id is invalid, or if a faulty reading is made.'''
-        try:
-            request = requests.get(f"{self.api_url}{plant_id}", timeout=4)
-            if request.status_code == 200:
-                return request.json()
-            return None
-        except requests.exceptions.ReadTimeout:
-            return None
+        can happen if the plant_id is invalid, or if a faulty reading is made. As with the
+        asynchronous requests, timeouts, connection errors and server errors are retried with
+        jittered backoff, up to the given number of retries.'''
+        # Imported here as only the multiprocessing extraction needs it, and it is slow to import
+        import requests
+        attempt = 0
+        while True:
+            try:
+                response = requests.get(f"{self.api_url}{plant_id}",
+                                        timeout=self.policy.timeout_seconds)
+                if response.status_code == 200:
+                    return response.json()
+                retryable = response.status_code >= 500
+            except ValueError:
+                # A success code with a body which isn't JSON is a faulty reading
+                return None
+            except requests.exceptions.RequestException:
+                retryable = True
+            if not retryable or attempt >= retries:
+                return None
+            time.sleep(self.policy.get_backoff_seconds(attempt))
+            attempt += 1
+
+    def _share_retry_budget(self, plant_ids: list[int]) -> list[int]:
+        '''Split the retry budget of an extraction between its plant ids. The worker
+        processes can't share a budget, so each request is given its part up front.'''
+        budget = self.policy.get_retry_budget(len(plant_ids))
+        share, remainder = divmod(budget, max(len(plant_ids), 1))
+        return [share + (index < remainder) for index in range(len(plant_ids))]
 
     def extract_api_data(self):
         '''Extract the endpoint data for all ids in the specified range. Multiprocessing
         is used since the API can be quite slow. None results are filtered out the final result.'''
-        plant_ids = list(range(self.min_plant_id, self.max_plant_id+1))
+        from lambda_multiprocessing import Pool
+        plant_ids = self._get_plant_ids()
         with Pool() as p:
-            fetched_data = p.map(self._make_request, plant_ids)
-        return [json_obj for json_obj in fetched_data if json_obj is not None]
+            fetched_data = p.starmap(self._make_request,
+                                     zip(plant_ids, self._share_retry_budget(plant_ids)))
+        return self._filter_results(plant_ids, fetched_data)
+
+    def _try_use_retry(self) -> bool:
+        '''Take one retry from the budget of the current extraction, if any remain.'''
+        if self._retries_remaining <= 0:
+            return False
+        self._retries_remaining -= 1
+        return True
+
+    async def _request_once(self, session: aiohttp.ClientSession,
+                            semaphore: asyncio.Semaphore, plant_id: int,
+                            sent: asyncio.Event = None) -> tuple[bool, dict]:
+        '''Make a single request for a plant. Returns whether the failure is worth retrying,
+        and the data. Timeouts, connection errors and server errors can be retried, whereas any
+        other non-success code (such as an invalid plant_id), or a body which isn't JSON, is
+        final. If an event is given, it is set once the request holds the semaphore and is sent.'''
+        async with semaphore:
+            if sent is not None:
+                sent.set()
+            start = time.monotonic()
+            try:
+                timeout = aiohttp.ClientTimeout(total=self.policy.timeout_seconds)
+                async with session.get(f"{self.api_url}{plant_id}", timeout=timeout) as response:
+                    if response.status == 200:
+                        try:
+                            data = await response.json()
+                        except (ValueError, aiohttp.ContentTypeError):
+                            # A success code with a body which isn't JSON is a faulty reading
+                            data = None
+                        self.policy.record_latency(time.monotonic() - start)
+                        return False, data
+                    self.policy.record_latency(time.monotonic() - start)
+                    return response.status >= 500, None
+            except asyncio.TimeoutError:
+                # Leaving timeouts out would make the slowest requests look faster than they are
+                self.policy.record_latency(time.monotonic() - start)
+                return True, None
+            except aiohttp.ClientError:
+                return True, None
+
+    async def _make_hedged_request(self, session: aiohttp.ClientSession,
+                                   semaphore: asyncio.Semaphore, plant_id: int) -> tuple[bool, dict]:
+        '''Make a request for a plant, and if it hasn't finished within the hedge delay of
+        being sent send a duplicate request. Time spent waiting for the semaphore doesn't
+        count, so queued requests are not hedged. The first final result is used and the other
+        request cancelled.'''
+        sent = asyncio.Event()
+        tasks = {asyncio.ensure_future(self._request_once(session, semaphore, plant_id, sent))}
+        # asyncio.wait doesn't cancel what it waits on, so if this is cancelled by the
+        # deadline every request it started is cancelled here, rather than left running
+        try:
+            waiting_to_send = asyncio.ensure_future(sent.wait())
+            try:
+                await asyncio.wait(tasks | {waiting_to_send},
+                                   return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiting_to_send.cancel()
+            done, pending = await asyncio.wait(tasks, timeout=self.policy.get_hedge_delay())
+            if not done and self._try_use_retry():
+                hedge = asyncio.ensure_future(self._request_once(session, semaphore, plant_id))
+                tasks.add(hedge)
+                pending.add(hedge)
+            result = (True, None)
+            while pending and not done:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if not result[0]:
+                        return result
+                done = set()
+            for task in done:
+                result = task.result()
+            return result
+        finally:
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def _make_request_async(self, session: aiohttp.ClientSession,
+                                  semaphore: asyncio.Semaphore, plant_id: int) -> dict:
+        '''The asynchronous equivalent of _make_request. The semaphore bounds how many
+        requests are in flight at once. Slow requests are hedged, and failed requests are
+        retried with jittered backoff while the retry budget lasts. None is returned if no
+        data could be fetched.'''
+        attempt = 0
+        while True:
+            retryable, data = await self._make_hedged_request(session, semaphore, plant_id)
+            if not retryable or not self._try_use_retry():
+                return data
+            await asyncio.sleep(self.policy.get_backoff_seconds(attempt))
+            attempt += 1
+
+    async def _fetch_as_completed(self, session: aiohttp.ClientSession, plant_ids: list[int],
+                                  on_result=None) -> list[dict]:
+        '''Request every plant id concurrently over the given client session. If on_result is
+        given it is awaited with each response as soon as it arrives. Requests still running
+        when the deadline passes are cancelled and count as None. Returns the fetched data in
+        the same order as the plant ids.'''
+        self._retries_remaining = self.policy.get_retry_budget(len(plant_ids))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = {asyncio.ensure_future(self._make_request_async(session, semaphore, plant_id)): index
+                 for index, plant_id in enumerate(plant_ids)}
+        fetched_data = [None] * len(plant_ids)
+
+        async def handle(finished_tasks):
+            for task in finished_tasks:
+                fetched_data[tasks[task]] = task.result()
+                if on_result is not None and task.result() is not None:
+                    await on_result(task.result())
+
+        deadline = time.monotonic() + self.policy.deadline_seconds
+        pending = set(tasks)
+        while pending and time.monotonic() < deadline:
+            done, pending = await asyncio.wait(pending, timeout=deadline - time.monotonic(),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            await handle(done)
+        # Requests which finished while on_result was running are kept, the rest cancelled
+        finished = {task for task in pending if task.done()}
+        for task in pending - finished:
+            task.cancel()
+        await asyncio.gather(*(pending - finished), return_exceptions=True)
+        await handle(finished)
+        return fetched_data
+
+    async def _gather_api_data(self, plant_ids: list[int], on_result=None) -> list[dict]:
+        '''Request every plant id concurrently over a single pooled client session. If there
+        are shared resources their session is reused, otherwise a session is made and closed.'''
+        if self.resources is not None:
+            session = await self.resources.get_http_session()
+            return await self._fetch_as_completed(session, plant_ids, on_result)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await self._fetch_as_completed(session, plant_ids, on_result)
+
+    async def stream_api_data(self, on_result) -> None:
+        '''Extract the endpoint data for all ids, awaiting on_result with each response as
+        soon as it arrives instead of collecting them. If on_result is slow, for example
+        because it puts to a full queue, requests already in flight carry on regardless.
+        When there are shared resources this must run on their event loop.'''
+        plant_ids = self._get_plant_ids()
+        fetched_data = await self._gather_api_data(plant_ids, on_result)
+        self._filter_results(plant_ids, fetched_data)
+
+    def extract_api_data_async(self) -> list[dict]:
+        '''Extract the endpoint data for all ids in the specified range using asyncio, rather
+        than a process pool. All requests share one connection pool, so connections are reused
+        between plants. None results are filtered out the final result.'''
+        plant_ids = self._get_plant_ids()
+        if self.resources is not None:
+            fetched_data = self.resources.run(self._gather_api_data(plant_ids))
+        else:
+            fetched_data = asyncio.run(self._gather_api_data(plant_ids))
+        return self._filter_results(plant_ids, fetched_data)
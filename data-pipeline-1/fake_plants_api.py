@@ -0,0 +1,172 @@
+'''
+    A local stand-in for the plants API, used by the tests and benchmarks. It serves plant
+    readings in the same format as the real API, with configurable latency, error rates,
+    timeouts and number of plants, so the extractor can be exercised under realistic
+    conditions without relying on the real API.
+'''
+
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+
+
+BOTANISTS = [
+    {"email": "gertrude.jekyll@lnhm.co.uk", "name": "Gertrude Jekyll",
+     "phone": "001-481-273-3691x127"},
+    {"email": "carl.linnaeus@lnhm.co.uk", "name": "Carl Linnaeus",
+     "phone": "(146)994-1635x35992"},
+    {"email": "eliza.andrews@lnhm.co.uk", "name": "Eliza Andrews",
+     "phone": "(846)669-6651x75948"},
+]
+LOCATIONS = [
+    ["33.95015", "-118.03917", "South Whittier", "US", "America/Los_Angeles"],
+    ["7.65649", "4.92235", "Efon-Alaaye", "NG", "Africa/Lagos"],
+    ["-19.32556", "-41.25528", "Resplendor", "BR", "America/Sao_Paulo"],
+    ["13.70167", "-89.10944", "Ilopango", "SV", "America/El_Salvador"],
+    ["5.27247", "-3.59625", "Bonoua", "CI", "Africa/Abidjan"],
+    ["51.30001", "13.10984", "Oschatz", "DE", "Europe/Berlin"],
+    ["29.65163", "-82.32483", "Gainesville", "US", "America/New_York"],
+    ["32.5007", "-94.74049", "Longview", "US", "America/Chicago"],
+]
+PLANT_TYPES = [
+    ("Venus flytrap", None),
+    ("Corpse flower", None),
+    ("Rafflesia arnoldii", None),
+    ("Black bat flower", None),
+    ("Colocasia Esculenta", ["Colocasia esculenta"]),
+    ("Brugmansia X Candida", None),
+    ("Palm Tree", ["Arecaceae"]),
+]
+
+
+class FakePlantsAPI:
+    '''Class which runs a fake plants API in a background thread. Plant ids from 1 to the
+    plant count exist, any other id returns a 404. Each request waits for a latency drawn
+    from a log-normal distribution, and may fail with a 500 or hang past the client's
+    timeout, at the given rates.'''
+
+    def __init__(self, plant_count: int = 55, latency_median_seconds: float = 0.0,
+                 latency_sigma: float = 0.5, error_rate: float = 0.0,
+                 timeout_rate: float = 0.0, timeout_seconds: float = 10,
+                 seed: int = None):
+        '''The latency sigma controls how heavy the tail of the latency distribution is.
+        The timeout seconds is how long a request which "times out" hangs for.'''
+        if not 0 <= error_rate <= 1 or not 0 <= timeout_rate <= 1:
+            raise ValueError('The error and timeout rates must be between 0 and 1.')
+        self.plant_count = plant_count
+        self.latency_median_seconds = latency_median_seconds
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.request_count = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        '''The base url of the API, to which a plant id is appended.'''
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/plants/'
+
+    def make_plant(self, plant_id: int) -> dict:
+        '''Return a reading for a plant in the format of the real API. The reference data
+        is fixed for each plant id, while the reading itself changes.'''
+        botanist = BOTANISTS[plant_id % len(BOTANISTS)]
+        location = LOCATIONS[plant_id % len(LOCATIONS)]
+        name, scientific_name = PLANT_TYPES[plant_id % len(PLANT_TYPES)]
+        now = datetime.now()
+        plant = {
+            "botanist": botanist,
+            "last_watered": (now - timedelta(hours=plant_id % 24 + 1))
+            .strftime("%a, %d %b %Y %H:%M:%S GMT"),
+            "name": name,
+            "origin_location": location,
+            "plant_id": plant_id,
+            "recording_taken": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "soil_moisture": self._draw(lambda r: r.uniform(15, 95)),
+            "temperature": self._draw(lambda r: r.uniform(8, 14)),
+        }
+        if scientific_name is not None:
+            plant["scientific_name"] = scientific_name
+        return plant
+
+    def _draw(self, sample):
+        '''Draw from the shared random generator, which is not thread safe.'''
+        with self.random_lock:
+            return sample(self.random)
+
+    def _get_latency(self) -> float:
+        '''Return a latency drawn from a log-normal distribution around the median.'''
+        if self.latency_median_seconds <= 0:
+            return 0
+        return self._draw(lambda r: self.latency_median_seconds *
+                          r.lognormvariate(0, self.latency_sigma))
+
+    def _make_handler(self):
+        '''Build the request handler class, bound to this API's settings.'''
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            '''Handles GET /plants/<plant_id>.'''
+            protocol_version = 'HTTP/1.1'
+
+            def _send(self, status: int, body: dict) -> None:
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up, for example a hedged or timed out request
+                    self.close_connection = True
+
+            def do_GET(self):
+                api.request_count += 1
+                prefix, _, plant_id = self.path.rpartition('/')
+                if prefix != '/plants' or not plant_id.isdigit() \
+                        or not 1 <= int(plant_id) <= api.plant_count:
+                    self._send(404, {"error": "plant not found"})
+                    return
+                outcome = api._draw(lambda r: r.random())
+                if outcome < api.timeout_rate:
+                    time.sleep(api.timeout_seconds)
+                else:
+                    time.sleep(api._get_latency())
+                if outcome >= 1 - api.error_rate:
+                    self._send(500, {"error": "faulty reading"})
+                    return
+                self._send(200, api.make_plant(int(plant_id)))
+
+            def log_message(self, *args):
+                '''Silence the default logging of every request.'''
+
+        return Handler
+
+    def start(self) -> 'FakePlantsAPI':
+        '''Start serving on a free local port in a background thread.'''
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        '''Stop serving.'''
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
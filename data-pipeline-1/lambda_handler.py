@@ -1,5 +1,9 @@
 import logging
-from pipeline import run_api_pipeline
+from os import environ as ENV
+from pipeline import MICRO_BATCHER, run_api_pipeline
+
+# Installed once per process, when Lambda imports the handler on the main thread
+MICRO_BATCHER.install_exit_handlers()
 
 
 def lambda_handler(event: None, context: None):
@@ -8,7 +12,8 @@ def lambda_handler(event: None, context: None):
     logger.setLevel("INFO")
     try:
         logger.info("Running...")
-        run_api_pipeline()
+        run_api_pipeline(streaming=ENV.get('PIPELINE_MODE') == 'streaming',
+                         batch_validation=ENV.get('VALIDATION_MODE') == 'batch')
         logger.info("Successful")
         return {
             'status_code': 200
@@ -1,17 +1,36 @@
 '''
     The loading part of the first data pipeline. This script takes the plant data and 
     loads it to the short-term storage solution (RDS). Reference tables are added first, 
-    then the recording data.
+    then the recording data. Only reference rows missing from the key cache are merged, and
+    plants and recordings are inserted with the cached ids. A plant is only updated when its
+    last watered time has changed, and each change is kept as a watering event.
 '''
 
 from os import environ as ENV
-from dotenv import load_dotenv
 import pymssql
+from dimension_cache import DimensionKeyCache
+from load_spool import LoadSpool
 from models import Plant
 
 
+def make_connection() -> pymssql.Connection:
+    '''Get a new connection to the RDS, using credentials from the .env file.'''
+    # Imported here as the .env file is only used outside of the Lambda
+    from dotenv import load_dotenv
+    load_dotenv()
+    return pymssql.connect(
+        server=ENV['DB_HOST'],
+        user=ENV['DB_USERNAME'],
+        password=ENV['DB_PASSWORD'],
+        database=ENV['DB_NAME'],
+        port=ENV['DB_PORT']
+    )
+
+
 class DatabaseManager:
-    '''Load class used to load plant data to the RDS.'''
+    '''Load class used to load plant data to the RDS. This is the SQL Server storage
+    backend: another backend subclasses it, replacing the statements below, the recording
+    row and parameter limit, the database error types and _make_connection.'''
 
     CONTINENT_UPSERT = '''
         MERGE INTO continent AS target
@@ -66,105 +85,308 @@ class DatabaseManager:
             INSERT (plant_type_name, plant_type_scientific_name, plant_type_image_url)
             VALUES (source.plant_type_name, source.plant_type_scientific_name, source.plant_type_image_url);
     '''
-    PLANT_UPSERT = '''
-        MERGE INTO plant AS target
-        USING (
-            SELECT 
-                %s AS plant_number, 
-                (SELECT plant_type_id FROM plant_type WHERE plant_type_name = %s) AS plant_type_id, 
-                (SELECT botanist_id FROM botanist WHERE botanist_name = %s) AS botanist_id,
-                (SELECT city_id FROM city WHERE city_name = %s) AS city_id,
-                %s AS plant_last_watered
-        ) AS source
-        ON target.plant_number = source.plant_number
-        WHEN MATCHED THEN
-            UPDATE SET target.plant_last_watered = source.plant_last_watered
+    PLANT_INSERT = '''
+        INSERT INTO plant (plant_type_id, plant_number, botanist_id, city_id, plant_last_watered)
+        VALUES (%s, %s, %s, %s, %s);
+    '''
+    PLANT_UPDATE = '''
+        UPDATE plant SET plant_last_watered = %s
+        WHERE plant_id = %s;
+    '''
+    WATERING_EVENT_INSERT = '''
+        MERGE INTO watering_event AS target
+        USING (SELECT %s AS plant_id, %s AS watered_at) AS source
+        ON target.plant_id = source.plant_id
+            AND target.watered_at = source.watered_at
         WHEN NOT MATCHED THEN
-            INSERT (plant_type_id, plant_number, botanist_id, city_id, plant_last_watered)
-            VALUES (source.plant_type_id, source.plant_number, source.botanist_id, source.city_id, source.plant_last_watered);
+            INSERT (plant_id, watered_at)
+            VALUES (source.plant_id, source.watered_at);
     '''
     RECORDING_INSERT = '''
         INSERT INTO record (plant_id, record_soil_moisture, record_temperature, record_timestamp)
-        SELECT plant_id, %s, %s, %s FROM plant
-        WHERE plant_number = %s;
+        VALUES {rows};
     '''
+    RECORDING_ROW = '(%s, %s, %s, %s)'
+    # SQL Server allows at most 2100 parameters per statement and 1000 rows per VALUES
+    MAX_PARAMETERS = 2100
+    MAX_VALUES_ROWS = 1000
+    DATABASE_ERROR = pymssql.Error
+    # Errors from losing or failing to reach the database, which a later retry can fix.
+    # Anything else, such as a constraint violation, fails the same way every time
+    TRANSIENT_ERRORS = (pymssql.OperationalError, pymssql.InterfaceError)
+    INTEGRITY_ERROR = pymssql.IntegrityError
 
-    def __init__(self, plants: list[Plant]):
+    def __init__(self, plants: list[Plant], connection: pymssql.Connection = None,
+                 key_cache: DimensionKeyCache = None, spool: LoadSpool = None):
+        '''If a connection is given it is borrowed, for example from a warm Lambda, and
+        is left open after loading. Otherwise a new connection is made and closed. A key
+        cache kept between invocations can be given, otherwise an empty one is used. If a
+        spool is given, batches which fail to load are spooled rather than dropped.'''
         self.plants = plants
-        self.connection = self._make_connection()
+        self.key_cache = DimensionKeyCache() if key_cache is None else key_cache
+        self.deduplicated_counts = {}
+        self.spool = spool
+        self.owns_connection = connection is None
+        self.connection = self._make_connection() if connection is None else connection
         self.cursor = self.connection.cursor()
 
     def _make_connection(self):
         '''Get the connection to the RDS, using credentials from the .env file.'''
-        load_dotenv()
-        return pymssql.connect(
-            server=ENV['DB_HOST'],
-            user=ENV['DB_USERNAME'],
-            password=ENV['DB_PASSWORD'],
-            database=ENV['DB_NAME'],
-            port=ENV['DB_PORT']
-        )
-
-    def _add_new_locations(self):
+        return make_connection()
+
+    def _get_distinct_values(self, table: str, values: list[tuple], get_key) -> list[tuple]:
+        '''Collapse the values to one per natural key, compared as the RDS does, keeping the
+        first, and count how many duplicates were dropped for the table.'''
+        distinct_values = {}
+        for value in values:
+            distinct_values.setdefault(self.key_cache.normalise_key(get_key(value)), value)
+        self.deduplicated_counts[table] = len(values) - len(distinct_values)
+        return list(distinct_values.values())
+
+    def _add_new_rows(self, table: str, query: str, values: list[tuple], get_key) -> None:
+        '''Merge the distinct rows whose natural key is not in the key cache, then reload the
+        ids of the table so the new rows are cached. Nothing is sent if every row is cached.
+        Note, the cursor commits must be done externally.'''
+        new_values = [value for value in self._get_distinct_values(table, values, get_key)
+                      if not self.key_cache.contains(table, get_key(value))]
+        if new_values:
+            self.cursor.executemany(query, new_values)
+            self.key_cache.load(self.cursor, [table])
+
+    def _add_new_locations(self, plants: list[Plant]):
         '''Merge any new locations to the database. A continent is considered new
         if the continent name doesn't already exist. A country is considered new
         if the country name doesn't already exist.A city is considered new
         if the city name doesn't already exist.
         Note, the cursor commits must be done externally.'''
-        locations = [plant.get_location() for plant in self.plants]
+        locations = [plant.get_location() for plant in plants]
         # Continents
         continent_values = [location.get_continent_values()
                             for location in locations]
-        self.cursor.executemany(self.CONTINENT_UPSERT, continent_values)
+        self._add_new_rows('continent', self.CONTINENT_UPSERT, continent_values,
+                           lambda value: value[0])
         # Countries
         country_values = [location.get_country_values()
                           for location in locations]
-        self.cursor.executemany(self.COUNTRY_UPSERT, country_values)
+        self._add_new_rows('country', self.COUNTRY_UPSERT, country_values,
+                           lambda value: value[0])
         # City
         city_values = [location.get_city_values() for location in locations]
-        self.cursor.executemany(self.CITY_UPSERT, city_values)
+        self._add_new_rows('city', self.CITY_UPSERT, city_values, lambda value: value[0])
 
-    def _add_new_botanists(self):
+    def _add_new_botanists(self, plants: list[Plant]):
         '''Merge any new botanists to the database. A botanist is considered new
         if their name, email and phone number do not exist.
         Note, the cursor commits must be done externally.'''
         botanist_values = [plant.get_botanist().get_values()
-                           for plant in self.plants]
-        self.cursor.executemany(self.BOTANIST_UPSERT, botanist_values)
+                           for plant in plants]
+        self._add_new_rows('botanist', self.BOTANIST_UPSERT, botanist_values,
+                           lambda value: value)
 
-    def _add_new_plant_type(self):
+    def _add_new_plant_type(self, plants: list[Plant]):
         '''Merge any new plant types to the database. A plant type is considered new
         if the plant name (not scientific name)
         Note, the cursor commits must be done externally.'''
         plant_type_values = [plant.get_plant_type().get_values()
-                             for plant in self.plants]
-        self.cursor.executemany(self.PLANT_TYPE_UPSERT, plant_type_values)
+                             for plant in plants]
+        self._add_new_rows('plant_type', self.PLANT_TYPE_UPSERT, plant_type_values,
+                           lambda value: value[0])
 
-    def _add_new_plants(self):
-        '''Merge any new plants to the database. A plant is considered new is the 
-        plant_number does not yet exist. If the plant_number does already exist in the database,
-        update the last_watered field.
+    def _add_new_plants(self, plants: list[Plant]):
+        '''Insert any new plants to the database with the cached reference ids. A plant is
+        considered new if the plant_number is not cached. If the plant_number does already
+        exist, update the last_watered field, but only if it differs from the cached value.
+        Every new last_watered in the batch is also added as a watering event, not only the
+        latest, so a watering between two polls in one batch is kept.
         Note, the cursor commits must be done externally.'''
-        plant_values = [plant.get_values() for plant in self.plants]
-        self.cursor.executemany(self.PLANT_UPSERT, plant_values)
+        insert_values, update_values, watering_values = [], [], []
+        # A plant polled twice in a batch is written once, with its latest values
+        latest_plants = {plant.get_values()[0]: plant for plant in plants}
+        self.deduplicated_counts['plant'] = len(plants) - len(latest_plants)
+        waterings = {}
+        for plant in plants:
+            plant_number, _, _, _, last_watered = plant.get_values()
+            if last_watered not in waterings.setdefault(plant_number, []):
+                waterings[plant_number].append(last_watered)
+        for plant in latest_plants.values():
+            plant_number, plant_type_name, _, city_name, last_watered = plant.get_values()
+            if self.key_cache.contains('plant', plant_number):
+                cached_last_watered = self.key_cache.get_last_watered(plant_number)
+                plant_id = self.key_cache.get_id('plant', plant_number)
+                watering_values += [(plant_id, watered) for watered in waterings[plant_number]
+                                    if watered != cached_last_watered]
+                if last_watered != cached_last_watered:
+                    update_values.append((last_watered, plant_id))
+                    self.key_cache.set_last_watered(plant_number, last_watered)
+                continue
+            insert_values.append((
+                self.key_cache.get_id('plant_type', plant_type_name),
+                plant_number,
+                self.key_cache.get_id('botanist', plant.get_botanist().get_values()),
+                self.key_cache.get_id('city', city_name),
+                last_watered,
+            ))
+        if insert_values:
+            self.cursor.executemany(self.PLANT_INSERT, insert_values)
+            self.key_cache.load(self.cursor, ['plant'])
+            watering_values += [(self.key_cache.get_id('plant', plant_number), watered)
+                                for _, plant_number, _, _, _ in insert_values
+                                for watered in waterings[plant_number]]
+        if update_values:
+            self.cursor.executemany(self.PLANT_UPDATE, update_values)
+        if watering_values:
+            self.cursor.executemany(self.WATERING_EVENT_INSERT, watering_values)
 
-    def _add_new_recordings(self):
-        '''Insert the new recordings to the database. 
+    def _add_new_recordings(self, plants: list[Plant]):
+        '''Insert the new recordings to the database, with the cached plant ids. The
+        recordings are sent as multi-row inserts, each as large as SQL Server allows, so a
+        batch of any size takes only a few statements.
         Note, the cursor commits must be done externally.'''
-        recording_values = [plant.get_record_values() for plant in self.plants]
-        self.cursor.executemany(self.RECORDING_INSERT, recording_values)
+        recording_values = []
+        for plant in plants:
+            soil_moisture, temperature, taken, plant_number = plant.get_record_values()
+            recording_values.append((self.key_cache.get_id('plant', plant_number),
+                                     soil_moisture, temperature, taken))
+        chunk_size = self.get_chunk_size(len(recording_values[0]) if recording_values else 1)
+        for start in range(0, len(recording_values), chunk_size):
+            chunk = recording_values[start:start + chunk_size]
+            query = self.RECORDING_INSERT.format(rows=', '.join([self.RECORDING_ROW] * len(chunk)))
+            self.cursor.execute(query, tuple(value for row in chunk for value in row))
+
+    @classmethod
+    def get_chunk_size(cls, columns: int) -> int:
+        '''The most rows with the given number of columns which fit in one multi-row insert.'''
+        return min(cls.MAX_VALUES_ROWS, (cls.MAX_PARAMETERS - 1) // columns)
 
-    def load_all(self) -> None:
-        '''Connect to the database and load the plant data passed at instantiation.'''
+    def _rollback(self) -> None:
+        '''Roll back a failed load, so a borrowed connection is left usable. A connection
+        which has dropped cannot be rolled back, and is replaced when it is next checked.'''
+        # Ids cached during the failed load may belong to rows which were rolled back
+        self.key_cache.clear()
         try:
-            self._add_new_botanists()
-            self._add_new_locations()
-            self._add_new_plant_type()
-            self._add_new_plants()
-            self._add_new_recordings()
+            self.connection.rollback()
+        except self.DATABASE_ERROR:
+            pass
+
+    def _commit_batch(self, plants: list[Plant]) -> None:
+        '''Load a batch of plants and commit. A batch which fails is rolled back, and its
+        error raised. A batch which breaks a constraint may have been loaded with a stale key
+        cache, for example if another writer has added a plant since it was loaded, so it is
+        retried once with the cache reloaded.'''
+        try:
+            self._try_commit_batch(plants)
+        except self.INTEGRITY_ERROR as e:
+            # The failed load cleared the key cache, so the retry reloads it
+            print(f"Retrying batch with the key cache reloaded after: {e}")
+            self._try_commit_batch(plants)
+        self._report_deduplicated()
+
+    def _try_commit_batch(self, plants: list[Plant]) -> None:
+        '''Load a batch of plants and commit once, rolling back and raising if it fails.'''
+        try:
+            if not self.key_cache.is_loaded():
+                self.key_cache.load(self.cursor)
+            # Reference tables are added in dependency order, before the plants using them
+            self._add_new_locations(plants)
+            self._add_new_botanists(plants)
+            self._add_new_plant_type(plants)
+            self._add_new_plants(plants)
+            self._add_new_recordings(plants)
             self.connection.commit()
+        except BaseException:
+            # Including SystemExit, so a load interrupted by SIGTERM leaves no open transaction
+            self._rollback()
+            raise
+
+    def is_transient(self, error: Exception) -> bool:
+        '''Whether a load failed because the database could not be reached, so a later
+        retry can succeed.'''
+        return isinstance(error, self.TRANSIENT_ERRORS)
+
+    def spool_batch(self, plants: list[Plant], quarantine: bool = False) -> bool:
+        '''Spool a batch of plants to be replayed later, or quarantine a batch which can never
+        be loaded so it is kept without being replayed. Returns whether it was written.'''
+        if self.spool is None:
+            return False
+        try:
+            self.spool.write(plants, quarantine=quarantine)
+        except OSError as e:
+            print(f"Error spooling batch: {e}")
+            return False
+        if quarantine:
+            print(f"Quarantined {len(plants)} plants which cannot be loaded")
+        else:
+            print(f"Spooled {len(plants)} plants to be loaded on the next run")
+        return True
+
+    def load_batch(self, plants: list[Plant]) -> bool:
+        '''Load a batch of plants and commit, leaving the connection open for further
+        batches. If there is a spool, a batch which fails because the database could not be
+        reached is spooled, and a batch which fails for any other reason is quarantined, as
+        replaying it would only fail again. Returns whether the batch was committed, spooled
+        or quarantined.'''
+        try:
+            self._commit_batch(plants)
+            return True
         except Exception as e:
             print(f"Error in load_all: {e}")
-        finally:
-            self.cursor.close()
+            return self.spool_batch(plants, quarantine=not self.is_transient(e))
+
+    def replay_spool(self) -> bool:
+        '''Load the spooled batches one at a time, oldest first, deleting each once it is
+        committed. A batch which fails for any other reason than the database being
+        unreachable has the failure counted, and is quarantined once it has failed too many
+        times, without holding up the batches after it. Returns False if the replay was
+        stopped because the database could not be reached.'''
+        if self.spool is None:
+            return True
+        replayed_plants, replayed_files = 0, 0
+        for path in self.spool.get_files():
+            plants = self.spool.read([path])
+            if not plants:
+                # A batch which can't be read has been quarantined, not replayed
+                continue
+            try:
+                self._commit_batch(plants)
+            except Exception as e:
+                print(f"Error replaying spooled batch {path}: {e}")
+                if self.is_transient(e):
+                    return False
+                self.spool.record_failure(path)
+                continue
+            self.spool.remove([path])
+            replayed_plants += len(plants)
+            replayed_files += 1
+        if replayed_files:
+            print(f"Replayed {replayed_plants} spooled plants from {replayed_files} batches")
+        return True
+
+    def replay_and_load(self, plants: list[Plant]) -> bool:
+        '''Replay the spool, then load the plants. If the database could not be reached for
+        the replay, the plants are spooled behind the older batches without trying them.
+        Returns whether the plants were committed or spooled.'''
+        if not self.replay_spool():
+            return self.spool_batch(plants)
+        return self.load_batch(plants)
+
+    def _report_deduplicated(self) -> None:
+        '''Print how many duplicate rows were dropped from the last batch.'''
+        total = sum(self.deduplicated_counts.values())
+        if total:
+            counts = ', '.join(f'{table}: {count}'
+                               for table, count in self.deduplicated_counts.items() if count)
+            print(f"Deduplicated {total} rows ({counts})")
+
+    def close(self) -> None:
+        '''Close the cursor, and the connection unless it was borrowed.'''
+        self.cursor.close()
+        if self.owns_connection:
             self.connection.close()
+
+    def load_all(self) -> bool:
+        '''Connect to the database and load the plant data passed at instantiation, after
+        any spooled batches. Returns whether the data was committed or spooled.'''
+        try:
+            return self.replay_and_load(self.plants)
+        finally:
+            self.close()
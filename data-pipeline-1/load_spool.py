@@ -0,0 +1,161 @@
+'''
+    A local write-ahead spool for the loading part of the first data pipeline. When a batch
+    of plants can't be committed to the RDS, for example during a failover, it is written to
+    a compressed NDJSON file rather than dropped. The next run replays the spooled batches one
+    by one before loading new data. A batch which keeps failing is quarantined rather than
+    replayed forever. The spool has a size cap, and the oldest batches are evicted when it is
+    exceeded.
+'''
+
+from datetime import datetime
+import gzip
+import json
+import os
+import re
+import time
+from models import Botanist, Location, Recording, PlantType, Plant
+
+
+def plant_to_dict(plant: Plant) -> dict:
+    '''Convert a plant into a JSON serialisable dict of its cleaned values.'''
+    plant_number, _, _, _, last_watered = plant.get_values()
+    soil_moisture, temperature, taken, _ = plant.get_record_values()
+    city, latitude, longitude, country = plant.get_location().get_city_values()
+    _, capital, continent = plant.get_location().get_country_values()
+    return {
+        'plant_number': plant_number,
+        'last_watered': last_watered.isoformat(),
+        'botanist': list(plant.get_botanist().get_values()),
+        'location': [latitude, longitude, city, country, continent, capital],
+        'record': [soil_moisture, temperature, taken.isoformat()],
+        'plant_type': list(plant.get_plant_type().get_values()),
+    }
+
+
+def dict_to_plant(plant_dict: dict) -> Plant:
+    '''Rebuild a plant from a dict made by plant_to_dict. The values were cleaned before
+    they were spooled, so they are not checked again.'''
+    soil_moisture, temperature, taken = plant_dict['record']
+    return Plant.from_values(
+        plant_number=plant_dict['plant_number'],
+        last_watered=datetime.fromisoformat(plant_dict['last_watered']),
+        botanist=Botanist.from_values(*plant_dict['botanist']),
+        location=Location.from_values(*plant_dict['location']),
+        record=Recording.from_values(soil_moisture, temperature,
+                                     datetime.fromisoformat(taken)),
+        plant_type=PlantType.from_values(*plant_dict['plant_type']),
+    )
+
+
+class LoadSpool:
+    '''Class which spools failed batches of plants to a directory, one gzipped NDJSON file
+    per batch. Files are named by the time they were written, so they sort oldest first, and
+    carry the number of failed replays. Quarantined batches are moved to a subdirectory, where
+    they are kept for inspection but never replayed.'''
+
+    DEFAULT_DIRECTORY = '/tmp/load_spool'
+    SUFFIX = '.ndjson.gz'
+    QUARANTINE = 'quarantine'
+    MAX_ATTEMPTS = 3
+    ATTEMPTS_PATTERN = re.compile(r'\.attempt(\d+)' + re.escape(SUFFIX) + '$')
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, max_bytes: int = 50_000_000):
+        '''The max bytes is the most disk space the spool may use. Lambda's /tmp is 512MB by
+        default, and shared with the other caches.'''
+        if max_bytes <= 0:
+            raise ValueError('The spool size cap must be positive.')
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def _list(cls, directory: str) -> list[str]:
+        '''Return the paths of the batches in a directory, oldest first.'''
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name)
+                for name in sorted(os.listdir(directory)) if name.endswith(cls.SUFFIX)]
+
+    def get_files(self) -> list[str]:
+        '''Return the paths of the spooled batches to replay, oldest first.'''
+        return self._list(self.directory)
+
+    def get_quarantined_files(self) -> list[str]:
+        '''Return the paths of the quarantined batches, oldest first.'''
+        return self._list(os.path.join(self.directory, self.QUARANTINE))
+
+    @classmethod
+    def get_attempts(cls, path: str) -> int:
+        '''The number of times a spooled batch has failed to replay.'''
+        match = cls.ATTEMPTS_PATTERN.search(path)
+        return int(match.group(1)) if match else 0
+
+    def record_failure(self, path: str) -> str:
+        '''Count a failed replay of a batch. A batch which has failed the max attempts is
+        quarantined. Returns the new path of the batch.'''
+        attempts = self.get_attempts(path) + 1
+        name = self.ATTEMPTS_PATTERN.sub(self.SUFFIX, os.path.basename(path))
+        name = name[:-len(self.SUFFIX)] + f'.attempt{attempts}{self.SUFFIX}'
+        new_path = os.path.join(self.directory, name)
+        os.replace(path, new_path)
+        if attempts >= self.MAX_ATTEMPTS:
+            print(f"Quarantining spooled batch {path} after {attempts} failed replays")
+            return self.quarantine(new_path)
+        return new_path
+
+    def quarantine(self, path: str) -> str:
+        '''Move a spooled batch into quarantine, so it is kept but never replayed. Returns
+        the new path of the batch.'''
+        directory = os.path.join(self.directory, self.QUARANTINE)
+        os.makedirs(directory, exist_ok=True)
+        new_path = os.path.join(directory, os.path.basename(path))
+        os.replace(path, new_path)
+        return new_path
+
+    def write(self, plants: list[Plant], quarantine: bool = False) -> None:
+        '''Spool a batch of plants, or quarantine it if it can never be loaded. The file is
+        written under a temporary name and renamed, so a crash never leaves a partial batch
+        to be replayed.'''
+        if not plants:
+            return
+        directory = os.path.join(self.directory, self.QUARANTINE) if quarantine \
+            else self.directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{time.time_ns():020d}-{os.getpid()}{self.SUFFIX}')
+        with gzip.open(f'{path}.tmp', 'wt', encoding='utf-8') as file:
+            for plant in plants:
+                file.write(json.dumps(plant_to_dict(plant)) + '\n')
+        os.replace(f'{path}.tmp', path)
+        self.evict()
+
+    def evict(self) -> int:
+        '''Delete the oldest batches, spooled or quarantined, until the spool is within its
+        size cap. Returns the number of batches deleted.'''
+        files = sorted(self.get_files() + self.get_quarantined_files(), key=os.path.basename)
+        sizes = [os.path.getsize(path) for path in files]
+        evicted = 0
+        while files[evicted:] and sum(sizes[evicted:]) > self.max_bytes:
+            os.remove(files[evicted])
+            evicted += 1
+        if evicted:
+            print(f"Evicted {evicted} spooled batches to stay under {self.max_bytes} bytes")
+        return evicted
+
+    def read(self, files: list[str]) -> list[Plant]:
+        '''Read the plants from the given batches, in order. A corrupt or truncated spooled
+        batch is skipped whole, and quarantined rather than lost.'''
+        plants = []
+        for path in files:
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as file:
+                    plants += [dict_to_plant(json.loads(line)) for line in file]
+            except (OSError, EOFError, ValueError, KeyError, TypeError) as e:
+                print(f"Skipping corrupt spooled batch {path}: {e}")
+                if os.path.dirname(path) == self.directory:
+                    self.quarantine(path)
+        return plants
+
+    def remove(self, files: list[str]) -> None:
+        '''Delete batches which have been replayed.'''
+        for path in files:
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,123 @@
+'''
+    Micro-batching for the loading part of the first data pipeline. Rather than committing
+    every invocation's plants in their own transaction, plants are buffered and written in
+    one batch once enough have built up or the oldest has waited long enough. A batch size
+    of 1 writes every invocation straight away, as before.
+'''
+
+import atexit
+import signal
+import time
+from typing import Callable, Optional
+from load import DatabaseManager
+from models import Plant
+
+
+class MicroBatcher:
+    '''Class which buffers plants and flushes them to the RDS on a size or age threshold.
+    Once exit handlers are installed, anything still buffered is flushed when the process
+    exits, including on SIGTERM, as Lambda sends before shutting down a container with an
+    extension. A frozen container may be killed without either, so the buffer is also
+    flushed whenever it would otherwise pass its max age before the next scheduled run.'''
+
+    def __init__(self, make_db_manager: Callable[[], DatabaseManager],
+                 max_batch_size: int = 1, max_age_seconds: float = 300,
+                 run_interval_seconds: float = 0,
+                 on_flush: Optional[Callable[[list], None]] = None):
+        '''The database manager is made when a batch is flushed, so a warm Lambda always
+        flushes over its current connection. The batch is flushed when it holds the max batch
+        size of plants, or when its oldest plant would wait longer than the max age for the
+        run after this one, run_interval_seconds away. Once a batch is committed or spooled,
+        on_flush is called with the responses buffered with its plants.'''
+        if max_batch_size < 1:
+            raise ValueError('The batch size must be at least 1.')
+        if max_age_seconds < 0 or run_interval_seconds < 0:
+            raise ValueError('The max age and run interval cannot be negative.')
+        self.make_db_manager = make_db_manager
+        self.max_batch_size = max_batch_size
+        self.max_age_seconds = max_age_seconds
+        self.run_interval_seconds = run_interval_seconds
+        self.on_flush = on_flush
+        self.buffer = []
+        self.responses = []
+        self.oldest_time = None
+        self.previous_sigterm_handler = None
+        self.flushing = False
+        self.deferred_signal = None
+
+    def install_exit_handlers(self) -> None:
+        '''Flush at exit, and exit on SIGTERM, which would otherwise end the process without
+        running atexit. Handlers can only be installed from the main thread, elsewhere only
+        atexit is used.'''
+        atexit.register(self.flush)
+        try:
+            self.previous_sigterm_handler = signal.signal(signal.SIGTERM, self._handle_sigterm)
+        except ValueError:
+            self.previous_sigterm_handler = None
+
+    def _handle_sigterm(self, signum, frame) -> None:
+        '''Hand the signal on to the handler it replaced, or exit, leaving the flush to atexit.
+        Nothing is written from the handler itself. If a flush is interrupted, the signal is
+        handled once it finishes rather than breaking into its transaction.'''
+        if self.flushing:
+            self.deferred_signal = (signum, frame)
+            return
+        if callable(self.previous_sigterm_handler):
+            self.previous_sigterm_handler(signum, frame)
+        elif self.previous_sigterm_handler != signal.SIG_IGN:
+            raise SystemExit(128 + signum)
+
+    def add(self, plants: list[Plant], responses: list = None) -> bool:
+        '''Buffer plants, and the responses they were made from, flushing if a threshold is
+        reached. Returns whether a flush was made and succeeded.'''
+        if plants and not self.buffer:
+            self.oldest_time = time.monotonic()
+        self.buffer.extend(plants)
+        self.responses.extend(responses or [])
+        return self.flush_if_due()
+
+    def is_due(self) -> bool:
+        '''Whether the buffer has reached the size threshold, or its oldest plant would pass
+        the max age before the next run.'''
+        if not self.buffer:
+            return False
+        age_at_next_run = time.monotonic() - self.oldest_time + self.run_interval_seconds
+        return len(self.buffer) >= self.max_batch_size or age_at_next_run >= self.max_age_seconds
+
+    def flush_if_due(self) -> bool:
+        '''Flush the buffer if a threshold is reached. Returns whether a flush was made and
+        succeeded.'''
+        return self.is_due() and self.flush()
+
+    def flush(self) -> bool:
+        '''Write every buffered plant in one batch, after any spooled batches. If the batch
+        is neither committed nor spooled, the plants stay buffered for the next flush.
+        Returns whether the buffer is now empty. A flush which is already running, for
+        example when interrupted by a signal, is not re-entered.'''
+        if self.flushing:
+            return False
+        self.flushing = True
+        try:
+            return self._flush()
+        finally:
+            self.flushing = False
+            if self.deferred_signal is not None:
+                deferred_signal, self.deferred_signal = self.deferred_signal, None
+                self._handle_sigterm(*deferred_signal)
+
+    def _flush(self) -> bool:
+        '''Write the buffer, without the re-entrancy guard of flush.'''
+        if self.buffer:
+            db_manager = self.make_db_manager()
+            try:
+                if not db_manager.replay_and_load(self.buffer):
+                    return False
+            finally:
+                db_manager.close()
+        # Responses which made no plants, such as rejected ones, are done with as well
+        responses, self.responses = self.responses, []
+        self.buffer = []
+        self.oldest_time = None
+        if responses and self.on_flush is not None:
+            self.on_flush(responses)
+        return True
@@ -2,15 +2,33 @@
     The models related to the plants object are defined here. 
 '''
 
+import csv
 import os
 from datetime import datetime
+from functools import lru_cache
 import re
-import pandas as pd
+from types import MappingProxyType
+
+
+COUNTRY_CODES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'code_to_name.csv')
+
+
+@lru_cache(maxsize=None)
+def get_country_names() -> MappingProxyType:
+    '''Return an immutable mapping of two letter country codes to country names. The CSV is
+    read on first use only, and the mapping is shared by every Location, including across
+    warm Lambda invocations.'''
+    with open(COUNTRY_CODES_PATH, 'r', newline='', encoding='utf-8') as file:
+        return MappingProxyType({row['alpha-2']: row['name']
+                                 for row in csv.DictReader(file)})
 
 
 class Botanist:
     '''Class representing a botanist, with a name, email and phone number.'''
 
+    __slots__ = ('__name', '__email', '__phone')
+
     def __init__(self, botanist_dict_data: dict) -> None:
         '''Initialise the botanist with data extracted directly from the API.'''
         if not isinstance(botanist_dict_data, dict):
@@ -21,6 +39,15 @@ class Botanist:
         self.__name = self.clean_name(botanist_dict_data.get("name"))
         self.__phone = self.clean_phone(botanist_dict_data.get("phone"))
 
+    @classmethod
+    def from_values(cls, name: str, email: str, phone: str) -> 'Botanist':
+        '''Create a botanist from values which have already been cleaned, skipping the checks.'''
+        botanist = cls.__new__(cls)
+        botanist.__name = name
+        botanist.__email = email
+        botanist.__phone = phone
+        return botanist
+
     def get_values(self) -> tuple[str]:
         '''Return the botanist values to be used in SQL queries.'''
         return self.__name, self.__email, self.__phone
@@ -60,6 +87,9 @@ class Location:
     '''Class representing a plant's origin location. Contained is the continent, country
     and city data.'''
 
+    __slots__ = ('__latitude', '__longitude', '__city', '__country', '__continent',
+                 '__capital')
+
     COUNT_OF_LOCATION_ATTRIBUTES = 5
 
     def __init__(self, location_data: list) -> None:
@@ -83,6 +113,19 @@ class Location:
         self.__continent = continent
         self.__capital = capital
 
+    @classmethod
+    def from_values(cls, latitude: float, longitude: float, city: str, country: str,
+                    continent: str, capital: str) -> 'Location':
+        '''Create a location from values which have already been cleaned, skipping the checks.'''
+        location = cls.__new__(cls)
+        location.__latitude = latitude
+        location.__longitude = longitude
+        location.__city = city
+        location.__country = country
+        location.__continent = continent
+        location.__capital = capital
+        return location
+
     def get_continent_values(self) -> tuple[str]:
         '''Get a tuple of values related to continents for loading.
         return: (continent_name)'''
@@ -118,10 +161,11 @@ class Location:
         if country_code is None:
             raise ValueError(
                 'The country code attribute is not included in the input data.')
-        df_country = pd.read_csv('code_to_name.csv')
-        df_country = df_country[df_country['alpha-2']
-                                == country_code.upper()]
-        return df_country['name'].iloc[0]
+        country_name = get_country_names().get(country_code.upper())
+        if country_name is None:
+            raise ValueError(
+                f'The country code {country_code} is not a recognised country code.')
+        return country_name
 
     def clean_city_name(self, city_name_in: str) -> str:
         '''Clean the city name field. Raises error if invalid.'''
@@ -145,7 +189,7 @@ class Location:
     def clean_continent_capital(self, continent_capital_in: str) -> tuple[str]:
         '''Clean the continent and capital field. Raises error if invalid.'''
         if continent_capital_in is None:
-            return ValueError(
+            raise ValueError(
                 'The country and capital attribute is not included in the input data.')
         continent_capital_list = continent_capital_in.split('/')
         return continent_capital_list[0], continent_capital_list[1]
@@ -154,6 +198,8 @@ class Location:
 class Recording:
     '''Object representing a reading made about a plant's condition.'''
 
+    __slots__ = ('__soil_moisture', '__temperature', '__taken')
+
     MAX_SOIL_MOISTURE = 100
     MIN_SOIL_MOISTURE = 0
 
@@ -166,6 +212,16 @@ class Recording:
         self.__taken = self.clean_taken_time(
             record_dict_data.get('recording_taken'))
 
+    @classmethod
+    def from_values(cls, soil_moisture: float, temperature: float,
+                    taken: datetime) -> 'Recording':
+        '''Create a recording from values which have already been cleaned, skipping the checks.'''
+        record = cls.__new__(cls)
+        record.__soil_moisture = soil_moisture
+        record.__temperature = temperature
+        record.__taken = taken
+        return record
+
     def get_values(self):
         '''Get a tuple of values related to a record for loading.
         return: (soil_moisture, temperature, taken)'''
@@ -205,6 +261,8 @@ class Recording:
 class PlantType:
     '''Object representing a plant type.'''
 
+    __slots__ = ('__name', '__scientific_name', '__image_url')
+
     def __init__(self, plant_type_dict_data: dict) -> None:
         '''Initialise a plant type.'''
         self.__name = self.clean_plant_type_name(
@@ -214,6 +272,15 @@ class PlantType:
         self.__image_url = self.clean_image_url(
             plant_type_dict_data.get('images'))
 
+    @classmethod
+    def from_values(cls, name: str, scientific_name: str, image_url: str) -> 'PlantType':
+        '''Create a plant type from values which have already been cleaned, skipping the checks.'''
+        plant_type = cls.__new__(cls)
+        plant_type.__name = name
+        plant_type.__scientific_name = scientific_name
+        plant_type.__image_url = image_url
+        return plant_type
+
     def get_values(self) -> tuple[str]:
         '''Get values related to the plant type used for loading.
         return: (name, scientific_name, image_url)'''
@@ -255,25 +322,44 @@ class Plant:
     '''Object representing a plant object. Plant should take in all data, 
     make all the objects it needs, and put them in an attribute itself.'''
 
-    def __init__(self, response_data: dict) -> None:
-        '''Instantiate a plant object.'''
+    __slots__ = ('__plant_number', '__last_watered', '__botanist', '__location', '__record',
+                 '__plant_type')
+
+    def __init__(self, response_data: dict, botanist: Botanist = None,
+                 location: Location = None, plant_type: PlantType = None) -> None:
+        '''Instantiate a plant object. A botanist, location or plant type which has already
+        been built from the same data can be passed in to be shared, rather than built again.'''
         self.__last_watered = self.clean_last_watered(
             response_data.get('last_watered'))
         self.__plant_number = self.clean_plant_number(
             response_data.get('plant_id'))
-        self.__botanist = Botanist(response_data.get('botanist'))
-        self.__location = Location(response_data.get('origin_location'))
+        self.__botanist = botanist or Botanist(response_data.get('botanist'))
+        self.__location = location or Location(response_data.get('origin_location'))
         self.__record = Recording({
             "soil_moisture": response_data.get('soil_moisture'),
             "temperature": response_data.get('temperature'),
             "recording_taken": response_data.get('recording_taken'),
         })
-        self.__plant_type = PlantType({
+        self.__plant_type = plant_type or PlantType({
             "name": response_data.get('name'),
             "scientific_name": response_data.get("scientific_name"),
             "images": response_data.get("images")
         })
 
+    @classmethod
+    def from_values(cls, plant_number: int, last_watered: datetime, botanist: Botanist,
+                    location: Location, record: Recording, plant_type: PlantType) -> 'Plant':
+        '''Create a plant from values and objects which have already been cleaned, skipping
+        the checks.'''
+        plant = cls.__new__(cls)
+        plant.__plant_number = plant_number
+        plant.__last_watered = last_watered
+        plant.__botanist = botanist
+        plant.__location = location
+        plant.__record = record
+        plant.__plant_type = plant_type
+        return plant
+
     def get_botanist(self) -> Botanist:
         '''Get the botanist object.'''
         return self.__botanist
@@ -3,21 +3,83 @@
     AWS Lambda is also defined here.
 '''
 
+from os import environ as ENV
+from change_cache import RecordingChangeCache
+from dimension_cache import DimensionKeyCache
 from extract import RecordingAPIExtractor
+from plant_registry import PlantRegistry
+from request_policy import RequestPolicy
 from transform import PlantRecordingFactory
 from load import DatabaseManager
+from load_spool import LoadSpool
+from micro_batching import MicroBatcher
+from resources import RESOURCES
 
+# Kept at module level so request latencies carry over between warm invocations
+REQUEST_POLICY = RequestPolicy(timeout_seconds=4, deadline_seconds=30)
+CHANGE_CACHE = RecordingChangeCache(path=RecordingChangeCache.DEFAULT_PATH)
+KEY_CACHE = DimensionKeyCache()
+LOAD_SPOOL = LoadSpool(directory=ENV.get('LOAD_SPOOL_DIR', LoadSpool.DEFAULT_DIRECTORY))
 
-def run_api_pipeline():
+
+def make_db_manager() -> DatabaseManager:
+    '''Make a database manager over the shared connection, with the shared caches. If the
+    STORAGE_BACKEND is sqlite, a local SQLite database is used instead of the RDS.'''
+    if ENV.get('STORAGE_BACKEND') == 'sqlite':
+        from sqlite_backend import SQLiteDatabaseManager
+        return SQLiteDatabaseManager([], path=ENV.get('SQLITE_PATH', 'plants.db'),
+                                     key_cache=KEY_CACHE, spool=LOAD_SPOOL)
+    return DatabaseManager([], connection=RESOURCES.get_db_connection(),
+                           key_cache=KEY_CACHE, spool=LOAD_SPOOL)
+
+
+MICRO_BATCHER = MicroBatcher(
+    make_db_manager,
+    max_batch_size=int(ENV.get('LOAD_BATCH_SIZE', 1)),
+    max_age_seconds=float(ENV.get('LOAD_BATCH_MAX_AGE_SECONDS', 300)),
+    run_interval_seconds=float(ENV.get('LOAD_RUN_INTERVAL_SECONDS', 60)),
+    # Responses only count as loaded once their plants are committed or spooled
+    on_flush=CHANGE_CACHE.update,
+)
+
+
+def run_api_pipeline(streaming: bool = False, batch_validation: bool = False):
     '''This function runs the entire data pipeline for moving data from an API
-    to an RDS.'''
+    to an RDS. In streaming mode the three stages run concurrently, otherwise they
+    run one after another, with the plants written by the micro-batcher. Batch
+    validation checks the responses as columns rather than one at a time.'''
+    registry = PlantRegistry(seed_plant_ids=range(1, 56))
     extractor = RecordingAPIExtractor(
         api_url='https://data-eng-plants-api.herokuapp.com/plants/',
-        min_plant_id=1,
-        max_plant_id=55,
+        max_concurrency=20,
+        registry=registry,
+        policy=REQUEST_POLICY,
+        resources=RESOURCES,
     )
-    responses = extractor.extract_api_data()
+    if streaming:
+        from streaming import StreamingPipeline
+        # Plants buffered by an earlier invocation in batch mode are still pending in the
+        # change cache, so they aren't polled again and must be flushed from here
+        MICRO_BATCHER.flush_if_due()
+        db_manager = make_db_manager()
+        try:
+            db_manager.replay_spool()
+            StreamingPipeline(extractor, db_manager, change_cache=CHANGE_CACHE).run()
+        finally:
+            db_manager.close()
+        return
+    responses = CHANGE_CACHE.filter_changed(extractor.extract_api_data_async())
+    if not responses:
+        # Plants buffered by an earlier invocation are still flushed once old enough
+        MICRO_BATCHER.flush_if_due()
+        return
     factory = PlantRecordingFactory(responses)
-    plants = factory.produce_plant_objects()
-    db_manager = DatabaseManager(plants)
-    db_manager.load_all()
+    if batch_validation:
+        plants = factory.produce_plant_objects_batch()
+        for plant_id, reason in factory.rejections:
+            print(f"Rejected plant {plant_id}: {reason}")
+    else:
+        plants = factory.produce_plant_objects()
+    # Buffered responses are not polled again while they wait to be flushed
+    CHANGE_CACHE.mark_pending(responses)
+    MICRO_BATCHER.add(plants, responses)
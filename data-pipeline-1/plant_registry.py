@@ -0,0 +1,103 @@
+'''
+    A persisted registry of the plant ids known to the API. Live plants are polled on every
+    run, while ids which keep failing (invalid ids, removed plants) are probed on an
+    exponential backoff schedule. Ids in a small window above the highest id ever found are
+    probed on the same schedule, so new plants are discovered without a fixed upper limit.
+'''
+
+import json
+import os
+
+
+class PlantRegistry:
+    '''Class which decides which plant ids should be requested on each run, and learns from
+    the results of those requests.'''
+
+    DEFAULT_PATH = '/tmp/plant_registry.json'
+
+    def __init__(self, path: str = DEFAULT_PATH, seed_plant_ids: list[int] = (),
+                 discovery_window: int = 5, max_backoff_runs: int = 60):
+        '''The seed plant ids are probed on the first run. The discovery window is the number
+        of ids above the highest id ever found which are probed for new plants. The max
+        backoff is the most runs an unresponsive id will go without being probed.'''
+        if discovery_window < 0:
+            raise ValueError(
+                f'The discovery window cannot be negative, it is {discovery_window}.')
+        if max_backoff_runs < 1:
+            raise ValueError(
+                f'The max backoff must be at least 1 run, not {max_backoff_runs}.')
+        self.path = path
+        self.discovery_window = discovery_window
+        self.max_backoff_runs = max_backoff_runs
+        self.run_number = 0
+        self.highest_found_id = 0
+        # plant_id -> {'failures': consecutive failed polls, 'next_probe_run': run number}
+        self.plants = {plant_id: {'failures': 0, 'next_probe_run': 0}
+                       for plant_id in seed_plant_ids}
+        self._load()
+
+    def _load(self) -> None:
+        '''Load the registry state from the file, if it exists. A corrupt file is ignored,
+        so the registry falls back to the seed ids.'''
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            plants = {int(plant_id): entry
+                      for plant_id, entry in state['plants'].items()}
+            self.run_number = state['run_number']
+            self.highest_found_id = state['highest_found_id']
+            self.plants = plants
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return
+
+    def save(self) -> None:
+        '''Persist the registry state. The file is replaced atomically, so a crash mid-write
+        can never leave a half written registry.'''
+        if self.path is None:
+            return
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'run_number': self.run_number,
+                'highest_found_id': self.highest_found_id,
+                'plants': self.plants,
+            }, file)
+        os.replace(temporary_path, self.path)
+
+    def get_live_plant_ids(self) -> list[int]:
+        '''Return the ids which responded successfully on their last poll.'''
+        return sorted(plant_id for plant_id, entry in self.plants.items()
+                      if entry['failures'] == 0)
+
+    def get_plant_ids_to_poll(self) -> list[int]:
+        '''Return the ids to request on this run: every id which is live or due a probe,
+        plus any id in the discovery window which has never been probed.'''
+        due = {plant_id for plant_id, entry in self.plants.items()
+               if entry['next_probe_run'] <= self.run_number}
+        window = range(self.highest_found_id+1,
+                       self.highest_found_id+self.discovery_window+1)
+        unknown = {plant_id for plant_id in window
+                   if plant_id not in self.plants}
+        return sorted(due | unknown)
+
+    def _get_backoff_runs(self, failures: int) -> int:
+        '''The number of runs to wait before probing an id again, doubling with each
+        consecutive failure. A live id which fails once is polled again on the next run.'''
+        return min(2 ** (failures - 1), self.max_backoff_runs)
+
+    def record_results(self, polled_plant_ids: list[int], found_plant_ids: list[int]) -> None:
+        '''Update the registry with the result of a run, and advance to the next run.'''
+        found_plant_ids = set(found_plant_ids)
+        for plant_id in found_plant_ids:
+            self.plants[plant_id] = {'failures': 0,
+                                     'next_probe_run': self.run_number + 1}
+            self.highest_found_id = max(self.highest_found_id, plant_id)
+        for plant_id in set(polled_plant_ids) - found_plant_ids:
+            entry = self.plants.setdefault(
+                plant_id, {'failures': 0, 'next_probe_run': 0})
+            entry['failures'] += 1
+            entry['next_probe_run'] = self.run_number + \
+                self._get_backoff_runs(entry['failures'])
+        self.run_number += 1
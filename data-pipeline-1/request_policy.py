@@ -0,0 +1,72 @@
+'''
+    The request policy used by the extraction part of the first data pipeline. It controls
+    tail latency: slow requests are hedged with a duplicate request after a delay derived from
+    recent latencies, failed requests are retried with jittered backoff from a bounded budget,
+    and the whole extraction is given a deadline.
+'''
+
+from collections import deque
+import math
+import random
+
+
+class RequestPolicy:
+    '''Class holding the settings for making requests to the API, along with the recent
+    request latencies used to decide when to hedge.'''
+
+    def __init__(self, timeout_seconds: float = 4, deadline_seconds: float = 30,
+                 hedge_percentile: float = 95, initial_hedge_delay_seconds: float = 1,
+                 min_hedge_delay_seconds: float = 0.05, min_latency_samples: int = 20,
+                 latency_window: int = 500, retry_budget_ratio: float = 0.2,
+                 min_retry_budget: int = 5, backoff_base_seconds: float = 0.1,
+                 backoff_max_seconds: float = 1):
+        '''The timeout applies to each request, and the deadline to the whole extraction.
+        Until enough latencies have been recorded the initial hedge delay is used. The retry
+        budget, shared by retries and hedged requests, is a ratio of the number of plant ids
+        requested, with a minimum. A hedge percentile of None turns hedging off.'''
+        if timeout_seconds <= 0 or deadline_seconds <= 0:
+            raise ValueError('The timeout and deadline must be positive.')
+        if hedge_percentile is not None and not 0 < hedge_percentile <= 100:
+            raise ValueError(
+                f'The hedge percentile must be between 0 and 100, not {hedge_percentile}.')
+        if retry_budget_ratio < 0 or min_retry_budget < 0:
+            raise ValueError('The retry budget cannot be negative.')
+        self.timeout_seconds = timeout_seconds
+        self.deadline_seconds = deadline_seconds
+        self.hedge_percentile = hedge_percentile
+        self.initial_hedge_delay_seconds = initial_hedge_delay_seconds
+        self.min_hedge_delay_seconds = min_hedge_delay_seconds
+        self.min_latency_samples = min_latency_samples
+        self.retry_budget_ratio = retry_budget_ratio
+        self.min_retry_budget = min_retry_budget
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.latencies = deque(maxlen=latency_window)
+
+    def record_latency(self, latency_seconds: float) -> None:
+        '''Record how long a completed request took.'''
+        self.latencies.append(latency_seconds)
+
+    def get_hedge_delay(self) -> float:
+        '''Return how long to wait on a request before sending a duplicate. This is the
+        chosen percentile of recent latencies, so only the slowest requests are hedged.
+        None is returned if hedging is turned off.'''
+        if self.hedge_percentile is None:
+            return None
+        if len(self.latencies) < self.min_latency_samples:
+            return self.initial_hedge_delay_seconds
+        ordered = sorted(self.latencies)
+        index = math.ceil(len(ordered) * self.hedge_percentile / 100) - 1
+        return max(ordered[index], self.min_hedge_delay_seconds)
+
+    def get_retry_budget(self, number_of_requests: int) -> int:
+        '''Return the number of retries and hedged requests allowed for an extraction.'''
+        return max(self.min_retry_budget,
+                   math.ceil(number_of_requests * self.retry_budget_ratio))
+
+    def get_backoff_seconds(self, attempt: int) -> float:
+        '''Return the time to wait before a retry, using full jitter: a random time up to an
+        exponentially growing cap, so retries from many plants don't arrive together.'''
+        cap = min(self.backoff_max_seconds,
+                  self.backoff_base_seconds * 2 ** attempt)
+        return random.uniform(0, cap)
@@ -0,0 +1,87 @@
+'''
+    Resources which are kept alive between warm invocations of the Lambda. AWS reuses the
+    Python process between invocations, so anything held at module level survives. The
+    database connection and HTTP session are checked before each reuse and replaced if
+    they have been dropped.
+'''
+
+import asyncio
+import aiohttp
+import pymssql
+from load import make_connection
+
+
+class ResourceManager:
+    '''Class which holds the database connection, the event loop and the HTTP session used
+    by the pipeline, creating each on first use.'''
+
+    HEALTH_CHECK_QUERY = 'SELECT 1;'
+
+    def __init__(self, http_connection_limit: int = 20):
+        '''The HTTP connection limit is the size of the shared HTTP connection pool.'''
+        self.http_connection_limit = http_connection_limit
+        self._db_connection = None
+        self._loop = None
+        self._http_session = None
+
+    def _is_db_connection_alive(self) -> bool:
+        '''Check the database connection still works by running a trivial query.'''
+        try:
+            with self._db_connection.cursor() as cursor:
+                cursor.execute(self.HEALTH_CHECK_QUERY)
+                cursor.fetchall()
+            return True
+        except pymssql.Error:
+            return False
+
+    def get_db_connection(self) -> pymssql.Connection:
+        '''Return the shared database connection, reconnecting if it has been dropped.'''
+        if self._db_connection is not None and self._is_db_connection_alive():
+            return self._db_connection
+        self._close_db_connection()
+        self._db_connection = make_connection()
+        return self._db_connection
+
+    def _close_db_connection(self) -> None:
+        '''Close the database connection, ignoring errors from one which has dropped.'''
+        if self._db_connection is None:
+            return
+        try:
+            self._db_connection.close()
+        except pymssql.Error:
+            pass
+        self._db_connection = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        '''Return the shared event loop. The HTTP session belongs to the loop it was
+        made in, so the same loop must be used on every invocation.'''
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+            self._http_session = None
+        return self._loop
+
+    def run(self, coroutine):
+        '''Run a coroutine to completion on the shared event loop.'''
+        return self._get_loop().run_until_complete(coroutine)
+
+    async def get_http_session(self) -> aiohttp.ClientSession:
+        '''Return the shared HTTP session, making a new one if it has been closed. Must be
+        awaited from a coroutine passed to run.'''
+        if self._http_session is None or self._http_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.http_connection_limit)
+            self._http_session = aiohttp.ClientSession(connector=connector)
+        return self._http_session
+
+    def close(self) -> None:
+        '''Close every resource held.'''
+        self._close_db_connection()
+        if self._loop is not None and not self._loop.is_closed():
+            if self._http_session is not None and not self._http_session.closed:
+                self._loop.run_until_complete(self._http_session.close())
+            self._loop.close()
+        self._loop = None
+        self._http_session = None
+
+
+# Module level, so the resources live as long as the Lambda's Python process
+RESOURCES = ResourceManager()
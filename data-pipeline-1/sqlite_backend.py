@@ -0,0 +1,115 @@
+'''
+    An embedded SQLite storage backend for the loading part of the first data pipeline. It
+    runs the same schema as the RDS, translated to SQLite, so the loader can be tested and
+    benchmarked at realistic volumes without a SQL Server.
+'''
+
+from datetime import datetime
+import os
+import re
+import sqlite3
+from load import DatabaseManager
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '..', 'architecture', '1.rds', 'database', 'schema.sql')
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+
+
+# Each pipeline is built into its own image from its own directory, so this schema
+# translation is kept in step with the copy in data-pipeline-2/sqlite_backend.py
+def translate_schema(schema_sql: str) -> str:
+    '''Translate the T-SQL schema to SQLite. Identity columns become SQLite row ids, and
+    indexes lose the options SQLite has no use for.'''
+    schema_sql = re.sub(r'\w+ IDENTITY\(1,1\)( CONSTRAINT \w+)? PRIMARY KEY( NONCLUSTERED)?',
+                        'INTEGER PRIMARY KEY AUTOINCREMENT', schema_sql)
+    schema_sql = re.sub(r'\b(NON)?CLUSTERED INDEX', 'INDEX', schema_sql)
+    schema_sql = re.sub(r' INCLUDE \([\w, ]+\)', '', schema_sql)
+    return schema_sql.replace('GETDATE()', 'CURRENT_TIMESTAMP')
+
+
+def make_sqlite_connection(path: str = ':memory:',
+                           schema_path: str = SCHEMA_PATH) -> sqlite3.Connection:
+    '''Connect to a SQLite database, creating the schema if the database is new. DATETIME
+    columns are returned as datetimes, like pymssql does.'''
+    connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    connection.execute('PRAGMA foreign_keys = ON;')
+    tables = connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'record';").fetchall()
+    if not tables:
+        with open(schema_path, 'r', encoding='utf-8') as file:
+            connection.executescript(translate_schema(file.read()))
+    return connection
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    '''The loader with its statements written for SQLite. MERGE becomes an insert of the
+    rows which don't exist yet, taking the same parameters in the same order.'''
+
+    CONTINENT_UPSERT = '''
+        INSERT OR IGNORE INTO continent (continent_name)
+        VALUES (?);
+    '''
+    COUNTRY_UPSERT = '''
+        INSERT OR IGNORE INTO country (country_name, country_capital, continent_id)
+        SELECT ?, ?, continent_id FROM continent WHERE continent_name = ?;
+    '''
+    CITY_UPSERT = '''
+        INSERT OR IGNORE INTO city (city_name, city_latitude, city_longitude, country_id)
+        SELECT ?, ?, ?, country_id FROM country WHERE country_name = ?;
+    '''
+    BOTANIST_UPSERT = '''
+        INSERT INTO botanist (botanist_name, botanist_email, botanist_phone)
+        SELECT source.* FROM (SELECT ? AS botanist_name, ? AS botanist_email,
+                                     ? AS botanist_phone) AS source
+        WHERE NOT EXISTS (
+            SELECT 1 FROM botanist AS target
+            WHERE target.botanist_name = source.botanist_name
+                AND target.botanist_email = source.botanist_email
+                AND target.botanist_phone = source.botanist_phone);
+    '''
+    PLANT_TYPE_UPSERT = '''
+        INSERT INTO plant_type (plant_type_name, plant_type_scientific_name, plant_type_image_url)
+        SELECT source.* FROM (SELECT ? AS plant_type_name, ? AS plant_type_scientific_name,
+                                     ? AS plant_type_image_url) AS source
+        WHERE NOT EXISTS (
+            SELECT 1 FROM plant_type AS target
+            WHERE target.plant_type_name = source.plant_type_name);
+    '''
+    PLANT_INSERT = '''
+        INSERT INTO plant (plant_type_id, plant_number, botanist_id, city_id, plant_last_watered)
+        VALUES (?, ?, ?, ?, ?);
+    '''
+    PLANT_UPDATE = '''
+        UPDATE plant SET plant_last_watered = ?
+        WHERE plant_id = ?;
+    '''
+    WATERING_EVENT_INSERT = '''
+        INSERT OR IGNORE INTO watering_event (plant_id, watered_at)
+        VALUES (?, ?);
+    '''
+    RECORDING_ROW = '(?, ?, ?, ?)'
+    # Older SQLite builds allow at most 999 parameters per statement
+    MAX_PARAMETERS = 999
+    DATABASE_ERROR = sqlite3.Error
+    # SQLite raises OperationalError for a missing table or a syntax error too, which fail
+    # every time, so only a database locked by another writer is worth retrying
+    TRANSIENT_ERRORS = (sqlite3.OperationalError,)
+    TRANSIENT_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+    INTEGRITY_ERROR = sqlite3.IntegrityError
+
+    def __init__(self, plants: list, connection: sqlite3.Connection = None,
+                 path: str = ':memory:', **kwargs):
+        '''If no connection is given, one is made to the database at the path.'''
+        self.path = path
+        super().__init__(plants, connection=connection, **kwargs)
+
+    def is_transient(self, error: Exception) -> bool:
+        '''Whether a load failed because the database was locked by another writer.'''
+        return super().is_transient(error) and str(error).startswith(self.TRANSIENT_MESSAGES)
+
+    def _make_connection(self) -> sqlite3.Connection:
+        '''Connect to the SQLite database, creating the schema if it is new.'''
+        return make_sqlite_connection(self.path)
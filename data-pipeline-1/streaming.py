@@ -0,0 +1,102 @@
+'''
+    A streaming version of the first data pipeline. Rather than running extraction,
+    transformation and loading one after another, the three stages run at the same time,
+    connected by bounded queues. Responses are turned into Plant objects as they arrive,
+    and plants are written to the RDS in batches while slower requests are still running.
+'''
+
+import asyncio
+from change_cache import RecordingChangeCache
+from extract import RecordingAPIExtractor
+from load import DatabaseManager
+from transform import PlantRecordingFactory
+
+
+class StreamingPipeline:
+    '''Class which runs the extract, transform and load stages concurrently. The queues
+    between the stages are bounded, so memory stays flat however many plants there are.'''
+
+    END_OF_STREAM = None
+
+    def __init__(self, extractor: RecordingAPIExtractor, db_manager: DatabaseManager,
+                 change_cache: RecordingChangeCache = None, queue_size: int = 100,
+                 batch_size: int = 50):
+        '''The queue size is the most items held between two stages, and the batch size
+        the most plants written to the RDS in one transaction.'''
+        if queue_size < 1 or batch_size < 1:
+            raise ValueError('The queue size and batch size must be at least 1.')
+        self.extractor = extractor
+        self.db_manager = db_manager
+        self.change_cache = change_cache
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.plants_loaded = 0
+        self.factory = PlantRecordingFactory([])
+
+    async def _extract_stage(self, response_queue: asyncio.Queue) -> None:
+        '''Put each response on the queue as it arrives, skipping unchanged readings.'''
+        async def on_result(response: dict) -> None:
+            if self.change_cache is None or self.change_cache.filter_changed([response]):
+                await response_queue.put(response)
+        try:
+            await self.extractor.stream_api_data(on_result)
+        finally:
+            await response_queue.put(self.END_OF_STREAM)
+
+    async def _transform_stage(self, response_queue: asyncio.Queue,
+                               plant_queue: asyncio.Queue) -> None:
+        '''Turn each response into a Plant object, dropping invalid responses. The response
+        is passed on with its plant so the change cache can be updated once it is loaded.'''
+        try:
+            while (response := await response_queue.get()) is not self.END_OF_STREAM:
+                plant = self.factory.produce_plant_object(response)
+                if plant is not None:
+                    await plant_queue.put((response, plant))
+        finally:
+            await plant_queue.put(self.END_OF_STREAM)
+
+    async def _load_batch(self, batch: list[tuple]) -> None:
+        '''Write a batch of plants in a worker thread, since the database driver blocks.'''
+        loop = asyncio.get_running_loop()
+        plants = [plant for _, plant in batch]
+        committed = await loop.run_in_executor(None, self.db_manager.load_batch, plants)
+        if committed:
+            self.plants_loaded += len(plants)
+            if self.change_cache is not None:
+                self.change_cache.update([response for response, _ in batch])
+
+    async def _load_stage(self, plant_queue: asyncio.Queue) -> None:
+        '''Write plants in batches. A batch is written when it is full, or when no more
+        plants are waiting, so plants are never held back waiting for slow requests.'''
+        batch = []
+        while (item := await plant_queue.get()) is not self.END_OF_STREAM:
+            batch.append(item)
+            if len(batch) >= self.batch_size or plant_queue.empty():
+                await self._load_batch(batch)
+                batch = []
+        if batch:
+            await self._load_batch(batch)
+
+    async def run_async(self) -> int:
+        '''Run all three stages until every response has been loaded. Returns the number
+        of plants committed to the RDS, or spooled to be replayed on the next run.'''
+        response_queue = asyncio.Queue(maxsize=self.queue_size)
+        plant_queue = asyncio.Queue(maxsize=self.queue_size)
+        stages = [
+            asyncio.ensure_future(self._extract_stage(response_queue)),
+            asyncio.ensure_future(self._transform_stage(response_queue, plant_queue)),
+            asyncio.ensure_future(self._load_stage(plant_queue)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            # If one stage fails the others would block on their queues forever
+            for stage in stages:
+                stage.cancel()
+        return self.plants_loaded
+
+    def run(self) -> int:
+        '''Run the pipeline, on the shared event loop if the extractor has resources.'''
+        if self.extractor.resources is not None:
+            return self.extractor.resources.run(self.run_async())
+        return asyncio.run(self.run_async())
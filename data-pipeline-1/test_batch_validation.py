@@ -0,0 +1,132 @@
+import pytest
+from batch_validation import BatchValidator
+from transform import PlantRecordingFactory
+
+
+@pytest.fixture
+def response():
+    return {
+        "botanist": {
+            "email": "gertrude.jekyll@lnhm.co.uk",
+            "name": "Gertrude Jekyll",
+            "phone": "001-481-273-3691x127"
+        },
+        "images": {
+            "original_url": "https://perenual.com/storage/species_image/2015_colocasia_esculenta/og/24325097844_14719030a3_b.jpg",
+        },
+        "last_watered": "Mon, 31 Mar 2025 14:17:54 GMT",
+        "name": "Colocasia Esculenta",
+        "origin_location": [
+            "29.65163",
+            "-82.32483",
+            "Gainesville",
+            "US",
+            "America/New_York"
+        ],
+        "plant_id": 14,
+        "recording_taken": "2025-04-01 14:12:18",
+        "scientific_name": [
+            "Colocasia esculenta"
+        ],
+        "soil_moisture": 19.035973523047986,
+        "temperature": 13.110190553320937
+    }
+
+
+@pytest.fixture
+def responses(response):
+    return [
+        response,
+        {**response, "plant_id": 12, "images": None, "scientific_name": None,
+         "botanist": {"email": "eliza.andrews@lnhm.co.uk", "name": "Eliza Andrews",
+                      "phone": "(846)669-6651x75948"},
+         "origin_location": ["51.30001", "13.10984", "Oschatz", "DE", "Europe/Berlin"]},
+        {**response, "plant_id": 18, "images": {"original_url": "http://example.com/a.png"},
+         "soil_moisture": 100, "temperature": -2.004},
+    ]
+
+
+def get_all_values(plant):
+    return (plant.get_values(), plant.get_record_values(),
+            plant.get_botanist().get_values(), plant.get_location().get_city_values(),
+            plant.get_location().get_country_values(), plant.get_plant_type().get_values())
+
+
+def test_matches_plant_objects(responses):
+    expected = PlantRecordingFactory(responses).produce_plant_objects()
+    cleaned, rejections = BatchValidator(responses).validate()
+    plants = BatchValidator.make_plants(cleaned)
+    assert rejections.empty
+    assert [get_all_values(plant) for plant in plants] == \
+        [get_all_values(plant) for plant in expected]
+
+
+def test_values_are_python_types(response):
+    cleaned, _ = BatchValidator([response]).validate()
+    soil_moisture, _, taken, plant_number = \
+        BatchValidator.make_plants(cleaned)[0].get_record_values()
+    assert type(soil_moisture) is float
+    assert type(taken).__name__ == 'datetime'
+    assert plant_number == 14
+
+
+@pytest.mark.parametrize("change, reason", [
+    ({"last_watered": "31/03/2025"}, 'last_watered is missing or in an invalid format'),
+    ({"last_watered": "Mon, 31 Mar 2125 14:17:54 GMT"}, 'last_watered is in the future'),
+    ({"plant_id": None}, 'plant_id is missing'),
+    ({"botanist": "Gertrude Jekyll"}, 'botanist is not a dict'),
+    ({"botanist": {"email": "gertrude.jekyll", "name": "Gertrude Jekyll",
+                   "phone": "001-481-273-3691x127"}}, 'botanist email is invalid'),
+    ({"botanist": {"email": "gertrude.jekyll@lnhm.co.uk", "name": "",
+                   "phone": "001-481-273-3691x127"}}, 'botanist name is invalid'),
+    ({"botanist": {"email": "gertrude.jekyll@lnhm.co.uk", "name": "Gertrude Jekyll",
+                   "phone": "07123456789"}}, 'botanist phone is invalid'),
+    ({"origin_location": ["29.65163", "-82.32483", "Gainesville"]},
+     'origin_location is not a list of five values'),
+    ({"origin_location": ["north", "-82.32483", "Gainesville", "US", "America/New_York"]},
+     'coordinates are invalid'),
+    ({"origin_location": ["29.65163", "-82.32483", None, "US", "America/New_York"]},
+     'city is missing'),
+    ({"origin_location": ["29.65163", "-82.32483", "Gainesville", "XX", "America/New_York"]},
+     'country code is not recognised'),
+    ({"origin_location": ["29.65163", "-82.32483", "Gainesville", "US", "America"]},
+     'continent and capital are invalid'),
+    ({"soil_moisture": None}, 'soil moisture is missing'),
+    ({"soil_moisture": 100.5}, 'soil moisture is out of range'),
+    ({"temperature": None}, 'temperature is missing'),
+    ({"recording_taken": "01/04/2025"}, 'recording_taken is missing or in an invalid format'),
+    ({"recording_taken": "2125-04-01 14:12:18"}, 'recording_taken is in the future'),
+    ({"name": ""}, 'plant type name is invalid'),
+    ({"scientific_name": "Colocasia esculenta"}, 'scientific name is not a list'),
+])
+def test_rejection_reasons(response, change, reason):
+    cleaned, rejections = BatchValidator([response, {**response, **change}]).validate()
+    assert len(cleaned) == 1
+    assert list(rejections.itertuples(index=False, name=None)) == \
+        [(response["plant_id"] if change.get("plant_id", 0) is not None else None, reason)]
+
+
+def test_make_plants_shares_reference_objects(response):
+    cleaned, _ = BatchValidator([response, {**response, "plant_id": 15}]).validate()
+    first, second = BatchValidator.make_plants(cleaned)
+    assert first.get_botanist() is second.get_botanist()
+    assert first.get_location() is second.get_location()
+    assert first.get_plant_type() is second.get_plant_type()
+
+
+def test_first_failed_check_is_reason(response):
+    _, rejections = BatchValidator(
+        [{**response, "soil_moisture": 150, "last_watered": None}]).validate()
+    assert rejections["reason"].tolist() == \
+        ['last_watered is missing or in an invalid format']
+
+
+def test_batch_factory_keeps_rejections(responses):
+    factory = PlantRecordingFactory([*responses, {"plant_id": 99}])
+    plants = factory.produce_plant_objects_batch()
+    assert len(plants) == 3
+    assert factory.rejections == [(99, 'last_watered is missing or in an invalid format')]
+
+
+def test_batch_factory_empty_list():
+    assert PlantRecordingFactory([]).produce_plant_objects_batch() == []
@@ -0,0 +1,76 @@
+import pytest
+from benchmark_load import (CountingConnection, benchmark_strategy, get_invocations,
+                            make_population, parse_inputs, run_strategy, STRATEGIES)
+from dimension_cache import DimensionKeyCache
+from sqlite_backend import make_sqlite_connection
+
+
+def test_population_cardinality():
+    plants = make_population(300)
+    assert [plant.get_values()[0] for plant in plants] == list(range(1, 301))
+    assert len({plant.get_botanist().get_values() for plant in plants}) <= 20
+    assert len({plant.get_plant_type().get_values() for plant in plants}) <= 150
+    assert len({plant.get_location().get_country_values() for plant in plants}) <= 100
+
+
+def test_population_repeatable():
+    first, second = make_population(50, seed=1), make_population(50, seed=1)
+    assert [plant.get_record_values()[:2] for plant in first] == \
+        [plant.get_record_values()[:2] for plant in second]
+
+
+def test_get_invocations():
+    assert [len(invocation) for invocation in get_invocations(make_population(120))] == \
+        [55, 55, 10]
+
+
+def test_counting_connection():
+    connection = CountingConnection(make_sqlite_connection())
+    cursor = connection.cursor()
+    cursor.executemany("INSERT INTO continent (continent_name) VALUES (?);",
+                       [("Atlantis",), ("Lemuria",)])
+    cursor.execute("SELECT * FROM continent;")
+    connection.commit()
+    assert connection.statements == 3
+    assert connection.rows_written == 2
+    assert connection.commit_seconds > 0
+    connection.close()
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_strategies_load_every_plant(strategy):
+    plants = make_population(120)
+    connection = CountingConnection(make_sqlite_connection())
+    run_strategy(strategy, plants, connection, DimensionKeyCache())
+    assert connection.execute("SELECT COUNT(*) FROM record;").fetchone()[0] == 120
+    assert connection.execute("SELECT COUNT(*) FROM plant;").fetchone()[0] == 120
+    connection.close()
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        run_strategy("bulk", [], CountingConnection(make_sqlite_connection()),
+                     DimensionKeyCache())
+
+
+def test_warm_load_only_writes_recordings():
+    result = benchmark_strategy("warm", make_population(100), runs=1)
+    assert result["rows_written"] == 100
+    assert result["statements"] == 1
+
+
+def test_counts_agree_across_runs():
+    result = benchmark_strategy("per_invocation", make_population(120), runs=3)
+    assert result["rows_written"] == benchmark_strategy(
+        "per_invocation", make_population(120), runs=1)["rows_written"]
+
+
+def test_no_runs():
+    with pytest.raises(ValueError):
+        benchmark_strategy("cold", make_population(10), runs=0)
+
+
+def test_runs_parsed_positive(monkeypatch):
+    monkeypatch.setattr("sys.argv", ["benchmark_load.py", "--runs", "0"])
+    with pytest.raises(SystemExit):
+        parse_inputs()
@@ -0,0 +1,18 @@
+from benchmark_startup import get_loaded_modules, parse_import_times
+
+
+def test_parse_import_times():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       243 |     146514 | lambda_handler",
+        "import time:       374 |     142953 |   pipeline",
+        "some other line",
+    ])
+    assert parse_import_times(output) == {
+        "lambda_handler": 146514,
+        "pipeline": 142953,
+    }
+
+
+def test_hot_path_has_no_heavy_imports():
+    assert get_loaded_modules("lambda_handler") == []
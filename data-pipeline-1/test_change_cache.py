@@ -0,0 +1,70 @@
+import pytest
+from change_cache import RecordingChangeCache
+
+
+@pytest.fixture
+def response():
+    return {
+        "plant_id": 8,
+        "recording_taken": "2025-04-01 07:38:10",
+        "last_watered": "Mon, 31 Mar 2025 13:23:01 GMT",
+        "botanist": {"name": "Test Test", "email": "test@lnhm.co.uk"},
+        "origin_location": ["5.27247", "-3.59625", "Bonoua", "CI", "Africa/Abidjan"],
+        "name": "Palm Tree",
+        "soil_moisture": 34.68,
+        "temperature": 11.54,
+    }
+
+
+def test_new_response_is_changed(response):
+    cache = RecordingChangeCache()
+    assert cache.filter_changed([response]) == [response]
+
+
+def test_loaded_response_is_unchanged(response):
+    cache = RecordingChangeCache()
+    cache.update([response])
+    assert cache.filter_changed([dict(response)]) == []
+
+
+def test_pending_response_is_unchanged(response):
+    cache = RecordingChangeCache()
+    cache.mark_pending([response])
+    assert cache.filter_changed([dict(response)]) == []
+    assert cache.fingerprints == {}
+    cache.update([response])
+    assert cache.pending == {}
+    assert cache.filter_changed([dict(response)]) == []
+
+
+def test_new_recording_is_changed(response):
+    cache = RecordingChangeCache()
+    cache.update([response])
+    new_response = dict(response, recording_taken="2025-04-01 07:39:10")
+    assert cache.filter_changed([new_response]) == [new_response]
+
+
+def test_changed_reference_data_is_changed(response):
+    cache = RecordingChangeCache()
+    cache.update([response])
+    new_response = dict(response, last_watered="Tue, 01 Apr 2025 13:23:01 GMT")
+    assert cache.filter_changed([new_response]) == [new_response]
+
+
+def test_fingerprint_ignores_key_order(response):
+    reordered = dict(reversed(list(response.items())))
+    assert RecordingChangeCache.get_fingerprint(reordered) == \
+        RecordingChangeCache.get_fingerprint(response)
+
+
+def test_persisted_to_file(tmp_path, response):
+    path = str(tmp_path / "fingerprints.json")
+    RecordingChangeCache(path=path).update([response])
+    assert RecordingChangeCache(path=path).filter_changed([response]) == []
+
+
+def test_corrupt_file_ignored(tmp_path, response):
+    path = tmp_path / "fingerprints.json"
+    path.write_text("not json")
+    cache = RecordingChangeCache(path=str(path))
+    assert cache.filter_changed([response]) == [response]
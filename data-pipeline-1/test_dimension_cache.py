@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import MagicMock
+from dimension_cache import DimensionKeyCache
+
+
+@pytest.fixture
+def mock_cursor():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [(3, "Africa")]
+    return cursor
+
+
+def set_plant_rows(cursor, rows):
+    # The plant query returns its own rows, every other table returns the default
+    default_rows = cursor.fetchall.return_value
+    cursor.fetchall.side_effect = lambda: (
+        rows if cursor.execute.call_args.args[0] == DimensionKeyCache.QUERIES["plant"]
+        else default_rows)
+
+
+def test_load_single_table(mock_cursor):
+    cache = DimensionKeyCache()
+    cache.load(mock_cursor, ["continent"])
+    mock_cursor.execute.assert_called_once_with(DimensionKeyCache.QUERIES["continent"])
+    assert cache.get_id("continent", "Africa") == 3
+    assert cache.contains("continent", "Africa")
+    assert not cache.contains("country", "Kenya")
+    assert not cache.is_loaded()
+
+
+def test_load_all_tables(mock_cursor):
+    set_plant_rows(mock_cursor, [(7, 1, "2025-03-01")])
+    cache = DimensionKeyCache()
+    cache.load(mock_cursor)
+    assert mock_cursor.execute.call_count == len(DimensionKeyCache.QUERIES)
+    assert cache.is_loaded()
+
+
+def test_load_replaces_table(mock_cursor):
+    cache = DimensionKeyCache()
+    cache.load(mock_cursor, ["continent"])
+    mock_cursor.fetchall.return_value = [(3, "Africa"), (4, "Asia")]
+    cache.load(mock_cursor, ["continent"])
+    assert cache.ids["continent"] == {"africa": 3, "asia": 4}
+
+
+def test_load_unknown_table(mock_cursor):
+    with pytest.raises(ValueError):
+        DimensionKeyCache().load(mock_cursor, ["record"])
+
+
+def test_multi_column_key(mock_cursor):
+    mock_cursor.fetchall.return_value = [(1, "John Doe", "john@example.com", "123")]
+    cache = DimensionKeyCache()
+    cache.load(mock_cursor, ["botanist"])
+    assert cache.get_id("botanist", ("John Doe", "john@example.com", "123")) == 1
+
+
+def test_keys_match_like_the_collation(mock_cursor):
+    mock_cursor.fetchall.return_value = [(1, "John Doe", "john@example.com", "123"),
+                                         (2, "Ada  ", "ADA@example.com", "456")]
+    cache = DimensionKeyCache()
+    cache.load(mock_cursor, ["botanist"])
+    assert cache.get_id("botanist", ("JOHN DOE ", "John@Example.com", "123")) == 1
+    assert cache.contains("botanist", ("ada", "ada@example.com", "456"))
+    # Only trailing spaces are ignored
+    assert not cache.contains("botanist", (" Ada", "ada@example.com", "456"))
+
+
+def test_missing_key(mock_cursor):
+    cache = DimensionKeyCache()
+    cache.load(mock_cursor, ["continent"])
+    with pytest.raises(ValueError):
+        cache.get_id("continent", "Europe")
+
+
+def test_plant_last_watered(mock_cursor):
+    set_plant_rows(mock_cursor, [(7, 1, "2025-03-01"), (8, 2, None)])
+    cache = DimensionKeyCache()
+    cache.load(mock_cursor, ["plant"])
+    assert cache.get_id("plant", 1) == 7
+    assert cache.get_last_watered(1) == "2025-03-01"
+    assert cache.get_last_watered(2) is None
+    assert cache.get_last_watered(3) is None
+    cache.set_last_watered(2, "2025-03-02")
+    assert cache.get_last_watered(2) == "2025-03-02"
+
+
+def test_clear(mock_cursor):
+    set_plant_rows(mock_cursor, [(7, 1, "2025-03-01")])
+    cache = DimensionKeyCache()
+    cache.load(mock_cursor)
+    cache.clear()
+    assert not cache.is_loaded()
+    assert not cache.contains("continent", "Africa")
+    assert cache.get_last_watered(1) is None
@@ -1,6 +1,10 @@
+import asyncio
+import time
 import pytest
 from unittest.mock import patch
 from extract import RecordingAPIExtractor
+from plant_registry import PlantRegistry
+from request_policy import RequestPolicy
 
 
 @pytest.fixture
@@ -23,3 +27,287 @@ def test_make_request_failure(api_extractor):
 
         response = api_extractor._make_request(1)
         assert response is None
+
+
+def test_make_request_connection_error_retried(api_extractor):
+    import requests
+    api_extractor.policy.backoff_base_seconds = 0.001
+    with patch("requests.get") as mock_get:
+        mock_get.side_effect = [requests.exceptions.ConnectionError(),
+                                requests.exceptions.ReadTimeout(), mock_get.return_value]
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"plant_id": 1}
+        assert api_extractor._make_request(1, retries=2) == {"plant_id": 1}
+        assert mock_get.call_count == 3
+
+
+def test_make_request_gives_up_without_retries(api_extractor):
+    import requests
+    with patch("requests.get") as mock_get:
+        mock_get.side_effect = requests.exceptions.ConnectionError()
+        assert api_extractor._make_request(1) is None
+        assert mock_get.call_count == 1
+
+
+def test_retry_budget_shared_between_plants():
+    policy = RequestPolicy(retry_budget_ratio=0, min_retry_budget=5)
+    extractor = RecordingAPIExtractor(api_url="http://mock-api.com/", policy=policy)
+    assert extractor._share_retry_budget(list(range(1, 4))) == [2, 2, 1]
+    assert extractor._share_retry_budget([]) == []
+
+
+class FakeResponse:
+    '''Stand-in for an aiohttp response, usable as an async context manager.'''
+
+    def __init__(self, status, data=None):
+        self.status = status
+        self.data = data
+
+    async def json(self):
+        return self.data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeSession:
+    '''Stand-in for an aiohttp session which answers from a dict of url -> status/data.'''
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        result = self.responses.get(url)
+        if isinstance(result, Exception):
+            raise result
+        if result is None:
+            return FakeResponse(404)
+        return FakeResponse(200, result)
+
+
+def test_invalid_max_concurrency():
+    with pytest.raises(ValueError):
+        RecordingAPIExtractor(api_url="http://mock-api.com/", max_concurrency=0)
+
+
+def test_make_request_async_success(api_extractor):
+    session = FakeSession({"http://mock-api.com/1": {"plant_id": 1}})
+    response = asyncio.run(api_extractor._make_request_async(
+        session, asyncio.Semaphore(1), 1))
+    assert response == {"plant_id": 1}
+
+
+def test_make_request_async_failure(api_extractor):
+    session = FakeSession({})
+    response = asyncio.run(api_extractor._make_request_async(
+        session, asyncio.Semaphore(1), 1))
+    assert response is None
+
+
+def test_make_request_async_timeout(api_extractor):
+    session = FakeSession({"http://mock-api.com/1": asyncio.TimeoutError()})
+    response = asyncio.run(api_extractor._make_request_async(
+        session, asyncio.Semaphore(1), 1))
+    assert response is None
+
+
+def test_extract_api_data_async_filters_none():
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=4, max_concurrency=2)
+    session = FakeSession({
+        "http://mock-api.com/1": {"plant_id": 1},
+        "http://mock-api.com/3": {"plant_id": 3},
+    })
+    with patch("extract.aiohttp.ClientSession") as mock_session:
+        mock_session.return_value.__aenter__.return_value = session
+        responses = extractor.extract_api_data_async()
+    assert responses == [{"plant_id": 1}, {"plant_id": 3}]
+    assert len(session.requested) == 4
+
+
+def test_extract_api_data_async_uses_registry(tmp_path):
+    registry = PlantRegistry(path=str(tmp_path / "registry.json"),
+                             seed_plant_ids=[1, 2], discovery_window=1)
+    extractor = RecordingAPIExtractor(api_url="http://mock-api.com/", registry=registry)
+    session = FakeSession({"http://mock-api.com/1": {"plant_id": 1}})
+    with patch("extract.aiohttp.ClientSession") as mock_session:
+        mock_session.return_value.__aenter__.return_value = session
+        responses = extractor.extract_api_data_async()
+    assert responses == [{"plant_id": 1}]
+    assert session.requested == ["http://mock-api.com/1", "http://mock-api.com/2"]
+    assert registry.get_live_plant_ids() == [1]
+    assert (tmp_path / "registry.json").exists()
+
+
+class DelayedResponse(FakeResponse):
+    '''Fake response which takes a given time to arrive.'''
+
+    def __init__(self, status, data=None, delay=0):
+        super().__init__(status, data)
+        self.delay = delay
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.delay)
+        return self
+
+
+class ScriptedSession:
+    '''Fake session which answers each request to a url with the next scripted response.'''
+
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        return self.scripts[url].pop(0)
+
+
+def run_extraction(extractor, session):
+    with patch("extract.aiohttp.ClientSession") as mock_session:
+        mock_session.return_value.__aenter__.return_value = session
+        return extractor.extract_api_data_async()
+
+
+def test_slow_request_is_hedged():
+    policy = RequestPolicy(initial_hedge_delay_seconds=0.01)
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=1, policy=policy)
+    session = ScriptedSession({"http://mock-api.com/1": [
+        DelayedResponse(200, {"plant_id": "slow"}, delay=2),
+        DelayedResponse(200, {"plant_id": "hedge"}),
+    ]})
+    start = time.monotonic()
+    responses = run_extraction(extractor, session)
+    assert responses == [{"plant_id": "hedge"}]
+    assert time.monotonic() - start < 1
+
+
+def test_queued_request_is_not_hedged():
+    policy = RequestPolicy(initial_hedge_delay_seconds=0.05, retry_budget_ratio=0,
+                           min_retry_budget=5)
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=2, max_concurrency=1,
+        policy=policy)
+    session = ScriptedSession({
+        "http://mock-api.com/1": [DelayedResponse(200, {"plant_id": 1}, delay=0.2)],
+        "http://mock-api.com/2": [DelayedResponse(200, {"plant_id": 2})],
+    })
+    responses = run_extraction(extractor, session)
+    assert responses == [{"plant_id": 1}, {"plant_id": 2}]
+    # Only the request which was sent and slow is hedged, not the one queued behind it
+    assert extractor._retries_remaining == 4
+    assert session.requested.count("http://mock-api.com/2") == 1
+
+
+def test_timeout_latency_recorded(api_extractor):
+    session = FakeSession({"http://mock-api.com/1": asyncio.TimeoutError()})
+    asyncio.run(api_extractor._request_once(session, asyncio.Semaphore(1), 1))
+    assert len(api_extractor.policy.latencies) == 1
+
+
+def test_server_error_is_retried():
+    policy = RequestPolicy(backoff_base_seconds=0.001)
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=1, policy=policy)
+    session = ScriptedSession({"http://mock-api.com/1": [
+        DelayedResponse(500),
+        DelayedResponse(200, {"plant_id": 1}),
+    ]})
+    assert run_extraction(extractor, session) == [{"plant_id": 1}]
+    assert len(session.requested) == 2
+
+
+def test_not_found_is_not_retried():
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=1)
+    session = ScriptedSession({"http://mock-api.com/1": [DelayedResponse(404)]})
+    assert run_extraction(extractor, session) == []
+    assert len(session.requested) == 1
+
+
+def test_retry_budget_is_bounded():
+    policy = RequestPolicy(backoff_base_seconds=0.001,
+                           retry_budget_ratio=0, min_retry_budget=2)
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=1, policy=policy)
+    session = ScriptedSession({"http://mock-api.com/1": [
+        DelayedResponse(500) for _ in range(5)]})
+    assert run_extraction(extractor, session) == []
+    assert len(session.requested) == 3
+
+
+def test_deadline_keeps_finished_results():
+    policy = RequestPolicy(deadline_seconds=0.2, initial_hedge_delay_seconds=5)
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=2, policy=policy)
+    session = ScriptedSession({
+        "http://mock-api.com/1": [DelayedResponse(200, {"plant_id": 1})],
+        "http://mock-api.com/2": [DelayedResponse(200, {"plant_id": 2}, delay=3)],
+    })
+    start = time.monotonic()
+    assert run_extraction(extractor, session) == [{"plant_id": 1}]
+    assert time.monotonic() - start < 1
+
+
+def test_stream_api_data_calls_on_result_as_responses_arrive():
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=3)
+    session = ScriptedSession({
+        "http://mock-api.com/1": [DelayedResponse(200, {"plant_id": 1}, delay=0.1)],
+        "http://mock-api.com/2": [DelayedResponse(404)],
+        "http://mock-api.com/3": [DelayedResponse(200, {"plant_id": 3})],
+    })
+    received = []
+
+    async def on_result(response):
+        received.append(response)
+
+    with patch("extract.aiohttp.ClientSession") as mock_session:
+        mock_session.return_value.__aenter__.return_value = session
+        asyncio.run(extractor.stream_api_data(on_result))
+    assert received == [{"plant_id": 3}, {"plant_id": 1}]
+
+
+def test_deadline_leaves_no_requests_running():
+    from resources import ResourceManager
+    resources = ResourceManager()
+    policy = RequestPolicy(deadline_seconds=0.2, initial_hedge_delay_seconds=0.05)
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=5, max_concurrency=2,
+        policy=policy, resources=resources)
+    session = ScriptedSession({f"http://mock-api.com/{plant_id}": [
+        DelayedResponse(200, {"plant_id": plant_id}, delay=2) for _ in range(2)]
+        for plant_id in range(1, 6)})
+
+    async def get_session():
+        return session
+
+    with patch.object(resources, "get_http_session", get_session):
+        assert extractor.extract_api_data_async() == []
+    assert [task for task in asyncio.all_tasks(resources._loop) if not task.done()] == []
+    resources.close()
+
+
+class MalformedResponse(FakeResponse):
+    '''Fake response with a success code and a body which isn't JSON.'''
+
+    async def json(self):
+        import json
+        return json.loads("<html>Bad Gateway</html>")
+
+
+def test_malformed_body_is_not_retried_and_keeps_other_plants():
+    extractor = RecordingAPIExtractor(
+        api_url="http://mock-api.com/", min_plant_id=1, max_plant_id=2)
+    session = ScriptedSession({
+        "http://mock-api.com/1": [MalformedResponse(200)],
+        "http://mock-api.com/2": [DelayedResponse(200, {"plant_id": 2})],
+    })
+    assert run_extraction(extractor, session) == [{"plant_id": 2}]
+    assert session.requested.count("http://mock-api.com/1") == 1
@@ -0,0 +1,56 @@
+import pytest
+import requests
+from extract import RecordingAPIExtractor
+from fake_plants_api import FakePlantsAPI
+from request_policy import RequestPolicy
+from transform import PlantRecordingFactory
+
+
+@pytest.fixture
+def fake_api():
+    with FakePlantsAPI(plant_count=10, seed=0) as api:
+        yield api
+
+
+def test_invalid_error_rate():
+    with pytest.raises(ValueError):
+        FakePlantsAPI(error_rate=2)
+
+
+def test_existing_plant(fake_api):
+    response = requests.get(f"{fake_api.url}3", timeout=4)
+    assert response.status_code == 200
+    assert response.json()["plant_id"] == 3
+
+
+@pytest.mark.parametrize("plant_id", ["0", "11", "abc"])
+def test_missing_plant(fake_api, plant_id):
+    response = requests.get(f"{fake_api.url}{plant_id}", timeout=4)
+    assert response.status_code == 404
+
+
+def test_every_request_fails_with_full_error_rate():
+    with FakePlantsAPI(plant_count=1, error_rate=1) as api:
+        assert requests.get(f"{api.url}1", timeout=4).status_code == 500
+
+
+def test_responses_are_valid_plants(fake_api):
+    responses = [fake_api.make_plant(plant_id) for plant_id in range(1, 11)]
+    assert len(PlantRecordingFactory(responses).produce_plant_objects()) == 10
+
+
+def test_extractor_against_fake_api(fake_api):
+    extractor = RecordingAPIExtractor(
+        api_url=fake_api.url, min_plant_id=1, max_plant_id=12, max_concurrency=4)
+    responses = extractor.extract_api_data_async()
+    assert sorted(response["plant_id"] for response in responses) == list(range(1, 11))
+
+
+def test_extractor_hedges_past_timeouts():
+    policy = RequestPolicy(timeout_seconds=0.5, initial_hedge_delay_seconds=0.05,
+                           backoff_base_seconds=0.01, min_retry_budget=20)
+    with FakePlantsAPI(plant_count=10, timeout_rate=0.3, timeout_seconds=2, seed=1) as api:
+        extractor = RecordingAPIExtractor(
+            api_url=api.url, min_plant_id=1, max_plant_id=10, policy=policy)
+        responses = extractor.extract_api_data_async()
+    assert len(responses) == 10
@@ -1,6 +1,9 @@
 import pytest
+import pymssql
 from unittest.mock import MagicMock, patch
+from dimension_cache import DimensionKeyCache
 from load import DatabaseManager
+from load_spool import LoadSpool
 from models import Plant
 
 
@@ -20,41 +23,313 @@ def mock_plants():
     mock_plant.get_values.return_value = (
         1, "Fern", "John Doe", "Nairobi", "2025-03-01")
     mock_plant.get_record_values.return_value = (
-        1, 20.5, 30.2, "2025-03-01T12:00:00")
+        20.5, 30.2, "2025-03-01T12:00:00", 1)
     return [mock_plant] * 5
 
 
-@patch("load.pymssql.connect")
-def test_load_all(mock_connect, mock_plants):
-    mock_connection = mock_connect.return_value
-    mock_cursor = mock_connection.cursor.return_value
+class FakeCursor:
+    '''A cursor whose SELECTs return the rows of the given tables. Other statements are
+    recorded by the statements mock.'''
+
+    def __init__(self, tables=None):
+        self.tables = dict(tables or {})
+        self.last_table = None
+        self.executemany = MagicMock()
+        self.statements = MagicMock()
+        self.close = MagicMock()
+        self.select_count = 0
+
+    def execute(self, query, *args):
+        if not query.strip().startswith("SELECT"):
+            self.statements(query, *args)
+            return
+        self.select_count += 1
+        self.last_table = query.split("FROM")[1].strip().rstrip(";")
+
+    def fetchall(self):
+        return self.tables.get(self.last_table, [])
+
+
+WARM_TABLES = {
+    "continent": [(1, "Africa")],
+    "country": [(1, "Kenya")],
+    "city": [(1, "Nairobi")],
+    "botanist": [(1, "John Doe", "john@example.com", "123-456-7890")],
+    "plant_type": [(1, "Fern")],
+    "plant": [(7, 1, "2025-02-28")],
+}
+
+
+@patch("load.make_connection")
+def test_load_all(mock_make_connection, mock_plants):
+    mock_connection = mock_make_connection.return_value
+    mock_cursor = FakeCursor(WARM_TABLES)
+    mock_connection.cursor.return_value = mock_cursor
     db_manager = DatabaseManager(mock_plants)
 
-    db_manager.load_all()
+    assert db_manager.load_all() is True
 
-    assert mock_cursor.executemany.call_count == 7
+    # Every reference row and the plant are cached, so only the plant's new watering time,
+    # its watering event and the recordings are written
+    assert [call.args for call in mock_cursor.executemany.call_args_list] == [
+        (db_manager.PLANT_UPDATE, [("2025-03-01", 7)]),
+        (db_manager.WATERING_EVENT_INSERT, [(7, "2025-03-01")]),
+    ]
+    # The recordings are written in a single statement
+    mock_cursor.statements.assert_called_once_with(
+        db_manager.RECORDING_INSERT.format(rows=", ".join([db_manager.RECORDING_ROW] * 5)),
+        (7, 20.5, 30.2, "2025-03-01T12:00:00") * 5)
     # Expecting one commit after all operations
-    assert mock_cursor.commit.call_count == 1
+    assert mock_connection.commit.call_count == 1
+
+    mock_cursor.close.assert_called_once()
+    mock_connection.close.assert_called_once()
+
+
+def test_load_all_cold_cache(mock_plants):
+    mock_connection = MagicMock()
+    mock_cursor = FakeCursor()
+    mock_connection.cursor.return_value = mock_cursor
+
+    def merge_rows(query, values):
+        # Once merged, the new rows are returned by the reload of their table
+        for table, rows in WARM_TABLES.items():
+            if f"INTO {table} " in query:
+                mock_cursor.tables[table] = rows
+    mock_cursor.executemany.side_effect = merge_rows
+    db_manager = DatabaseManager(mock_plants, connection=mock_connection)
 
+    assert db_manager.load_all() is True
+
+    # Each reference row is merged once, in dependency order
     expected_calls = [
-        (db_manager.BOTANIST_UPSERT, [
-         plant.get_botanist().get_values() for plant in mock_plants]),
-        (db_manager.CONTINENT_UPSERT, [
-         plant.get_location().get_continent_values() for plant in mock_plants]),
-        (db_manager.COUNTRY_UPSERT, [
-         plant.get_location().get_country_values() for plant in mock_plants]),
-        (db_manager.CITY_UPSERT, [
-         plant.get_location().get_city_values() for plant in mock_plants]),
-        (db_manager.PLANT_TYPE_UPSERT, [
-         plant.get_plant_type().get_values() for plant in mock_plants]),
-        (db_manager.PLANT_UPSERT, [plant.get_values()
-         for plant in mock_plants]),
-        (db_manager.RECORDING_INSERT, [
-         plant.get_record_values() for plant in mock_plants]),
+        (db_manager.CONTINENT_UPSERT, [("Africa",)]),
+        (db_manager.COUNTRY_UPSERT, [("Kenya", "Nairobi", "Africa")]),
+        (db_manager.CITY_UPSERT, [("Nairobi", 1.0, 36.0, "Kenya")]),
+        (db_manager.BOTANIST_UPSERT, [("John Doe", "john@example.com", "123-456-7890")]),
+        (db_manager.PLANT_TYPE_UPSERT, [("Fern", "Pteridophyta", "url")]),
+        (db_manager.PLANT_INSERT, [(1, 1, 1, 1, "2025-03-01")]),
+        (db_manager.WATERING_EVENT_INSERT, [(7, "2025-03-01")]),
     ]
+    assert [call.args for call in mock_cursor.executemany.call_args_list] == expected_calls
+    assert db_manager.deduplicated_counts == {
+        "continent": 4, "country": 4, "city": 4, "botanist": 4, "plant_type": 4, "plant": 4}
+    assert db_manager.key_cache.get_id("plant", 1) == 7
 
-    for query, values in expected_calls:
-        mock_cursor.executemany.assert_any_call(query, values)
 
-    mock_cursor.close.assert_called_once()
-    mock_connection.close.assert_called_once()
+def test_key_cache_kept_between_loads(mock_plants):
+    key_cache = DimensionKeyCache()
+    for _ in range(2):
+        mock_connection = MagicMock()
+        mock_connection.cursor.return_value = FakeCursor(WARM_TABLES)
+        DatabaseManager(mock_plants, connection=mock_connection,
+                        key_cache=key_cache).load_all()
+    # The tables were only read by the first load
+    assert mock_connection.cursor.return_value.select_count == 0
+    assert key_cache.get_id("botanist", ("John Doe", "john@example.com", "123-456-7890")) == 1
+
+
+def test_unchanged_last_watered_not_written(mock_plants):
+    mock_connection = MagicMock()
+    mock_cursor = FakeCursor({**WARM_TABLES, "plant": [(7, 1, "2025-03-01")]})
+    mock_connection.cursor.return_value = mock_cursor
+    db_manager = DatabaseManager(mock_plants, connection=mock_connection)
+
+    assert db_manager.load_all() is True
+
+    mock_cursor.executemany.assert_not_called()
+    assert mock_cursor.statements.call_count == 1
+
+
+def test_last_watered_cached_after_update(mock_plants):
+    key_cache = DimensionKeyCache()
+    cursors = []
+    for _ in range(2):
+        mock_connection = MagicMock()
+        cursors.append(FakeCursor(WARM_TABLES))
+        mock_connection.cursor.return_value = cursors[-1]
+        DatabaseManager(mock_plants, connection=mock_connection,
+                        key_cache=key_cache).load_all()
+    # The first load writes the new watering time, the second finds it unchanged
+    assert cursors[0].executemany.call_count == 2
+    cursors[1].executemany.assert_not_called()
+    assert key_cache.get_last_watered(1) == "2025-03-01"
+
+
+def test_load_all_leaves_borrowed_connection_open(mock_plants):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value = FakeCursor(WARM_TABLES)
+    db_manager = DatabaseManager(mock_plants, connection=mock_connection)
+
+    assert db_manager.load_all() is True
+
+    mock_connection.commit.assert_called_once()
+    mock_connection.cursor.return_value.close.assert_called_once()
+    mock_connection.close.assert_not_called()
+
+
+def test_load_all_rolls_back_on_error(mock_plants):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value.executemany.side_effect = Exception("fail")
+    db_manager = DatabaseManager(mock_plants, connection=mock_connection)
+
+    assert db_manager.load_all() is False
+
+    mock_connection.rollback.assert_called_once()
+    mock_connection.commit.assert_not_called()
+    assert not db_manager.key_cache.is_loaded()
+
+
+def test_deduplicated_rows_reported(mock_plants, capsys):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value = FakeCursor(WARM_TABLES)
+    DatabaseManager(mock_plants[:2], connection=mock_connection).load_all()
+    assert capsys.readouterr().out == (
+        "Deduplicated 6 rows (continent: 1, country: 1, city: 1, botanist: 1, "
+        "plant_type: 1, plant: 1)\n")
+
+
+def test_distinct_values_keep_first(mock_plants):
+    db_manager = DatabaseManager(mock_plants, connection=MagicMock())
+    values = [("Fern", "a"), ("Palm", "b"), ("Fern", "c")]
+    assert db_manager._get_distinct_values("plant_type", values, lambda value: value[0]) == \
+        [("Fern", "a"), ("Palm", "b")]
+    assert db_manager.deduplicated_counts["plant_type"] == 1
+
+
+def test_chunk_size_within_sql_server_limits():
+    assert DatabaseManager.get_chunk_size(4) == 524
+    assert DatabaseManager.get_chunk_size(1) == 1000
+
+
+def test_recordings_inserted_in_chunks():
+    plants = []
+    for plant_number in range(1, 1201):
+        plant = MagicMock(spec=Plant)
+        plant.get_record_values.return_value = (20.5, 30.2, "2025-03-01T12:00:00", plant_number)
+        plants.append(plant)
+    mock_connection = MagicMock()
+    db_manager = DatabaseManager(plants, connection=mock_connection)
+    db_manager.key_cache.ids["plant"] = {number: number + 100 for number in range(1, 1201)}
+
+    db_manager._add_new_recordings(plants)
+
+    calls = mock_connection.cursor.return_value.execute.call_args_list
+    assert [len(call.args[1]) // 4 for call in calls] == [524, 524, 152]
+    assert all(len(call.args[1]) < DatabaseManager.MAX_PARAMETERS for call in calls)
+    assert calls[2].args[1][-4:] == (1300, 20.5, 30.2, "2025-03-01T12:00:00")
+
+
+def test_unreachable_batch_spooled(mock_plants):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value.executemany.side_effect = \
+        pymssql.OperationalError("connection dropped")
+    spool = MagicMock(spec=LoadSpool)
+    db_manager = DatabaseManager(mock_plants, connection=mock_connection, spool=spool)
+
+    assert db_manager.load_batch(mock_plants) is True
+
+    spool.write.assert_called_once_with(mock_plants, quarantine=False)
+    mock_connection.rollback.assert_called_once()
+
+
+def test_failing_batch_quarantined(mock_plants):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value.executemany.side_effect = ValueError("missing key")
+    spool = MagicMock(spec=LoadSpool)
+    db_manager = DatabaseManager(mock_plants, connection=mock_connection, spool=spool)
+
+    assert db_manager.load_batch(mock_plants) is True
+
+    spool.write.assert_called_once_with(mock_plants, quarantine=True)
+
+
+def test_failed_batch_without_spool(mock_plants):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value.executemany.side_effect = \
+        pymssql.OperationalError("connection dropped")
+    db_manager = DatabaseManager(mock_plants, connection=mock_connection)
+
+    assert db_manager.load_batch(mock_plants) is False
+
+
+def test_failed_spool_write(mock_plants):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value.executemany.side_effect = \
+        pymssql.OperationalError("connection dropped")
+    spool = MagicMock(spec=LoadSpool)
+    spool.write.side_effect = OSError("disk full")
+    db_manager = DatabaseManager(mock_plants, connection=mock_connection, spool=spool)
+
+    assert db_manager.load_batch(mock_plants) is False
+
+
+def test_spool_replayed_before_new_data(mock_plants):
+    mock_connection = MagicMock()
+    mock_cursor = FakeCursor(WARM_TABLES)
+    mock_connection.cursor.return_value = mock_cursor
+    spool = MagicMock(spec=LoadSpool)
+    spool.get_files.return_value = ["batch-1", "batch-2"]
+    spool.read.side_effect = [mock_plants[:3], mock_plants[:2]]
+    db_manager = DatabaseManager(mock_plants[:1], connection=mock_connection, spool=spool)
+
+    assert db_manager.load_all() is True
+
+    assert [call.args for call in spool.read.call_args_list] == [(["batch-1"],), (["batch-2"],)]
+    assert [call.args for call in spool.remove.call_args_list] == [(["batch-1"],), (["batch-2"],)]
+    # Each spooled batch is committed on its own, then the new plants
+    assert [len(call.args[1]) // 4 for call in mock_cursor.statements.call_args_list] == [3, 2, 1]
+    assert mock_connection.commit.call_count == 3
+
+
+def test_replay_stops_when_unreachable(mock_plants):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value.executemany.side_effect = \
+        pymssql.OperationalError("connection dropped")
+    spool = MagicMock(spec=LoadSpool)
+    spool.get_files.return_value = ["batch-1", "batch-2"]
+    spool.read.return_value = mock_plants
+    db_manager = DatabaseManager(mock_plants[:1], connection=mock_connection, spool=spool)
+
+    assert db_manager.replay_spool() is False
+    spool.read.assert_called_once_with(["batch-1"])
+    spool.remove.assert_not_called()
+    spool.record_failure.assert_not_called()
+
+    # The new plants are spooled behind the old ones without being tried
+    mock_connection.cursor.return_value.executemany.reset_mock()
+    assert db_manager.load_all() is True
+    spool.write.assert_called_once_with(mock_plants[:1], quarantine=False)
+
+
+def test_failing_spooled_batch_does_not_block_others(mock_plants):
+    mock_connection = MagicMock()
+    mock_cursor = FakeCursor(WARM_TABLES)
+    mock_connection.cursor.return_value = mock_cursor
+    bad_plant = MagicMock(spec=Plant)
+    bad_plant.get_location.side_effect = ValueError("bad batch")
+    spool = MagicMock(spec=LoadSpool)
+    spool.get_files.return_value = ["batch-1", "batch-2"]
+    spool.read.side_effect = [[bad_plant], mock_plants[:2]]
+    db_manager = DatabaseManager([], connection=mock_connection, spool=spool)
+
+    assert db_manager.replay_spool() is True
+
+    spool.record_failure.assert_called_once_with("batch-1")
+    spool.remove.assert_called_once_with(["batch-2"])
+
+
+
+def test_unreadable_spooled_batch_not_removed(tmp_path, mock_plants):
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value = FakeCursor(WARM_TABLES)
+    spool = LoadSpool(directory=str(tmp_path))
+    with open(tmp_path / ("0" + LoadSpool.SUFFIX), "wb") as file:
+        file.write(b"truncated")
+    db_manager = DatabaseManager([], connection=mock_connection, spool=spool)
+
+    assert db_manager.replay_spool() is True
+
+    mock_connection.commit.assert_not_called()
+    assert spool.get_files() == []
+    assert len(spool.get_quarantined_files()) == 1
@@ -0,0 +1,142 @@
+import gzip
+import os
+import pytest
+from load_spool import LoadSpool, plant_to_dict, dict_to_plant
+from models import Plant
+
+
+RAW_JSON = {
+    "botanist": {
+        "email": "test.test@lnhm.co.uk",
+        "name": "Test Test",
+        "phone": "001-481-273-3691x127"
+    },
+    "images": {"original_url": "https://test.com/storage/image/orig_image.jpg"},
+    "last_watered": "Mon, 31 Mar 2025 13:23:01 GMT",
+    "name": "Palm Tree",
+    "origin_location": ["5.27247", "-3.59625", "Bonoua", "CI", "Africa/Abidjan"],
+    "plant_id": 8,
+    "recording_taken": "2025-04-01 07:38:10",
+    "scientific_name": ["Arecaceae"],
+    "soil_moisture": 34.68277436878728,
+    "temperature": 11.541849271315279
+}
+
+
+@pytest.fixture
+def plant():
+    return Plant(RAW_JSON)
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return LoadSpool(directory=str(tmp_path / "spool"))
+
+
+def get_all_values(plant):
+    return (plant.get_values(), plant.get_record_values(),
+            plant.get_botanist().get_values(), plant.get_location().get_city_values(),
+            plant.get_location().get_country_values(), plant.get_plant_type().get_values())
+
+
+def test_plant_round_trip(plant):
+    assert get_all_values(dict_to_plant(plant_to_dict(plant))) == get_all_values(plant)
+
+
+def test_empty_spool(spool):
+    assert spool.get_files() == []
+    assert spool.read(spool.get_files()) == []
+
+
+def test_write_and_read(spool, plant):
+    spool.write([plant, plant])
+    spool.write([plant])
+    files = spool.get_files()
+    assert len(files) == 2
+    assert files == sorted(files)
+    plants = spool.read(files)
+    assert len(plants) == 3
+    assert get_all_values(plants[0]) == get_all_values(plant)
+
+
+def test_file_is_gzipped_ndjson(spool, plant):
+    spool.write([plant, plant])
+    with gzip.open(spool.get_files()[0], "rt", encoding="utf-8") as file:
+        assert len(file.readlines()) == 2
+
+
+def test_write_nothing(spool):
+    spool.write([])
+    assert spool.get_files() == []
+
+
+def test_remove(spool, plant):
+    spool.write([plant])
+    spool.remove(spool.get_files())
+    assert spool.get_files() == []
+
+
+def test_oldest_batches_evicted(spool, plant):
+    spool.write([plant])
+    oldest = spool.get_files()[0]
+    spool.max_bytes = os.path.getsize(oldest) * 2
+    spool.write([plant])
+    spool.write([plant])
+    files = spool.get_files()
+    assert len(files) == 2
+    assert oldest not in files
+
+
+def test_corrupt_batch_skipped_and_quarantined(spool, plant):
+    spool.write([plant])
+    os.makedirs(spool.directory, exist_ok=True)
+    corrupt = os.path.join(spool.directory, "0" + LoadSpool.SUFFIX)
+    with open(corrupt, "wb") as file:
+        file.write(b"not gzip")
+    assert len(spool.get_files()) == 2
+    assert len(spool.read(spool.get_files())) == 1
+    assert len(spool.get_files()) == 1
+    assert [os.path.basename(path) for path in spool.get_quarantined_files()] == \
+        ["0" + LoadSpool.SUFFIX]
+
+
+def test_truncated_batch_quarantined(spool, plant):
+    spool.write([plant] * 50)
+    path = spool.get_files()[0]
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[:len(data) // 2])
+    assert spool.read([path]) == []
+    assert spool.get_files() == []
+    assert len(spool.get_quarantined_files()) == 1
+
+
+def test_failed_replays_counted_then_quarantined(spool, plant):
+    spool.write([plant])
+    path = spool.get_files()[0]
+    for attempts in range(1, LoadSpool.MAX_ATTEMPTS):
+        path = spool.record_failure(path)
+        assert spool.get_files() == [path]
+        assert LoadSpool.get_attempts(path) == attempts
+    path = spool.record_failure(path)
+    assert spool.get_files() == []
+    assert spool.get_quarantined_files() == [path]
+    assert len(spool.read([path])) == 1
+
+
+def test_write_quarantined(spool, plant):
+    spool.write([plant], quarantine=True)
+    assert spool.get_files() == []
+    assert len(spool.get_quarantined_files()) == 1
+
+
+def test_quarantine_counted_in_size_cap(tmp_path, plant):
+    spool = LoadSpool(directory=str(tmp_path / "spool"), max_bytes=1)
+    spool.write([plant], quarantine=True)
+    assert spool.get_quarantined_files() == []
+
+
+def test_invalid_size_cap():
+    with pytest.raises(ValueError):
+        LoadSpool(max_bytes=0)
@@ -0,0 +1,144 @@
+import signal
+import pytest
+from unittest.mock import MagicMock, patch
+from micro_batching import MicroBatcher
+
+
+@pytest.fixture
+def mock_db_manager():
+    db_manager = MagicMock()
+    db_manager.replay_and_load.return_value = True
+    return db_manager
+
+
+def make_batcher(db_manager, **kwargs):
+    return MicroBatcher(lambda: db_manager, **kwargs)
+
+
+def test_batch_size_one_flushes_immediately(mock_db_manager):
+    batcher = make_batcher(mock_db_manager)
+    assert batcher.add(["plant"]) is True
+    mock_db_manager.replay_and_load.assert_called_once_with(["plant"])
+    mock_db_manager.close.assert_called_once()
+    assert batcher.buffer == []
+
+
+def test_flush_on_size(mock_db_manager):
+    batcher = make_batcher(mock_db_manager, max_batch_size=3)
+    assert batcher.add(["a", "b"]) is False
+    mock_db_manager.replay_and_load.assert_not_called()
+    assert batcher.add(["c"]) is True
+    mock_db_manager.replay_and_load.assert_called_once_with(["a", "b", "c"])
+
+
+@patch("micro_batching.time.monotonic")
+def test_flush_on_age(mock_monotonic, mock_db_manager):
+    batcher = make_batcher(mock_db_manager, max_batch_size=100, max_age_seconds=60)
+    mock_monotonic.return_value = 1000
+    batcher.add(["a"])
+    mock_monotonic.return_value = 1030
+    assert batcher.add(["b"]) is False
+    mock_monotonic.return_value = 1060
+    assert batcher.flush_if_due() is True
+    mock_db_manager.replay_and_load.assert_called_once_with(["a", "b"])
+
+
+def test_failed_flush_keeps_buffer(mock_db_manager):
+    mock_db_manager.replay_and_load.return_value = False
+    batcher = make_batcher(mock_db_manager)
+    assert batcher.add(["a"]) is False
+    assert batcher.buffer == ["a"]
+    mock_db_manager.close.assert_called_once()
+
+
+def test_flush_empty_buffer(mock_db_manager):
+    batcher = make_batcher(mock_db_manager)
+    assert batcher.flush() is True
+    assert batcher.flush_if_due() is False
+    mock_db_manager.replay_and_load.assert_not_called()
+
+
+@patch("micro_batching.signal.signal")
+@patch("micro_batching.atexit.register")
+def test_exit_handlers_installed_on_request(mock_register, mock_signal, mock_db_manager):
+    batcher = make_batcher(mock_db_manager)
+    mock_register.assert_not_called()
+    mock_signal.assert_not_called()
+    batcher.install_exit_handlers()
+    mock_register.assert_called_once_with(batcher.flush)
+    mock_signal.assert_called_once_with(signal.SIGTERM, batcher._handle_sigterm)
+
+
+def test_sigterm_calls_previous_handler_without_flushing(mock_db_manager):
+    batcher = make_batcher(mock_db_manager, max_batch_size=10)
+    batcher.previous_sigterm_handler = MagicMock()
+    batcher.add(["a"])
+    batcher._handle_sigterm(signal.SIGTERM, None)
+    mock_db_manager.replay_and_load.assert_not_called()
+    batcher.previous_sigterm_handler.assert_called_once_with(signal.SIGTERM, None)
+
+
+def test_sigterm_exits_by_default(mock_db_manager):
+    batcher = make_batcher(mock_db_manager, max_batch_size=10)
+    batcher.previous_sigterm_handler = signal.SIG_DFL
+    batcher.add(["a"])
+    with pytest.raises(SystemExit):
+        batcher._handle_sigterm(signal.SIGTERM, None)
+    # The buffer is left for the flush registered at exit
+    assert batcher.buffer == ["a"]
+
+
+def test_sigterm_during_flush_waits_for_it(mock_db_manager):
+    batcher = make_batcher(mock_db_manager, max_batch_size=10)
+    batcher.previous_sigterm_handler = signal.SIG_DFL
+
+    def replay_and_load(plants):
+        batcher._handle_sigterm(signal.SIGTERM, None)
+        # A flush from inside the interrupted one is not re-entered
+        assert batcher.flush() is False
+        return True
+
+    mock_db_manager.replay_and_load.side_effect = replay_and_load
+    batcher.add(["a"])
+    with pytest.raises(SystemExit):
+        batcher.flush()
+    mock_db_manager.replay_and_load.assert_called_once_with(["a"])
+    assert batcher.buffer == []
+
+
+@patch("micro_batching.time.monotonic")
+def test_flush_before_passing_max_age_at_next_run(mock_monotonic, mock_db_manager):
+    batcher = make_batcher(mock_db_manager, max_batch_size=100, max_age_seconds=300,
+                           run_interval_seconds=60)
+    mock_monotonic.return_value = 1000
+    assert batcher.add(["a"]) is False
+    # The next run would be 300 seconds after the first plant was buffered
+    mock_monotonic.return_value = 1240
+    assert batcher.add(["b"]) is True
+    mock_db_manager.replay_and_load.assert_called_once_with(["a", "b"])
+
+
+def test_responses_reported_once_flushed(mock_db_manager):
+    on_flush = MagicMock()
+    batcher = make_batcher(mock_db_manager, max_batch_size=2, on_flush=on_flush)
+    batcher.add(["a"], [{"plant_id": 1}])
+    on_flush.assert_not_called()
+    batcher.add(["b"], [{"plant_id": 2}])
+    on_flush.assert_called_once_with([{"plant_id": 1}, {"plant_id": 2}])
+    assert batcher.responses == []
+
+
+def test_responses_kept_when_flush_fails(mock_db_manager):
+    mock_db_manager.replay_and_load.return_value = False
+    on_flush = MagicMock()
+    batcher = make_batcher(mock_db_manager, on_flush=on_flush)
+    batcher.add(["a"], [{"plant_id": 1}])
+    on_flush.assert_not_called()
+    assert batcher.responses == [{"plant_id": 1}]
+
+
+@pytest.mark.parametrize("settings", [{"max_batch_size": 0}, {"max_age_seconds": -1},
+                                      {"run_interval_seconds": -1}])
+def test_invalid_settings(mock_db_manager, settings):
+    with pytest.raises(ValueError):
+        make_batcher(mock_db_manager, **settings)
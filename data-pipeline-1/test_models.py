@@ -1,5 +1,5 @@
 import pytest
-from models import Botanist, Location, Recording, PlantType, Plant
+from models import Botanist, Location, Recording, PlantType, Plant, get_country_names
 
 
 FULL_RAW_JSON = {
@@ -388,3 +388,39 @@ class TestPlant():
         assert plant._Plant__last_watered.hour == 13
         assert plant._Plant__last_watered.minute == 23
         assert plant._Plant__last_watered.second == 1
+
+    def test_plant_init_shared_objects(self):
+        botanist = Botanist(FULL_RAW_JSON["botanist"])
+        location = Location(FULL_RAW_JSON["origin_location"])
+        plant = Plant(FULL_RAW_JSON, botanist=botanist, location=location)
+        assert plant.get_botanist() is botanist
+        assert plant.get_location() is location
+        assert plant.get_plant_type().get_values()[0] == "Palm Tree"
+
+    def test_models_are_slotted(self):
+        plant = Plant(FULL_RAW_JSON)
+        for model in [plant, plant.get_botanist(), plant.get_location(),
+                      plant.get_plant_type(), plant._Plant__record]:
+            assert not hasattr(model, '__dict__')
+
+
+class TestCountryNames:
+
+    def test_lookup_loaded_once(self):
+        assert get_country_names() is get_country_names()
+
+    def test_lookup_is_immutable(self):
+        with pytest.raises(TypeError):
+            get_country_names()["XX"] = "Nowhere"
+
+    def test_lookup_keeps_namibia(self):
+        # "NA" must not be read as a missing value
+        assert get_country_names()["NA"] == "Namibia"
+
+    def test_lowercase_code(self):
+        location = Location(["5.27247", "-3.59625", "Bonoua", "ci", "Africa/Abidjan"])
+        assert location._Location__country == "Côte d'Ivoire"
+
+    def test_unknown_code(self):
+        with pytest.raises(ValueError):
+            Location(["5.27247", "-3.59625", "Bonoua", "XX", "Africa/Abidjan"])
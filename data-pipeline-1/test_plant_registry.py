@@ -0,0 +1,86 @@
+import pytest
+from plant_registry import PlantRegistry
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    return str(tmp_path / "registry.json")
+
+
+def test_seed_ids_polled_on_first_run(registry_path):
+    registry = PlantRegistry(path=registry_path, seed_plant_ids=range(1, 4),
+                             discovery_window=0)
+    assert registry.get_plant_ids_to_poll() == [1, 2, 3]
+
+
+def test_invalid_discovery_window(registry_path):
+    with pytest.raises(ValueError):
+        PlantRegistry(path=registry_path, discovery_window=-1)
+
+
+def test_invalid_max_backoff(registry_path):
+    with pytest.raises(ValueError):
+        PlantRegistry(path=registry_path, max_backoff_runs=0)
+
+
+def test_discovery_window_above_highest_found(registry_path):
+    registry = PlantRegistry(path=registry_path, seed_plant_ids=range(1, 4),
+                             discovery_window=2)
+    registry.record_results([1, 2, 3], [1, 2, 3])
+    assert registry.get_plant_ids_to_poll() == [1, 2, 3, 4, 5]
+
+
+def test_new_plant_extends_discovery_window(registry_path):
+    registry = PlantRegistry(path=registry_path, seed_plant_ids=[1],
+                             discovery_window=2)
+    registry.record_results([1, 2, 3], [1, 2])
+    assert registry.highest_found_id == 2
+    assert registry.get_live_plant_ids() == [1, 2]
+    assert 4 in registry.get_plant_ids_to_poll()
+
+
+def test_failing_id_backs_off(registry_path):
+    registry = PlantRegistry(path=registry_path, seed_plant_ids=[1, 2],
+                             discovery_window=0)
+    polled_runs = []
+    for run in range(10):
+        plant_ids = registry.get_plant_ids_to_poll()
+        if 2 in plant_ids:
+            polled_runs.append(run)
+        registry.record_results(plant_ids, [1])
+    # Polled on runs 0, 1, 3 and 7 as the backoff doubles
+    assert polled_runs == [0, 1, 3, 7]
+
+
+def test_backoff_capped(registry_path):
+    registry = PlantRegistry(path=registry_path, max_backoff_runs=4)
+    assert registry._get_backoff_runs(1) == 1
+    assert registry._get_backoff_runs(3) == 4
+    assert registry._get_backoff_runs(30) == 4
+
+
+def test_recovered_id_polled_every_run(registry_path):
+    registry = PlantRegistry(path=registry_path, seed_plant_ids=[1],
+                             discovery_window=0)
+    registry.record_results([1], [])
+    registry.record_results([1], [1])
+    assert registry.get_plant_ids_to_poll() == [1]
+    assert registry.get_live_plant_ids() == [1]
+
+
+def test_save_and_load(registry_path):
+    registry = PlantRegistry(path=registry_path, seed_plant_ids=[1, 2])
+    registry.record_results([1, 2], [2])
+    registry.save()
+    loaded = PlantRegistry(path=registry_path, seed_plant_ids=[99])
+    assert loaded.run_number == 1
+    assert loaded.highest_found_id == 2
+    assert loaded.plants == registry.plants
+
+
+def test_corrupt_file_falls_back_to_seed(registry_path):
+    with open(registry_path, "w", encoding="utf-8") as file:
+        file.write("not json")
+    registry = PlantRegistry(path=registry_path, seed_plant_ids=[1],
+                             discovery_window=0)
+    assert registry.get_plant_ids_to_poll() == [1]
@@ -0,0 +1,59 @@
+import pytest
+from request_policy import RequestPolicy
+
+
+def test_invalid_timeout():
+    with pytest.raises(ValueError):
+        RequestPolicy(timeout_seconds=0)
+
+
+def test_invalid_hedge_percentile():
+    with pytest.raises(ValueError):
+        RequestPolicy(hedge_percentile=101)
+
+
+def test_initial_hedge_delay_until_enough_samples():
+    policy = RequestPolicy(initial_hedge_delay_seconds=2, min_latency_samples=3)
+    policy.record_latency(0.1)
+    policy.record_latency(0.2)
+    assert policy.get_hedge_delay() == 2
+
+
+def test_hedge_delay_from_percentile():
+    policy = RequestPolicy(hedge_percentile=95, min_latency_samples=1,
+                           min_hedge_delay_seconds=0)
+    for latency in range(1, 101):
+        policy.record_latency(latency / 100)
+    assert policy.get_hedge_delay() == 0.95
+
+
+def test_hedge_delay_has_minimum():
+    policy = RequestPolicy(min_latency_samples=1, min_hedge_delay_seconds=0.5)
+    policy.record_latency(0.01)
+    assert policy.get_hedge_delay() == 0.5
+
+
+def test_latency_window_is_bounded():
+    policy = RequestPolicy(latency_window=10)
+    for _ in range(50):
+        policy.record_latency(1)
+    assert len(policy.latencies) == 10
+
+
+@pytest.mark.parametrize("number_of_requests, expected",
+                         [(0, 5), (10, 5), (55, 11), (1000, 200)])
+def test_retry_budget(number_of_requests, expected):
+    policy = RequestPolicy(retry_budget_ratio=0.2, min_retry_budget=5)
+    assert policy.get_retry_budget(number_of_requests) == expected
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RequestPolicy(backoff_base_seconds=0.1, backoff_max_seconds=1)
+    for attempt in range(10):
+        backoff = policy.get_backoff_seconds(attempt)
+        assert 0 <= backoff <= min(1, 0.1 * 2 ** attempt)
+
+
+def test_hedging_turned_off():
+    policy = RequestPolicy(hedge_percentile=None)
+    assert policy.get_hedge_delay() is None
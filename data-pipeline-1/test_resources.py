@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+import pymssql
+from resources import ResourceManager
+
+
+@patch("resources.make_connection")
+def test_db_connection_reused_when_alive(mock_make_connection):
+    resources = ResourceManager()
+    first = resources.get_db_connection()
+    second = resources.get_db_connection()
+    assert first is second
+    mock_make_connection.assert_called_once()
+    first.cursor.return_value.__enter__.return_value.execute.assert_called_with(
+        resources.HEALTH_CHECK_QUERY)
+
+
+@patch("resources.make_connection")
+def test_db_connection_replaced_when_dropped(mock_make_connection):
+    dropped, fresh = MagicMock(), MagicMock()
+    dropped.cursor.return_value.__enter__.return_value.execute.side_effect = \
+        pymssql.OperationalError("connection dropped")
+    mock_make_connection.side_effect = [dropped, fresh]
+    resources = ResourceManager()
+    assert resources.get_db_connection() is dropped
+    assert resources.get_db_connection() is fresh
+    dropped.close.assert_called_once()
+
+
+def test_http_session_reused_across_runs():
+    resources = ResourceManager()
+    first = resources.run(resources.get_http_session())
+    second = resources.run(resources.get_http_session())
+    assert first is second
+    resources.close()
+    assert first.closed
+
+
+def test_http_session_replaced_when_closed():
+    resources = ResourceManager()
+    first = resources.run(resources.get_http_session())
+    resources.run(first.close())
+    second = resources.run(resources.get_http_session())
+    assert first is not second
+    resources.close()
+
+
+def test_new_loop_after_close():
+    resources = ResourceManager()
+    resources.run(asyncio.sleep(0))
+    resources.close()
+    assert resources.run(asyncio.sleep(0, result=1)) == 1
+    resources.close()
@@ -0,0 +1,215 @@
+import sqlite3
+import pytest
+from dimension_cache import DimensionKeyCache
+from load_spool import LoadSpool
+from sqlite_backend import SQLiteDatabaseManager, make_sqlite_connection, translate_schema
+from transform import PlantRecordingFactory
+
+
+RESPONSE = {
+    "botanist": {
+        "email": "gertrude.jekyll@lnhm.co.uk",
+        "name": "Gertrude Jekyll",
+        "phone": "001-481-273-3691x127"
+    },
+    "last_watered": "Mon, 31 Mar 2025 14:17:54 GMT",
+    "name": "Colocasia Esculenta",
+    "origin_location": ["51.30001", "13.10984", "Oschatz", "DE", "Europe/Berlin"],
+    "plant_id": 14,
+    "recording_taken": "2025-04-01 14:12:18",
+    "scientific_name": ["Colocasia esculenta"],
+    "soil_moisture": 19.035973523047986,
+    "temperature": 13.110190553320937
+}
+
+
+@pytest.fixture
+def connection():
+    connection = make_sqlite_connection()
+    yield connection
+    connection.close()
+
+
+def make_plants(plant_numbers):
+    return PlantRecordingFactory([{**RESPONSE, "plant_id": plant_number}
+                                  for plant_number in plant_numbers]).produce_plant_objects()
+
+
+def count_rows(connection, table):
+    return connection.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+
+
+def test_translate_schema():
+    assert translate_schema("plant_id SMALLINT IDENTITY(1,1) PRIMARY KEY,") == \
+        "plant_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+
+
+def test_translate_schema_indexes():
+    assert translate_schema(
+        "record_id BIGINT IDENTITY(1,1) CONSTRAINT pk_record PRIMARY KEY NONCLUSTERED,") == \
+        "record_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    assert translate_schema("CREATE CLUSTERED INDEX ix ON record (record_timestamp);") == \
+        "CREATE INDEX ix ON record (record_timestamp);"
+    assert translate_schema(
+        "CREATE NONCLUSTERED INDEX ix ON record (plant_id) INCLUDE (record_timestamp);") == \
+        "CREATE INDEX ix ON record (plant_id);"
+    assert translate_schema("CREATE UNIQUE NONCLUSTERED INDEX ux ON plant (plant_number);") == \
+        "CREATE UNIQUE INDEX ux ON plant (plant_number);"
+
+
+def test_schema_created(connection):
+    assert count_rows(connection, "continent") == 7
+    assert count_rows(connection, "record") == 0
+
+
+def test_load_plants(connection):
+    plants = make_plants([1, 2])
+    db_manager = SQLiteDatabaseManager(plants, connection=connection)
+    assert db_manager.load_batch(plants) is True
+    assert count_rows(connection, "plant") == 2
+    assert count_rows(connection, "record") == 2
+    assert count_rows(connection, "botanist") == 1
+    assert connection.execute(
+        "SELECT country_name, country_capital FROM country;").fetchall() == [("Germany", "Berlin")]
+    taken = connection.execute("SELECT record_timestamp FROM record;").fetchone()[0]
+    assert taken.hour == 14
+
+
+def test_reference_rows_not_duplicated(connection):
+    plants = make_plants([1])
+    SQLiteDatabaseManager(plants, connection=connection).load_batch(plants)
+    # A cold cache merges every reference row again, which must not add duplicates
+    SQLiteDatabaseManager(plants, connection=connection,
+                          key_cache=DimensionKeyCache()).load_batch(plants)
+    for table in ["country", "city", "botanist", "plant_type", "plant"]:
+        assert count_rows(connection, table) == 1
+    assert count_rows(connection, "record") == 2
+
+
+def test_reference_rows_differing_in_case_reused(connection):
+    plants = make_plants([1])
+    SQLiteDatabaseManager(plants, connection=connection).load_batch(plants)
+    renamed = PlantRecordingFactory([{**RESPONSE, "plant_id": 2,
+                                      "name": "COLOCASIA ESCULENTA ",
+                                      "botanist": {**RESPONSE["botanist"],
+                                                   "name": "gertrude jekyll"}}]
+                                    ).produce_plant_objects()
+    assert SQLiteDatabaseManager(renamed, connection=connection,
+                                 key_cache=DimensionKeyCache()).load_batch(renamed) is True
+    assert count_rows(connection, "plant_type") == 1
+    assert count_rows(connection, "botanist") == 1
+    assert count_rows(connection, "plant") == 2
+
+
+def test_watering_events(connection):
+    plants = make_plants([1])
+    SQLiteDatabaseManager(plants, connection=connection).load_batch(plants)
+    # Polled again with the same time, then watered again
+    SQLiteDatabaseManager(plants, connection=connection,
+                          key_cache=DimensionKeyCache()).load_batch(plants)
+    watered = PlantRecordingFactory([{**RESPONSE, "plant_id": 1,
+                                      "last_watered": "Tue, 01 Apr 2025 13:54:32 GMT"}]
+                                    ).produce_plant_objects()
+    SQLiteDatabaseManager(watered, connection=connection).load_batch(watered)
+    events = connection.execute(
+        "SELECT watered_at FROM watering_event ORDER BY watered_at;").fetchall()
+    assert [event[0].day for event in events] == [31, 1]
+    assert connection.execute(
+        "SELECT plant_last_watered FROM plant;").fetchone()[0].day == 1
+
+
+def test_every_watering_in_a_batch_kept(connection):
+    plants = make_plants([1])
+    SQLiteDatabaseManager(plants, connection=connection).load_batch(plants)
+    # Two later polls in one batch, such as a micro-batch or a spool replay, each watered
+    polls = PlantRecordingFactory([
+        {**RESPONSE, "plant_id": 1, "last_watered": "Tue, 01 Apr 2025 08:00:00 GMT",
+         "recording_taken": "2025-04-01 09:00:00"},
+        {**RESPONSE, "plant_id": 1, "last_watered": "Tue, 01 Apr 2025 13:54:32 GMT"},
+    ]).produce_plant_objects()
+    SQLiteDatabaseManager(polls, connection=connection).load_batch(polls)
+    events = connection.execute(
+        "SELECT watered_at FROM watering_event ORDER BY watered_at;").fetchall()
+    assert [(event[0].day, event[0].hour) for event in events] == [(31, 14), (1, 8), (1, 13)]
+    assert connection.execute(
+        "SELECT plant_last_watered FROM plant;").fetchone()[0].hour == 13
+
+
+def test_recordings_chunked_under_parameter_limit(connection):
+    plants = make_plants(range(1, 601))
+    assert SQLiteDatabaseManager(plants, connection=connection).load_batch(plants) is True
+    assert count_rows(connection, "record") == 600
+
+
+def test_failed_batch_rolled_back(connection):
+    plants = make_plants([1])
+    db_manager = SQLiteDatabaseManager(plants, connection=connection)
+    # The recordings fail after the reference rows and plant, so the whole batch is rolled back
+    db_manager.RECORDING_INSERT = "INSERT INTO no_such_table VALUES {rows};"
+    assert db_manager.load_batch(plants) is False
+    assert count_rows(connection, "plant") == 0
+    assert count_rows(connection, "botanist") == 0
+
+
+def test_batch_interrupted_by_exit_rolled_back(connection, monkeypatch):
+    plants = make_plants([1])
+    db_manager = SQLiteDatabaseManager(plants, connection=connection)
+
+    def exit_during_recordings(plants):
+        raise SystemExit(143)
+
+    monkeypatch.setattr(db_manager, "_add_new_recordings", exit_during_recordings)
+    with pytest.raises(SystemExit):
+        db_manager.load_batch(plants)
+    assert count_rows(connection, "plant") == 0
+
+
+@pytest.mark.parametrize("message, transient", [
+    ("database is locked", True), ("database table is locked", True),
+    ("no such table: record", False), ('near "VALUES": syntax error', False)])
+def test_only_locked_database_is_transient(connection, message, transient):
+    db_manager = SQLiteDatabaseManager([], connection=connection)
+    assert db_manager.is_transient(sqlite3.OperationalError(message)) is transient
+    assert db_manager.is_transient(sqlite3.IntegrityError(message)) is False
+
+
+def test_sql_error_quarantined(connection, tmp_path):
+    plants = make_plants([1])
+    spool = LoadSpool(directory=str(tmp_path))
+    db_manager = SQLiteDatabaseManager(plants, connection=connection, spool=spool)
+    db_manager.RECORDING_INSERT = "INSERT INTO no_such_table VALUES {rows};"
+    assert db_manager.load_batch(plants) is True
+    assert spool.get_files() == []
+    assert len(spool.get_quarantined_files()) == 1
+
+
+def test_stale_cached_id_reloaded_and_retried(connection):
+    plants = make_plants([1])
+    db_manager = SQLiteDatabaseManager(plants, connection=connection)
+    db_manager.key_cache.load(db_manager.cursor)
+    # A stale cached id breaks the foreign key, so the cache is reloaded and the batch retried
+    db_manager.key_cache.ids["plant_type"]["colocasia esculenta"] = 999
+    assert db_manager.load_batch(plants) is True
+    assert count_rows(connection, "plant") == 1
+    assert count_rows(connection, "record") == 1
+
+
+def test_plant_missing_from_cache_reloaded_and_retried(connection):
+    key_cache = DimensionKeyCache()
+    db_manager = SQLiteDatabaseManager([], connection=connection, key_cache=key_cache)
+    key_cache.load(db_manager.cursor)
+    # Another writer adds the plant after the cache was loaded
+    plants = make_plants([1])
+    SQLiteDatabaseManager(plants, connection=connection).load_batch(plants)
+    assert db_manager.load_batch(plants) is True
+    assert count_rows(connection, "plant") == 1
+    assert count_rows(connection, "record") == 2
+
+
+def test_own_connection_from_path(tmp_path):
+    path = str(tmp_path / "plants.db")
+    plants = make_plants([1])
+    assert SQLiteDatabaseManager(plants, path=path).load_all() is True
+    connection = make_sqlite_connection(path)
+    assert count_rows(connection, "record") == 1
+    connection.close()
@@ -0,0 +1,97 @@
+import asyncio
+from unittest.mock import MagicMock
+import pytest
+from change_cache import RecordingChangeCache
+from streaming import StreamingPipeline
+
+
+def make_response(plant_id):
+    return {
+        "botanist": {
+            "email": "gertrude.jekyll@lnhm.co.uk",
+            "name": "Gertrude Jekyll",
+            "phone": "001-481-273-3691x127"
+        },
+        "last_watered": "Mon, 31 Mar 2025 14:17:54 GMT",
+        "name": "Colocasia Esculenta",
+        "origin_location": [
+            "29.65163",
+            "-82.32483",
+            "Gainesville",
+            "US",
+            "America/New_York"
+        ],
+        "plant_id": plant_id,
+        "recording_taken": "2025-04-01 14:12:18",
+        "soil_moisture": 19.035973523047986,
+        "temperature": 13.110190553320937
+    }
+
+
+class FakeExtractor:
+    '''Stand-in extractor which streams a fixed list of responses.'''
+
+    resources = None
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    async def stream_api_data(self, on_result):
+        for response in self.responses:
+            await asyncio.sleep(0)
+            await on_result(response)
+
+
+@pytest.fixture
+def db_manager():
+    manager = MagicMock()
+    manager.load_batch.return_value = True
+    return manager
+
+
+def test_invalid_batch_size(db_manager):
+    with pytest.raises(ValueError):
+        StreamingPipeline(FakeExtractor([]), db_manager, batch_size=0)
+
+
+def test_all_plants_loaded(db_manager):
+    responses = [make_response(plant_id) for plant_id in range(1, 8)]
+    pipeline = StreamingPipeline(FakeExtractor(responses), db_manager, batch_size=3)
+    assert pipeline.run() == 7
+    loaded = [plant for call in db_manager.load_batch.call_args_list
+              for plant in call.args[0]]
+    assert [plant.get_values()[0] for plant in loaded] == list(range(1, 8))
+    assert all(len(call.args[0]) <= 3
+               for call in db_manager.load_batch.call_args_list)
+
+
+def test_invalid_responses_dropped(db_manager):
+    responses = [make_response(1), {"very": "invalid"}, make_response(2)]
+    pipeline = StreamingPipeline(FakeExtractor(responses), db_manager)
+    assert pipeline.run() == 2
+
+
+def test_no_responses(db_manager):
+    pipeline = StreamingPipeline(FakeExtractor([]), db_manager)
+    assert pipeline.run() == 0
+    db_manager.load_batch.assert_not_called()
+
+
+def test_change_cache_skips_and_updates(db_manager):
+    cache = RecordingChangeCache()
+    cache.update([make_response(1)])
+    responses = [make_response(1), make_response(2)]
+    pipeline = StreamingPipeline(FakeExtractor(responses), db_manager,
+                                 change_cache=cache)
+    assert pipeline.run() == 1
+    assert cache.filter_changed(responses) == []
+
+
+def test_failed_batch_not_cached(db_manager):
+    db_manager.load_batch.return_value = False
+    cache = RecordingChangeCache()
+    responses = [make_response(1)]
+    pipeline = StreamingPipeline(FakeExtractor(responses), db_manager,
+                                 change_cache=cache)
+    assert pipeline.run() == 0
+    assert cache.filter_changed(responses) == responses
@@ -118,3 +118,30 @@ def test_empty_list():
     factory = PlantRecordingFactory([])
     plant_list = factory.produce_plant_objects()
     assert len(plant_list) == 0
+
+
+def test_reference_objects_are_shared(json_response_list):
+    repeated = [{**json_response_list[0], "plant_id": plant_id} for plant_id in [1, 2, 3]]
+    factory = PlantRecordingFactory(repeated + json_response_list[1:])
+    plant_list = factory.produce_plant_objects()
+    assert len(plant_list) == 5
+    assert plant_list[0].get_botanist() is plant_list[2].get_botanist()
+    assert plant_list[0].get_location() is plant_list[1].get_location()
+    assert plant_list[0].get_plant_type() is plant_list[2].get_plant_type()
+    assert plant_list[0].get_botanist() is not plant_list[3].get_botanist()
+    assert len(factory.botanists) == 3
+    assert len(factory.locations) == 3
+
+
+def test_invalid_reference_data_not_interned(json_response_list):
+    invalid = {**json_response_list[0], "origin_location": ["1", "2", "Nowhere", "XX", "A/B"]}
+    factory = PlantRecordingFactory([invalid, json_response_list[0]])
+    plant_list = factory.produce_plant_objects()
+    assert len(plant_list) == 1
+    assert len(factory.locations) == 1
+
+
+def test_unhashable_reference_data_still_built(json_response_list):
+    response = {**json_response_list[0],
+                "botanist": {**json_response_list[0]["botanist"], "name": ["Gertrude"]}}
+    assert PlantRecordingFactory.get_botanist_key(response) is None
@@ -1,26 +1,109 @@
 '''
-    The transformation part of the first data pipeline. The aim of this script is to 
+    The transformation part of the first data pipeline. The aim of this script is to
     transform the raw plant data into objects, with cleaned and connected attributes.
 '''
 
-from models import Plant
+from models import Botanist, Location, PlantType, Plant
 
 
 class PlantRecordingFactory:
     '''Class which takes a list of json objects containing plant data and transforms them into
-    a list of actual plant objects.'''
+    a list of actual plant objects. Botanists, locations and plant types are interned: each
+    distinct one is built and validated once, and shared by every plant which refers to it.'''
 
     def __init__(self, responses: list[dict]):
         '''Initialise with the list of responses'''
         self.responses = responses
+        self.rejections = []
+        self.botanists = {}
+        self.locations = {}
+        self.plant_types = {}
 
     def produce_plant_objects(self) -> list[Plant]:
         '''Creates a list of Plant objects, one object for each json response. If an error is raised
         in the process of making the plant object, the response is deemed invalid and skipped.'''
         plants = []
         for response in self.responses:
-            try:
-                plants.append(Plant(response))
-            except ValueError:
-                continue
+            plant = self.produce_plant_object(response)
+            if plant is not None:
+                plants.append(plant)
         return plants
+
+    def produce_plant_object(self, response: dict) -> Plant:
+        '''Creates a Plant object from a single json response, or returns None if the
+        response is invalid.'''
+        try:
+            return Plant(
+                response,
+                botanist=self.intern(self.botanists, self.get_botanist_key(response),
+                                     lambda: Botanist(response.get('botanist'))),
+                location=self.intern(self.locations, self.get_location_key(response),
+                                     lambda: Location(response.get('origin_location'))),
+                plant_type=self.intern(self.plant_types, self.get_plant_type_key(response),
+                                       lambda: PlantType({
+                                           "name": response.get('name'),
+                                           "scientific_name": response.get('scientific_name'),
+                                           "images": response.get('images'),
+                                       })),
+            )
+        except ValueError:
+            return None
+
+    @staticmethod
+    def intern(pool: dict, key: tuple, build):
+        '''Return the object in the pool for the key, building and adding it if there is none
+        yet. A key of None means the data can't be interned, so the object is built each time.'''
+        if key is None:
+            return build()
+        if key not in pool:
+            pool[key] = build()
+        return pool[key]
+
+    @staticmethod
+    def get_botanist_key(response: dict) -> tuple:
+        '''The key identifying the botanist data of a response.'''
+        botanist = response.get('botanist')
+        if not isinstance(botanist, dict):
+            return None
+        return PlantRecordingFactory.make_hashable(
+            (botanist.get('name'), botanist.get('email'), botanist.get('phone')))
+
+    @staticmethod
+    def get_location_key(response: dict) -> tuple:
+        '''The key identifying the origin location data of a response.'''
+        location = response.get('origin_location')
+        if not isinstance(location, list):
+            return None
+        return PlantRecordingFactory.make_hashable(tuple(location))
+
+    @staticmethod
+    def get_plant_type_key(response: dict) -> tuple:
+        '''The key identifying the plant type data of a response. Only the original image url
+        is used by PlantType, so the rest of the images are left out.'''
+        scientific_name = response.get('scientific_name')
+        images = response.get('images')
+        return PlantRecordingFactory.make_hashable((
+            response.get('name'),
+            tuple(scientific_name) if isinstance(scientific_name, list) else scientific_name,
+            images.get('original_url') if isinstance(images, dict) else images,
+        ))
+
+    @staticmethod
+    def make_hashable(key: tuple) -> tuple:
+        '''Return the key if it can be used in a dict, otherwise None.'''
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def produce_plant_objects_batch(self) -> list[Plant]:
+        '''Creates a list of Plant objects with the responses validated as columns rather
+        than one object at a time, which is much faster for large numbers of responses. The
+        plant id and reason of each invalid response are kept in the rejections attribute.'''
+        from batch_validation import BatchValidator
+        if not self.responses:
+            return []
+        cleaned, rejections = BatchValidator(self.responses).validate()
+        self.rejections = list(rejections.itertuples(index=False, name=None))
+        return BatchValidator.make_plants(cleaned)
@@ -0,0 +1,155 @@
+'''
+    DATA PIPELINE 2: archive_sink
+    This script defines the file-like sinks the archive is written into. S3MultipartSink streams
+    the archive from memory into an S3 multipart upload, uploading its parts in parallel, and
+    LocalDirectorySink writes it to a local directory in place of the bucket.
+'''
+
+import io
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+MIB = 1024 * 1024
+
+
+class S3MultipartSink(io.RawIOBase):
+    '''A writable binary file which streams into an S3 object. Written bytes are buffered
+    in memory, and every full part is uploaded in the background while the next is written.
+    An archive smaller than one part is uploaded in a single put_object when the sink is
+    closed. If the sink is left with an exception, the upload is aborted.'''
+
+    # S3 rejects multipart parts smaller than 5MiB, except the last
+    MIN_PART_SIZE = 5 * MIB
+
+    def __init__(self, client, bucket: str, key: str, part_size: int = 8 * MIB,
+                 max_workers: int = 4):
+        '''At most max_workers parts are uploaded at once, so no more than
+        max_workers + 1 parts are held in memory.'''
+        super().__init__()
+        if part_size < self.MIN_PART_SIZE:
+            raise ValueError(f'The part size must be at least {self.MIN_PART_SIZE} bytes.')
+        if max_workers < 1:
+            raise ValueError('At least one part must be uploaded at a time.')
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.buffer = bytearray()
+        self.position = 0
+        self.upload_id = None
+        self.executor = None
+        self.futures = []
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+        size = memoryview(data).nbytes
+        self.buffer += data
+        self.position += size
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self._submit_part(part)
+        return size
+
+    def _submit_part(self, body: bytes) -> None:
+        '''Start the multipart upload if needed, and upload a part in the background once
+        fewer than max_workers parts are in flight.'''
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key)['UploadId']
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        # A part which failed fails the write, rather than waiting for the upload to complete
+        for future in self.futures:
+            if future.done():
+                future.result()
+        in_flight = [future for future in self.futures if not future.done()]
+        while len(in_flight) >= self.max_workers:
+            _, not_done = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight = list(not_done)
+        part_number = len(self.futures) + 1
+        self.futures.append(self.executor.submit(self._upload_part, part_number, body))
+
+    def _upload_part(self, part_number: int, body: bytes) -> dict:
+        '''Upload one part, returning the part as listed when the upload is completed.'''
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=body)
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def close(self) -> None:
+        '''Upload what is left of the archive and complete the upload.'''
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=self.key,
+                                       Body=bytes(self.buffer))
+            else:
+                if self.buffer:
+                    self._submit_part(bytes(self.buffer))
+                parts = [future.result() for future in self.futures]
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                    MultipartUpload={'Parts': parts})
+        except Exception:
+            self._abort()
+            raise
+        finally:
+            self._finish()
+
+    def _abort(self) -> None:
+        '''Abort the multipart upload, so S3 does not keep its parts.'''
+        if self.upload_id is None:
+            return
+        for future in self.futures:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key,
+                                           UploadId=self.upload_id)
+
+    def _finish(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif not self.closed:
+            try:
+                self._abort()
+            finally:
+                self._finish()
+
+
+class LocalDirectorySink(io.FileIO):
+    '''A writable binary file which stands in for an S3 object, at the path of its key in a
+    local directory. It is written under a temporary name and only renamed to its key when
+    closed, so a failed write leaves no partial archive behind.'''
+
+    def __init__(self, directory: str, key: str):
+        self.path = os.path.join(directory, *key.split('/'))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        super().__init__(f'{self.path}.part', 'wb')
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        super().close()
+        os.replace(f'{self.path}.part', self.path)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif not self.closed:
+            super().close()
+            os.remove(f'{self.path}.part')
@@ -1,26 +1,87 @@
 '''
     DATA PIPELINE 2: DataHelper
     This script defines a helper class which contains functions outside the scope of RDSManager and S3Manager. 
-    On method deals with saving the 24 hour old data in a local csv. The second method returns the primary 
-    keys (record_id) of the 24 old data.
+    Its methods write the 24 hour old data into a file-like sink as csv, or as a compressed Parquet
+    file, and split the data into the hourly partitions of the archive.
 '''
+from datetime import datetime
+from typing import BinaryIO, Iterator, Optional
 import pandas as pd
 
 
 class DataHelper:
     '''Helper class to aid in handing of data'''
-    DATA_FOLDER_PATH = '/tmp/' + 'archived_data.csv'
+    # Columns with few distinct values, which Parquet stores once per row group in a dictionary
+    DICTIONARY_COLUMNS = ['plant_type_name', 'plant_type_scientific_name', 'plant_type_image_url',
+                          'botanist_name', 'botanist_email', 'botanist_phone', 'city_name',
+                          'country_name', 'country_capital', 'continent_name']
+    PARQUET_COMPRESSION = 'zstd'
+    PARQUET_ROW_GROUP_SIZE = 100_000
 
     def __init__(self, expired_data_df: pd.DataFrame):
         if not isinstance(expired_data_df, pd.DataFrame):
             raise TypeError('The input to this class is not a dataframe!')
-        self.record_ids = tuple(expired_data_df['record_id'].to_list())
-        self.data_to_save = expired_data_df.drop(columns=['record_id'], axis=1)
+        # Rows read back from the archive no longer have their record_id
+        self.data_to_save = expired_data_df.drop(columns=['record_id'], axis=1, errors='ignore')
 
-    def convert_dataframe_to_csv(self):
-        '''Saves 24 hour old data into local CSV'''
-        self.data_to_save.to_csv(self.DATA_FOLDER_PATH, index=False)
+    def convert_dataframe_to_csv(self, file: BinaryIO):
+        '''Writes 24 hour old data as CSV into a writable binary file'''
+        self.data_to_save.to_csv(file, index=False, encoding='utf-8')
 
-    def get_primary_keys(self):
-        '''Returns the primary keys (record_id) of the records that will be deleted'''
-        return self.record_ids
+    @staticmethod
+    def get_partitions(expired_data_df: pd.DataFrame, plant_buckets: int = 0
+                       ) -> Iterator[tuple[datetime, Optional[int], pd.DataFrame]]:
+        '''Split the data by the hour of its record_timestamp, and optionally into buckets of
+        plant numbers, giving the (hour, plant bucket, rows) of each partition of the archive.
+        The plant bucket is None unless plant buckets are used.'''
+        if not isinstance(expired_data_df, pd.DataFrame):
+            raise TypeError('The input to this class is not a dataframe!')
+        if plant_buckets < 0:
+            raise ValueError('The number of plant buckets cannot be negative.')
+        keys = [expired_data_df['record_timestamp'].dt.floor('h')]
+        if plant_buckets:
+            keys.append(expired_data_df['plant_number'] % plant_buckets)
+        for key, partition in expired_data_df.groupby(keys, sort=True):
+            plant_bucket = int(key[1]) if plant_buckets else None
+            yield key[0].to_pydatetime(), plant_bucket, partition
+
+    @staticmethod
+    def get_parquet_schema():
+        '''The types of the archived columns, matching the Parquet Athena table.'''
+        # Imported here as pyarrow is only needed for the Parquet archive format
+        import pyarrow as pa
+        return pa.schema([
+            ('plant_number', pa.int32()),
+            ('plant_last_watered', pa.timestamp('ms')),
+            ('record_soil_moisture', pa.float64()),
+            ('record_temperature', pa.float64()),
+            ('record_timestamp', pa.timestamp('ms')),
+            ('plant_type_name', pa.string()),
+            ('plant_type_scientific_name', pa.string()),
+            ('plant_type_image_url', pa.string()),
+            ('botanist_name', pa.string()),
+            ('botanist_email', pa.string()),
+            ('botanist_phone', pa.string()),
+            ('city_name', pa.string()),
+            ('city_latitude', pa.float64()),
+            ('city_longitude', pa.float64()),
+            ('country_name', pa.string()),
+            ('country_capital', pa.string()),
+            ('continent_name', pa.string()),
+        ])
+
+    def convert_dataframe_to_parquet(self, file: BinaryIO):
+        '''Writes 24 hour old data as a compressed Parquet file into a writable binary file. The rows are sorted by
+        record_timestamp, so the min and max statistics of each row group let Athena skip the
+        row groups outside a queried time range.'''
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        data = self.data_to_save.sort_values('record_timestamp', kind='stable')
+        # Timestamps are stored to the millisecond, which is all SQL Server DATETIME holds
+        table = pa.Table.from_pandas(data, schema=self.get_parquet_schema(),
+                                     preserve_index=False, safe=False)
+        pq.write_table(table, file,
+                       compression=self.PARQUET_COMPRESSION,
+                       use_dictionary=self.DICTIONARY_COLUMNS,
+                       write_statistics=True,
+                       row_group_size=self.PARQUET_ROW_GROUP_SIZE)
@@ -0,0 +1,90 @@
+'''
+    DATA PIPELINE 2: migrate_archive
+    A one-off script which moves archives the Athena table can no longer read into the current
+    layout. These are objects under the old YYYY/MM/DD/HH.csv keys, outside the Hive-style
+    partitions, and partitioned objects in the other ARCHIVE_FORMAT, after the format has
+    been switched. Each is read, split into the partitions of the hours it recorded and
+    written in the ARCHIVE_FORMAT, as the pipeline would, then deleted.
+
+    Usage: python3 migrate_archive.py [--dry-run]
+'''
+
+import argparse
+import io
+import os
+import re
+import pandas as pd
+from data_helper import DataHelper
+from pipeline import archive_dataframe
+from s3_manager import S3Manager
+
+# Keys written before the archive was partitioned, e.g. 2025/04/01/17.csv or 2025/04/01/17-0001.csv
+LEGACY_KEY_PATTERN = re.compile(r'^(\d{4})/(\d{2})/(\d{2})/(\d{2})(-\d{4})?\.(csv|parquet)$')
+PARTITIONED_KEY_PATTERN = re.compile(r'^year=\d{4}/.*/([^/]+)\.(csv|parquet)$')
+DATETIME_COLUMNS = ['plant_last_watered', 'record_timestamp']
+
+
+def get_migrated_name(key: str, archive_format: str):
+    '''Returns the name the object's archive is migrated under, or None if it is already
+    readable by the table. Names are derived from the old key, so a migration which is run
+    again overwrites what it wrote before rather than duplicating it.'''
+    legacy = LEGACY_KEY_PATTERN.match(key)
+    if legacy:
+        year, month, day, hour, part, _ = legacy.groups()
+        return f'migrated-{year}{month}{day}T{hour}{part or ""}'
+    partitioned = PARTITIONED_KEY_PATTERN.match(key)
+    if partitioned and partitioned.group(2) != archive_format:
+        return partitioned.group(1)
+    return None
+
+
+def read_archive(body: bytes, extension: str) -> pd.DataFrame:
+    '''Read an archived object, with its times as datetimes.'''
+    if extension == 'parquet':
+        return pd.read_parquet(io.BytesIO(body))
+    # Text columns stay text, even where every value in a file looks like a number or is empty
+    return pd.read_csv(io.BytesIO(body), parse_dates=DATETIME_COLUMNS,
+                       dtype={column: str for column in DataHelper.DICTIONARY_COLUMNS})
+
+
+def get_keys(client, bucket: str):
+    '''Yield the key of every object in the bucket.'''
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket):
+        for item in page.get('Contents', []):
+            yield item['Key']
+
+
+def migrate_archive(s3_manager: S3Manager, bucket: str, dry_run: bool = False) -> list[str]:
+    '''Move every archive the table cannot read into the current layout and format.
+    An object is only deleted once all of its partitions are written. Returns the keys of
+    the objects migrated, or which would be if it is a dry run.'''
+    archive_format = os.environ.get('ARCHIVE_FORMAT', 'csv')
+    migrated = []
+    for key in list(get_keys(s3_manager.client_s3, bucket)):
+        name = get_migrated_name(key, archive_format)
+        if name is None:
+            continue
+        migrated.append(key)
+        if dry_run:
+            print(f'Would migrate {key}')
+            continue
+        body = s3_manager.client_s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        s3_manager.run_name = name
+        archived_rows = archive_dataframe(read_archive(body, key.rsplit('.', 1)[1]), s3_manager)
+        s3_manager.client_s3.delete_object(Bucket=bucket, Key=key)
+        print(f'Migrated {archived_rows} rows from {key}')
+    return migrated
+
+
+def parse_inputs() -> argparse.Namespace:
+    '''Parse the migration settings from the command line.'''
+    parser = argparse.ArgumentParser(
+        description='Move archives the Athena table cannot read into the current layout.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='list the objects to migrate without changing anything')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_inputs()
+    migrate_archive(S3Manager(), os.environ['S3_BUCKET'], args.dry_run)
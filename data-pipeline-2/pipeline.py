@@ -4,26 +4,100 @@
     data in s3 and delete the archived data from the RDS
 '''
 
+from datetime import datetime
+from os import environ
+import pandas as pd
 from rds_manager import RDSManager
 from data_helper import DataHelper
-from s3_manager import S3Manager
+from s3_manager import LocalDirectoryManager, S3Manager
+from resources import RESOURCES
+
+
+def make_rds_manager() -> RDSManager:
+    '''Make the RDS manager over the shared connection. If the STORAGE_BACKEND is sqlite, a
+    local SQLite database is used instead of the RDS.'''
+    if environ.get('STORAGE_BACKEND') == 'sqlite':
+        from sqlite_backend import SQLiteRDSManager
+        return SQLiteRDSManager(path=environ.get('SQLITE_PATH', 'plants.db'))
+    return RDSManager(RESOURCES.get_rds_connection())
+
+
+def make_s3_manager() -> S3Manager:
+    '''Make the S3 manager over the shared client. If ARCHIVE_DIRECTORY is set, the archive
+    is written to that local directory instead of the bucket.'''
+    if environ.get('ARCHIVE_DIRECTORY'):
+        return LocalDirectoryManager(environ['ARCHIVE_DIRECTORY'])
+    return S3Manager(RESOURCES.get_s3_client())
+
+
+def get_chunking() -> dict:
+    '''Read the chunk size of a streaming archive from the environment. Empty if the
+    archive is to be extracted all at once.'''
+    if environ.get('ARCHIVE_CHUNK_ROWS'):
+        return {'chunk_rows': int(environ['ARCHIVE_CHUNK_ROWS'])}
+    if environ.get('ARCHIVE_SLICE_HOURS'):
+        return {'slice_hours': float(environ['ARCHIVE_SLICE_HOURS'])}
+    return {}
+
+
+def save_and_upload(data_helper: DataHelper, s3_manager: S3Manager, hour: datetime,
+                    part: int = None, plant_bucket: int = None):
+    '''Stream the archived data of a partition in the ARCHIVE_FORMAT, csv by default or
+    parquet, into its object. Nothing is written to disk.'''
+    archive_format = environ.get('ARCHIVE_FORMAT', 'csv')
+    if archive_format not in ('csv', 'parquet'):
+        raise ValueError(f'The archive format {archive_format} is not csv or parquet.')
+    with s3_manager.open_archive(hour, archive_format, part, plant_bucket) as sink:
+        if archive_format == 'parquet':
+            data_helper.convert_dataframe_to_parquet(sink)
+        else:
+            data_helper.convert_dataframe_to_csv(sink)
+
+
+def archive_dataframe(df_to_archive: pd.DataFrame, s3_manager: S3Manager,
+                      part: int = None) -> int:
+    '''Upload the data to archive, one object per partition: the hour it was recorded, and
+    the plant bucket if ARCHIVE_PLANT_BUCKETS is set. Returns the number of rows archived.'''
+    plant_buckets = int(environ.get('ARCHIVE_PLANT_BUCKETS', 0))
+    archived_rows = 0
+    for hour, plant_bucket, partition in DataHelper.get_partitions(df_to_archive,
+                                                                    plant_buckets):
+        save_and_upload(DataHelper(partition), s3_manager, hour, part, plant_bucket)
+        archived_rows += len(partition)
+    return archived_rows
+
+
+def run_streaming_archive_pipeline(rds_manager: RDSManager, **chunking):
+    '''Archive the expired data one chunk at a time. Each chunk is saved, uploaded as its own
+    part and its range deleted from the RDS before the next is fetched. The connection is
+    closed even if a chunk fails.'''
+    try:
+        s3_manager = make_s3_manager()
+        chunks = rds_manager.iter_data_to_be_archived(**chunking)
+        for part, (chunk_range, df_chunk) in enumerate(chunks, start=1):
+            rds_manager.remove_archived_rows(chunk_range,
+                                             archive_dataframe(df_chunk, s3_manager, part))
+    finally:
+        rds_manager.close_connection()
 
 
 def run_archive_pipeline():
     # Get data to archive
-    rds_manager = RDSManager()
-    df_to_archive = rds_manager.extract_data_to_be_archived()
-    # Initiate archive data helper
-    data_helper = DataHelper(df_to_archive)
-    # Save to csv
-    data_helper.convert_dataframe_to_csv()
-    # Instantiate S3Manager and upload to bucket
-    s3_manager = S3Manager()
-    s3_manager.upload_csv_to_bucket()
-    # Delete from RDS
-    primary_keys = data_helper.get_primary_keys()
-    if len(primary_keys) == 0:
-        return None
-    rds_manager.remove_rows_from_rds(data_helper.get_primary_keys())
-    # Close connection
-    rds_manager.close_connection()
+    rds_manager = make_rds_manager()
+    chunking = get_chunking()
+    if chunking:
+        return run_streaming_archive_pipeline(rds_manager, **chunking)
+    # Close connection, even if the archive or the delete fails
+    try:
+        # Fix the range of the archive once, so the rows deleted are the rows extracted
+        archive_range = rds_manager.get_archive_range()
+        if archive_range is None:
+            return None
+        df_to_archive = rds_manager.extract_data_to_be_archived(archive_range)
+        # Instantiate S3Manager, save each partition to csv or parquet and upload to bucket
+        s3_manager = make_s3_manager()
+        archived_rows = archive_dataframe(df_to_archive, s3_manager)
+        # Delete the archived range from RDS, in batches
+        rds_manager.remove_archived_rows(archive_range, archived_rows)
+    finally:
+        rds_manager.close_connection()
@@ -1,30 +1,52 @@
 '''
     DATA PIPELINE 2: RDS manager
     This script defines the class that interacts with the remote RDS on AWS. It has methods to
-    get old data, delete rows of data and close the connection.
+    get old data, all at once or in bounded chunks, delete the archived range of data in batches
+    and close the connection.
 '''
 
+from datetime import datetime, timedelta
 from os import environ
+from typing import Iterator, NamedTuple, Optional
 import pandas as pd
 import pymssql
 from dotenv import load_dotenv
 
 
+def make_connection() -> pymssql.Connection:
+    '''Get a new connection to the RDS, using credentials from the .env file.'''
+    load_dotenv()
+    config = dict(environ)
+    return pymssql.connect(
+        server=config['DB_HOST'],
+        user=config['DB_USERNAME'],
+        password=config['DB_PASSWORD'],
+        database=config['DB_NAME'],
+        port=config['DB_PORT'])
+
+
+class ArchiveRange(NamedTuple):
+    '''The records archived together: recorded from start up to, but not including, end,
+    with a record_id after after_record_id and up to last_record_id. The same range selects
+    the rows extracted and the rows deleted, so exactly the archived rows are deleted.'''
+    start: datetime
+    end: datetime
+    after_record_id: int
+    last_record_id: int
+
+
 class RDSManager:
-    '''A class for interacting with a remote RDS on AWS'''
-
-    QUERY = '''
-    WITH outside_24_hour AS (
-            SELECT * FROM record
-            WHERE record_timestamp < DATEADD(hour, -24, CONVERT(datetime, SYSDATETIMEOFFSET() AT TIME ZONE 'GMT Standard Time'))
-    )
-    SELECT 
-        o24h.record_id,
+    '''A class for interacting with a remote RDS on AWS. This is the SQL Server storage
+    backend: another backend subclasses it, replacing the queries and _initiate_connection.'''
+
+    # The columns and joins of the archive, shared by the extract queries
+    ARCHIVE_SELECT = '''
+        r.record_id,
         p.plant_number,
         p.plant_last_watered,
-        o24h.record_soil_moisture, 
-        o24h.record_temperature,
-        o24h.record_timestamp,
+        r.record_soil_moisture,
+        r.record_temperature,
+        r.record_timestamp,
         pt.plant_type_name,
         pt.plant_type_scientific_name,
         pt.plant_type_image_url,
@@ -37,46 +59,186 @@ class RDSManager:
         cou.country_name,
         cou.country_capital,
         con.continent_name
-    FROM outside_24_hour AS o24h
-    JOIN plant AS p ON p.plant_id = o24h.plant_id
+    FROM record AS r
+    JOIN plant AS p ON p.plant_id = r.plant_id
     JOIN plant_type AS pt ON pt.plant_type_id = p.plant_type_id
     JOIN botanist AS b ON b.botanist_id = p.botanist_id
     JOIN city AS cit ON cit.city_id = p.city_id
     JOIN country AS cou ON cou.country_id = cit.country_id
     JOIN continent AS con ON con.continent_id = cou.continent_id
     '''
-    BASE_DELETE_QUERY = "DELETE FROM record WHERE record_id IN ({wildcards})"
+    CUTOFF_QUERY = '''
+    SELECT DATEADD(hour, -24, CONVERT(datetime, SYSDATETIMEOFFSET() AT TIME ZONE 'GMT Standard Time'));
+    '''
+    EARLIEST_QUERY = 'SELECT MIN(record_timestamp) FROM record WHERE record_timestamp < %s;'
+    # The newest record when the archive starts. Records inserted after it are left alone
+    MAX_RECORD_ID_QUERY = 'SELECT MAX(record_id) FROM record;'
+    # The rows of an ArchiveRange, in the order of its fields
+    RANGE_CONDITION = '''r.record_timestamp >= %s AND r.record_timestamp < %s
+        AND r.record_id > %s AND r.record_id <= %s'''
+    RANGE_QUERY = 'SELECT' + ARCHIVE_SELECT + 'WHERE ' + RANGE_CONDITION + '''
+    ORDER BY r.record_timestamp, r.record_id;
+    '''
+    # Keyset pagination: each chunk starts after the last record_id of the one before
+    ROW_CHUNK_QUERY = 'SELECT TOP ({chunk_rows})' + ARCHIVE_SELECT + 'WHERE ' + \
+        RANGE_CONDITION + '''
+    ORDER BY r.record_id;
+    '''
+    COUNT_QUERY = 'SELECT COUNT(*) FROM record AS r WHERE ' + RANGE_CONDITION + ';'
+    DELETE_BATCH_QUERY = ('DELETE TOP ({batch_rows}) r FROM record AS r WHERE '
+                          + RANGE_CONDITION + ';')
+    # Kept under the 5,000 locks at which SQL Server escalates to locking the whole table, so
+    # the inserts from the first pipeline are not blocked while the archive is deleted
+    DELETE_BATCH_ROWS = 1000
 
-    def __init__(self) -> None:
-        self.conn = self._initiate_connection()
+    def __init__(self, conn: pymssql.Connection = None) -> None:
+        '''If a connection is given it is borrowed, for example from a warm Lambda, and
+        close_connection leaves it open.'''
+        self.owns_connection = conn is None
+        self.conn = self._initiate_connection() if conn is None else conn
 
     def _initiate_connection(self) -> pymssql.Connection:
         '''Function called in init to initiate a connection to RDS in RDSManager'''
-        load_dotenv()
-        config = dict(environ)
-        conn = pymssql.connect(
-            server=config['DB_HOST'],
-            user=config['DB_USERNAME'],
-            password=config['DB_PASSWORD'],
-            database=config['DB_NAME'],
-            port=config['DB_PORT'])
-        return conn
+        return make_connection()
 
     def close_connection(self) -> None:
-        '''Closes a connection to the RDS'''
-        self.conn.close()
-
-    def extract_data_to_be_archived(self) -> pd.DataFrame:
-        '''Extract the rows from the RDS which are outside the 24 hour window.'''
-        return pd.read_sql(self.QUERY, self.conn)
-
-    def _get_delete_query(self, number_of_ids: int) -> str:
-        '''Creates delete query from a base query'''
-        return self.BASE_DELETE_QUERY.format(wildcards=','.join(['%s']*number_of_ids))
-
-    def remove_rows_from_rds(self, record_ids: tuple[int]) -> None:
-        """Removes rows from record table using input record_id's"""
-        with self.conn.cursor() as cursor:
-            delete_query = self._get_delete_query(len(record_ids))
-            cursor.execute(delete_query, record_ids)
-            self.conn.commit()
+        '''Closes a connection to the RDS, unless the connection was borrowed. A borrowed
+        connection is rolled back instead, so a run which failed part way through a delete
+        doesn't hand it back with a transaction open.'''
+        if self.owns_connection:
+            self.conn.close()
+            return
+        try:
+            self.conn.rollback()
+        except pymssql.Error:
+            # A connection which has dropped is replaced when it is next checked
+            pass
+
+    def get_archive_cutoff(self) -> datetime:
+        '''Fetch the time before which records are archived, 24 hours ago in UK time.'''
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(self.CUTOFF_QUERY)
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def _get_earliest_timestamp(self, cutoff: datetime) -> datetime:
+        '''Fetch the time of the oldest record before the cutoff, or None if there is none.'''
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(self.EARLIEST_QUERY, (cutoff,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            cursor.close()
+
+    def _get_max_record_id(self) -> int:
+        '''Fetch the highest record_id in the record table, or 0 if it is empty.'''
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(self.MAX_RECORD_ID_QUERY)
+            row = cursor.fetchone()
+            return row[0] if row and row[0] is not None else 0
+        finally:
+            cursor.close()
+
+    def get_archive_range(self) -> Optional[ArchiveRange]:
+        '''Capture the range of the archive once, from the oldest record to the cutoff and up
+        to the current highest record_id, or None if no records have expired. Rows inserted
+        while the archive runs are outside the range, however old their timestamps.'''
+        cutoff = self.get_archive_cutoff()
+        last_record_id = self._get_max_record_id()
+        start = self._get_earliest_timestamp(cutoff)
+        if start is None:
+            return None
+        return ArchiveRange(start, cutoff, 0, last_record_id)
+
+    def extract_data_to_be_archived(self, archive_range: ArchiveRange) -> pd.DataFrame:
+        '''Extract the rows in the range from the RDS.'''
+        return pd.read_sql(self.RANGE_QUERY, self.conn, params=tuple(archive_range))
+
+    def iter_data_to_be_archived(self, chunk_rows: int = None, slice_hours: float = None
+                                 ) -> Iterator[tuple[ArchiveRange, pd.DataFrame]]:
+        '''Extract the rows outside the 24 hour window in bounded chunks, either of at most
+        chunk_rows rows or of slice_hours of recordings, giving the range of each chunk with
+        its rows. The range of the archive is captured once, so every chunk is read against
+        the same window. Each chunk is only fetched once the one before has been consumed, so
+        the memory used doesn't grow with the number of rows waiting.'''
+        if (chunk_rows is None) == (slice_hours is None):
+            raise ValueError('Exactly one of the chunk rows and slice hours must be given.')
+        if (chunk_rows if slice_hours is None else slice_hours) <= 0:
+            raise ValueError('The chunk size must be positive.')
+        archive_range = self.get_archive_range()
+        if archive_range is None:
+            return
+        if chunk_rows is not None:
+            yield from self._iter_row_chunks(archive_range, int(chunk_rows))
+        else:
+            yield from self._iter_time_slices(archive_range, timedelta(hours=slice_hours))
+
+    def _iter_row_chunks(self, archive_range: ArchiveRange, chunk_rows: int
+                         ) -> Iterator[tuple[ArchiveRange, pd.DataFrame]]:
+        '''Read the rows in the range in record_id order, chunk_rows at a time. Each chunk's
+        range ends at its last record_id.'''
+        query = self.ROW_CHUNK_QUERY.format(chunk_rows=chunk_rows)
+        last_record_id = archive_range.after_record_id
+        while True:
+            chunk_range = archive_range._replace(after_record_id=last_record_id)
+            chunk = pd.read_sql(query, self.conn, params=tuple(chunk_range))
+            if chunk.empty:
+                return
+            last_record_id = int(chunk['record_id'].max())
+            yield chunk_range._replace(last_record_id=last_record_id), chunk
+            if len(chunk) < chunk_rows:
+                return
+
+    def _iter_time_slices(self, archive_range: ArchiveRange, slice_length: timedelta
+                          ) -> Iterator[tuple[ArchiveRange, pd.DataFrame]]:
+        '''Read the rows in the range one time slice at a time, from the oldest up to the
+        cutoff. Slices with no recordings are skipped.'''
+        start = archive_range.start
+        while start < archive_range.end:
+            end = min(start + slice_length, archive_range.end)
+            slice_range = archive_range._replace(start=start, end=end)
+            chunk = pd.read_sql(self.RANGE_QUERY, self.conn, params=tuple(slice_range))
+            if not chunk.empty:
+                yield slice_range, chunk
+            start = end
+
+    def _count_rows(self, archive_range: ArchiveRange) -> int:
+        '''Count the rows currently in the range.'''
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(self.COUNT_QUERY, tuple(archive_range))
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def remove_archived_rows(self, archive_range: ArchiveRange, archived_rows: int,
+                             batch_rows: int = None) -> int:
+        '''Delete the rows in an archived range, batch_rows at a time, committing between
+        batches so no lock is held for the whole delete. The range must still hold exactly
+        the number of rows archived from it: if it does not, nothing is deleted and a
+        ValueError is raised. Returns the number of rows deleted.'''
+        batch_rows = self.DELETE_BATCH_ROWS if batch_rows is None else batch_rows
+        if batch_rows <= 0:
+            raise ValueError('The delete batch size must be positive.')
+        rows_in_range = self._count_rows(archive_range)
+        if rows_in_range != archived_rows:
+            raise ValueError(f'{rows_in_range} rows are in the archived range, but '
+                             f'{archived_rows} were archived. Nothing was deleted.')
+        query = self.DELETE_BATCH_QUERY.format(batch_rows=batch_rows)
+        deleted_rows = 0
+        cursor = self.conn.cursor()
+        try:
+            while deleted_rows < archived_rows:
+                cursor.execute(query, tuple(archive_range))
+                batch_deleted = cursor.rowcount
+                self.conn.commit()
+                if batch_deleted <= 0:
+                    break
+                deleted_rows += batch_deleted
+        finally:
+            cursor.close()
+        return deleted_rows
@@ -0,0 +1,64 @@
+'''
+    DATA PIPELINE 2: resources
+    This script defines the resources which are kept alive between warm invocations of the
+    Lambda. AWS reuses the Python process between invocations, so anything held at module
+    level survives. The RDS connection is checked before each reuse and replaced if dropped.
+'''
+
+import pymssql
+from rds_manager import make_connection
+from s3_manager import make_s3_client
+
+
+class ResourceManager:
+    '''Class which holds the RDS connection and S3 client, creating each on first use.'''
+
+    HEALTH_CHECK_QUERY = 'SELECT 1;'
+
+    def __init__(self):
+        self._rds_connection = None
+        self._s3_client = None
+
+    def _is_rds_connection_alive(self) -> bool:
+        '''Check the RDS connection still works by running a trivial query.'''
+        try:
+            with self._rds_connection.cursor() as cursor:
+                cursor.execute(self.HEALTH_CHECK_QUERY)
+                cursor.fetchall()
+            return True
+        except pymssql.Error:
+            return False
+
+    def get_rds_connection(self) -> pymssql.Connection:
+        '''Return the shared RDS connection, reconnecting if it has been dropped.'''
+        if self._rds_connection is not None and self._is_rds_connection_alive():
+            return self._rds_connection
+        self._close_rds_connection()
+        self._rds_connection = make_connection()
+        return self._rds_connection
+
+    def _close_rds_connection(self) -> None:
+        '''Close the RDS connection, ignoring errors from one which has dropped.'''
+        if self._rds_connection is None:
+            return
+        try:
+            self._rds_connection.close()
+        except pymssql.Error:
+            pass
+        self._rds_connection = None
+
+    def get_s3_client(self):
+        '''Return the shared S3 client. boto3 clients reconnect by themselves, so the
+        client only needs making once.'''
+        if self._s3_client is None:
+            self._s3_client = make_s3_client()
+        return self._s3_client
+
+    def close(self) -> None:
+        '''Close every resource held.'''
+        self._close_rds_connection()
+        self._s3_client = None
+
+
+# Module level, so the resources live as long as the Lambda's Python process
+RESOURCES = ResourceManager()
@@ -1,45 +1,93 @@
 '''
     DATA PIPELINE 2: s3_manager
-    This script defines a class that interacts with the S3 bucket on amazon. This means uploading data
-    to the bucket with a specific key.
+    This script defines a class that interacts with the S3 bucket on amazon. This means streaming data
+    into the bucket with a specific key, in a Hive-style partition for the hour it was recorded. A
+    subclass writes the same keys into a local directory instead.
 '''
 
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import boto3
 from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
+from archive_sink import MIB, LocalDirectorySink, S3MultipartSink
+
+
+def make_s3_client():
+    '''Initialise an S3 client with boto3.'''
+    load_dotenv()
+    return boto3.client(
+        "s3",
+        aws_access_key_id=os.environ['ACCESS_KEY_ID'],
+        aws_secret_access_key=os.environ['SECRET_ACCESS_KEY_ID'],
+        region_name=os.environ['BUCKET_REGION'])
 
 
 class S3Manager:
     '''Class that interacts with AWS S3 bucket'''
 
-    CSV_PATH = '/tmp/' + 'archived_data.csv'
+    # Archives are uploaded in parts of this size, this many parts at a time
+    UPLOAD_PART_SIZE = 8 * MIB
+    UPLOAD_WORKERS = 4
 
-    def __init__(self):
+    # Hive-style partitions, so Athena can skip the hours outside a queried range
+    PARTITION_FORMAT = 'year=%Y/month=%m/day=%d/hour=%H'
+
+    def __init__(self, client=None):
+        '''If a client is given it is reused, for example from a warm Lambda.'''
         load_dotenv()
-        self.client_s3 = self._get_s3_client()
-        self.key_s3 = self._create_bucket_key()
+        self.client_s3 = self._get_s3_client() if client is None else client
+        self.run_name = self._create_run_name()
 
     def _get_s3_client(self):
         '''Initialise an S3 client with boto3.'''
-        load_dotenv()
-        client = boto3.client(
-            "s3",
-            aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-            aws_secret_access_key=os.environ['SECRET_ACCESS_KEY_ID'],
-            region_name=os.environ['BUCKET_REGION'])
-        return client
-
-    def _create_bucket_key(self) -> str:
-        """Returns the key of the object (csv) to be stored on S3."""
-        # storing the previous days data so timedelta is -1 day
-        yesterday_date = datetime.now(
-            ZoneInfo("Europe/London"))-timedelta(days=1)
-        return yesterday_date.strftime("%Y/%m/%d/%H.csv")
-
-    def upload_csv_to_bucket(self):
-        '''Upload the archived data, in the csv to the specified S3 bucket.'''
-        with open(self.CSV_PATH, 'rb') as file:
-            self.client_s3.put_object(
-                Bucket=os.environ['S3_BUCKET'], Key=self.key_s3, Body=file)
+        return make_s3_client()
+
+    def _create_run_name(self) -> str:
+        """Returns the name of the objects uploaded by this run. Several runs can archive
+        rows from the same hour, so each names its objects after the time it ran."""
+        return datetime.now(ZoneInfo("Europe/London")).strftime("archive-%Y%m%dT%H%M%S")
+
+    def get_partition_prefix(self, hour: datetime, plant_bucket: int = None) -> str:
+        '''Returns the prefix of the partition holding the recordings taken in an hour, and
+        optionally in one bucket of plant numbers.'''
+        prefix = hour.strftime(self.PARTITION_FORMAT)
+        if plant_bucket is None:
+            return prefix
+        return f'{prefix}/plant_bucket={plant_bucket}'
+
+    def get_key(self, hour: datetime, extension: str = 'csv', part: int = None,
+                plant_bucket: int = None) -> str:
+        '''Returns the key of the archive of a partition with the given file extension, or
+        of one numbered part of it when it is uploaded in chunks.'''
+        name = self.run_name if part is None else f'{self.run_name}-{part:04d}'
+        return f'{self.get_partition_prefix(hour, plant_bucket)}/{name}.{extension}'
+
+    def open_archive(self, hour: datetime, extension: str = 'csv', part: int = None,
+                     plant_bucket: int = None) -> S3MultipartSink:
+        '''Open a file-like sink which streams the archive of a partition, or one numbered
+        part of it, straight into its object in the specified S3 bucket. The object is
+        complete once the sink is closed.'''
+        return S3MultipartSink(self.client_s3, os.environ['S3_BUCKET'],
+                               self.get_key(hour, extension, part, plant_bucket),
+                               part_size=self.UPLOAD_PART_SIZE,
+                               max_workers=self.UPLOAD_WORKERS)
+
+
+class LocalDirectoryManager(S3Manager):
+    '''Writes the archive under the keys it would have in S3 into a local directory, in
+    place of the bucket, for tests and benchmarks.'''
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        super().__init__()
+
+    def _get_s3_client(self):
+        return None
+
+    def open_archive(self, hour: datetime, extension: str = 'csv', part: int = None,
+                     plant_bucket: int = None) -> LocalDirectorySink:
+        '''Open a file-like sink writing the archive of a partition to the path of its key
+        in the directory.'''
+        return LocalDirectorySink(self.directory,
+                                  self.get_key(hour, extension, part, plant_bucket))
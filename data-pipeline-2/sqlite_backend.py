@@ -0,0 +1,82 @@
+'''
+    DATA PIPELINE 2: SQLite backend
+    This script defines an embedded SQLite storage backend for the archive pipeline. It runs
+    the same schema as the RDS, translated to SQLite, so the archive path can be tested and
+    benchmarked at realistic volumes without a SQL Server.
+'''
+
+from datetime import datetime, timedelta
+import os
+import re
+import sqlite3
+from rds_manager import RDSManager
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '..', 'architecture', '1.rds', 'database', 'schema.sql')
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+
+
+# Each pipeline is built into its own image from its own directory, so this schema
+# translation is kept in step with the copy in data-pipeline-1/sqlite_backend.py
+def translate_schema(schema_sql: str) -> str:
+    '''Translate the T-SQL schema to SQLite. Identity columns become SQLite row ids, and
+    indexes lose the options SQLite has no use for.'''
+    schema_sql = re.sub(r'\w+ IDENTITY\(1,1\)( CONSTRAINT \w+)? PRIMARY KEY( NONCLUSTERED)?',
+                        'INTEGER PRIMARY KEY AUTOINCREMENT', schema_sql)
+    schema_sql = re.sub(r'\b(NON)?CLUSTERED INDEX', 'INDEX', schema_sql)
+    schema_sql = re.sub(r' INCLUDE \([\w, ]+\)', '', schema_sql)
+    return schema_sql.replace('GETDATE()', 'CURRENT_TIMESTAMP')
+
+
+def make_sqlite_connection(path: str = ':memory:',
+                           schema_path: str = SCHEMA_PATH) -> sqlite3.Connection:
+    '''Connect to a SQLite database, creating the schema if the database is new. DATETIME
+    columns are returned as datetimes, like pymssql does.'''
+    connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    connection.execute('PRAGMA foreign_keys = ON;')
+    tables = connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'record';").fetchall()
+    if not tables:
+        with open(schema_path, 'r', encoding='utf-8') as file:
+            connection.executescript(translate_schema(file.read()))
+    return connection
+
+
+class SQLiteRDSManager(RDSManager):
+    '''The RDS manager with its queries written for SQLite. The 24 hour window is measured
+    in the local time of the machine, rather than UK time.'''
+
+    # MIN() would lose the column type, so the timestamp would be returned as text
+    EARLIEST_QUERY = '''
+    SELECT record_timestamp FROM record WHERE record_timestamp < ?
+    ORDER BY record_timestamp LIMIT 1;
+    '''
+    RANGE_CONDITION = RDSManager.RANGE_CONDITION.replace('%s', '?')
+    RANGE_QUERY = 'SELECT' + RDSManager.ARCHIVE_SELECT + 'WHERE ' + RANGE_CONDITION + '''
+    ORDER BY r.record_timestamp, r.record_id;
+    '''
+    ROW_CHUNK_QUERY = 'SELECT' + RDSManager.ARCHIVE_SELECT + 'WHERE ' + RANGE_CONDITION + '''
+    ORDER BY r.record_id
+    LIMIT {chunk_rows};
+    '''
+    COUNT_QUERY = 'SELECT COUNT(*) FROM record AS r WHERE ' + RANGE_CONDITION + ';'
+    # SQLite is not built with DELETE ... LIMIT by default, so the batch is selected first
+    DELETE_BATCH_QUERY = '''DELETE FROM record WHERE record_id IN (
+        SELECT r.record_id FROM record AS r WHERE ''' + RANGE_CONDITION + '''
+        LIMIT {batch_rows});'''
+
+    def __init__(self, conn: sqlite3.Connection = None, path: str = ':memory:') -> None:
+        '''If no connection is given, one is made to the database at the path.'''
+        self.path = path
+        super().__init__(conn)
+
+    def get_archive_cutoff(self) -> datetime:
+        '''The time before which records are archived, 24 hours ago in local time.'''
+        return datetime.now() - timedelta(hours=24)
+
+    def _initiate_connection(self) -> sqlite3.Connection:
+        '''Connect to the SQLite database, creating the schema if it is new.'''
+        return make_sqlite_connection(self.path)
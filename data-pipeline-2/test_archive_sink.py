@@ -0,0 +1,91 @@
+import io
+from unittest.mock import MagicMock
+import pytest
+from archive_sink import LocalDirectorySink, S3MultipartSink
+
+PART_SIZE = S3MultipartSink.MIN_PART_SIZE
+
+
+@pytest.fixture
+def mock_client():
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {'UploadId': 'UPLOAD'}
+    client.upload_part.side_effect = lambda **kwargs: {'ETag': f"etag-{kwargs['PartNumber']}"}
+    return client
+
+
+def uploaded_parts(client):
+    parts = sorted(client.upload_part.call_args_list, key=lambda call: call.kwargs['PartNumber'])
+    return [call.kwargs['Body'] for call in parts]
+
+
+def test_small_archive_put_once(mock_client):
+    with S3MultipartSink(mock_client, 'bucket', 'key') as sink:
+        sink.write(b'a,b\n')
+        sink.write(b'1,2\n')
+    mock_client.put_object.assert_called_once_with(Bucket='bucket', Key='key', Body=b'a,b\n1,2\n')
+    mock_client.create_multipart_upload.assert_not_called()
+
+
+def test_large_archive_uploaded_in_parts(mock_client):
+    data = bytes(range(256)) * (PART_SIZE * 2 // 256) + b'tail'
+    with S3MultipartSink(mock_client, 'bucket', 'key', part_size=PART_SIZE, max_workers=2) as sink:
+        for start in range(0, len(data), 1_000_000):
+            sink.write(data[start:start + 1_000_000])
+        assert sink.tell() == len(data)
+    assert b''.join(uploaded_parts(mock_client)) == data
+    assert [len(part) for part in uploaded_parts(mock_client)] == [PART_SIZE, PART_SIZE, 4]
+    mock_client.complete_multipart_upload.assert_called_once_with(
+        Bucket='bucket', Key='key', UploadId='UPLOAD',
+        MultipartUpload={'Parts': [{'PartNumber': 1, 'ETag': 'etag-1'},
+                                   {'PartNumber': 2, 'ETag': 'etag-2'},
+                                   {'PartNumber': 3, 'ETag': 'etag-3'}]})
+    mock_client.put_object.assert_not_called()
+
+
+def test_failed_write_aborts_upload(mock_client):
+    with pytest.raises(RuntimeError):
+        with S3MultipartSink(mock_client, 'bucket', 'key', part_size=PART_SIZE) as sink:
+            sink.write(b'0' * PART_SIZE)
+            raise RuntimeError('serialisation failed')
+    mock_client.abort_multipart_upload.assert_called_once_with(
+        Bucket='bucket', Key='key', UploadId='UPLOAD')
+    mock_client.complete_multipart_upload.assert_not_called()
+    assert sink.closed
+
+
+def test_failed_part_aborts_upload(mock_client):
+    mock_client.upload_part.side_effect = ConnectionError('reset')
+    sink = S3MultipartSink(mock_client, 'bucket', 'key', part_size=PART_SIZE)
+    sink.write(b'0' * (PART_SIZE + 1))
+    with pytest.raises(ConnectionError):
+        sink.close()
+    mock_client.abort_multipart_upload.assert_called_once()
+    mock_client.complete_multipart_upload.assert_not_called()
+
+
+def test_part_size_below_s3_minimum():
+    with pytest.raises(ValueError):
+        S3MultipartSink(MagicMock(), 'bucket', 'key', part_size=1024)
+
+
+def test_text_written_through_wrapper(mock_client):
+    with S3MultipartSink(mock_client, 'bucket', 'key') as sink:
+        with io.TextIOWrapper(sink, encoding='utf-8') as text:
+            text.write('Colocasia Esculenta\n')
+    assert mock_client.put_object.call_args.kwargs['Body'] == b'Colocasia Esculenta\n'
+
+
+def test_local_directory_sink(tmp_path):
+    with LocalDirectorySink(str(tmp_path), 'year=2025/month=04/archive.csv') as sink:
+        sink.write(b'a,b\n')
+        assert not (tmp_path / 'year=2025/month=04/archive.csv').exists()
+    assert (tmp_path / 'year=2025/month=04/archive.csv').read_bytes() == b'a,b\n'
+
+
+def test_local_directory_sink_failed_write(tmp_path):
+    with pytest.raises(RuntimeError):
+        with LocalDirectorySink(str(tmp_path), 'year=2025/archive.csv') as sink:
+            sink.write(b'a,b\n')
+            raise RuntimeError('serialisation failed')
+    assert list((tmp_path / 'year=2025').iterdir()) == []
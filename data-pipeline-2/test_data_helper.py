@@ -1,3 +1,5 @@
+from datetime import datetime
+import io
 import pytest
 import pandas as pd
 from data_helper import DataHelper
@@ -14,7 +16,6 @@ class TestDataHelper:
 
     def test_valid_init(self, df_test):
         data_helper = DataHelper(df_test)
-        assert data_helper.record_ids == (1, 2, 3, 4, 12, 15)
         assert pd.DataFrame(
             {'plant_type_name': ['a', 'an', 'ant', 'anta', 'antar', 'antari']}).equals(data_helper.data_to_save)
 
@@ -22,6 +23,100 @@ class TestDataHelper:
         with pytest.raises(TypeError):
             data_helper = DataHelper(0)
 
-    def test_primary_keys(self, df_test):
-        data_helper = DataHelper(df_test)
-        assert data_helper.get_primary_keys() == (1, 2, 3, 4, 12, 15)
+    def test_csv_written_to_file(self, df_test):
+        file = io.BytesIO()
+        DataHelper(df_test).convert_dataframe_to_csv(file)
+        assert file.getvalue().decode('utf-8').splitlines() == [
+            'plant_type_name', 'a', 'an', 'ant', 'anta', 'antar', 'antari']
+
+
+class TestDataHelperParquet:
+
+    @pytest.fixture
+    def df_archive(self):
+        return pd.DataFrame({
+            'record_id': [7, 8, 9],
+            'plant_number': [8, 8, 3],
+            'plant_last_watered': pd.to_datetime(['2025-04-01 13:54:32', None, '2025-04-01 13:54:32']),
+            'record_soil_moisture': [30.5, 31.5, 32.5],
+            'record_temperature': [11.2, 11.4, 11.6],
+            'record_timestamp': pd.to_datetime(['2025-04-01 14:01:00.123456', '2025-04-01 13:01:00.000000',
+                                                '2025-04-01 15:01:00.000000']),
+            'plant_type_name': ['Palm Tree', 'Palm Tree', 'Fern'],
+            'plant_type_scientific_name': [None, None, 'Pteridophyta'],
+            'plant_type_image_url': [None, None, None],
+            'botanist_name': ['Gertrude Jekyll'] * 3,
+            'botanist_email': ['gertrude.jekyll@lnhm.co.uk'] * 3,
+            'botanist_phone': ['001-481-273-3691x127'] * 3,
+            'city_name': ['Oschatz'] * 3,
+            'city_latitude': [51.30001] * 3,
+            'city_longitude': [13.10984] * 3,
+            'country_name': ['Germany'] * 3,
+            'country_capital': ['Berlin'] * 3,
+            'continent_name': ['Europe'] * 3,
+        })
+
+    @pytest.fixture
+    def parquet_file(self, df_archive):
+        file = io.BytesIO()
+        DataHelper(df_archive).convert_dataframe_to_parquet(file)
+        file.seek(0)
+        return file
+
+    def test_parquet_typed_and_sorted(self, parquet_file):
+        import pyarrow.parquet as pq
+        table = pq.read_table(parquet_file)
+        assert table.schema == DataHelper.get_parquet_schema()
+        assert table.column('plant_number').to_pylist() == [8, 8, 3]
+        timestamps = table.column('record_timestamp').to_pylist()
+        assert timestamps == sorted(timestamps)
+        assert timestamps[1].microsecond == 123000
+
+    def test_parquet_compressed_with_statistics(self, parquet_file):
+        import pyarrow.parquet as pq
+        row_group = pq.ParquetFile(parquet_file).metadata.row_group(0)
+        columns = {row_group.column(i).path_in_schema: row_group.column(i)
+                   for i in range(row_group.num_columns)}
+        assert columns['record_timestamp'].compression == 'ZSTD'
+        assert columns['record_timestamp'].statistics.has_min_max
+        assert 'RLE_DICTIONARY' in columns['botanist_name'].encodings
+
+    def test_empty_parquet(self, df_archive):
+        import pyarrow.parquet as pq
+        file = io.BytesIO()
+        DataHelper(df_archive.iloc[0:0]).convert_dataframe_to_parquet(file)
+        file.seek(0)
+        assert pq.read_table(file).num_rows == 0
+
+
+class TestDataHelperPartitions:
+
+    @pytest.fixture
+    def df_expired(self):
+        return pd.DataFrame({
+            'record_id': [1, 2, 3, 4],
+            'plant_number': [1, 2, 3, 4],
+            'record_timestamp': pd.to_datetime(['2025-04-01 13:59:59', '2025-04-01 13:00:00',
+                                                '2025-04-01 14:00:00', '2025-04-01 13:30:00']),
+        })
+
+    def test_partitions_by_hour(self, df_expired):
+        partitions = list(DataHelper.get_partitions(df_expired))
+        assert [(hour, bucket) for hour, bucket, _ in partitions] == [
+            (datetime(2025, 4, 1, 13), None), (datetime(2025, 4, 1, 14), None)]
+        assert partitions[0][2]['record_id'].tolist() == [1, 2, 4]
+
+    def test_partitions_by_hour_and_plant_bucket(self, df_expired):
+        partitions = list(DataHelper.get_partitions(df_expired, plant_buckets=2))
+        assert [(hour.hour, bucket, partition['record_id'].tolist())
+                for hour, bucket, partition in partitions] == [
+            (13, 0, [2, 4]), (13, 1, [1]), (14, 1, [3])]
+
+    def test_no_partitions_when_empty(self, df_expired):
+        assert list(DataHelper.get_partitions(df_expired.iloc[0:0])) == []
+
+    def test_invalid_partitions(self, df_expired):
+        with pytest.raises(TypeError):
+            list(DataHelper.get_partitions(0))
+        with pytest.raises(ValueError):
+            list(DataHelper.get_partitions(df_expired, plant_buckets=-1))
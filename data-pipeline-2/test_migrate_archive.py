@@ -0,0 +1,88 @@
+import io
+from unittest.mock import MagicMock
+import pandas as pd
+import pytest
+from migrate_archive import get_migrated_name, migrate_archive, read_archive
+from s3_manager import S3Manager
+
+LEGACY_CSV = '\n'.join([
+    'plant_number,plant_last_watered,record_soil_moisture,record_temperature,record_timestamp,'
+    'plant_type_name,plant_type_scientific_name,plant_type_image_url,botanist_name,'
+    'botanist_email,botanist_phone,city_name,city_latitude,city_longitude,country_name,'
+    'country_capital,continent_name',
+    '8,2025-04-01 13:54:32,34.5,11.5,2025-04-01 16:10:00,Palm Tree,Arecaceae,,Test Test,'
+    'test@lnhm.co.uk,001-481,Bonoua,5.27,-3.59,Ivory Coast,Yamoussoukro,Africa',
+    '3,2025-04-01 13:54:32,30.1,12.0,2025-04-01 17:20:00,Fern,Polypodiopsida,,Test Test,'
+    'test@lnhm.co.uk,001-481,Bonoua,5.27,-3.59,Ivory Coast,Yamoussoukro,Africa',
+]).encode('utf-8')
+
+
+@pytest.fixture
+def s3_manager():
+    client = MagicMock()
+    client.get_object.return_value = {'Body': io.BytesIO(LEGACY_CSV)}
+    return S3Manager(client)
+
+
+def list_keys(s3_manager, keys):
+    s3_manager.client_s3.get_paginator.return_value.paginate.return_value = [
+        {'Contents': [{'Key': key} for key in keys]}]
+
+
+def get_written(s3_manager):
+    return {call.kwargs['Key']: call.kwargs['Body']
+            for call in s3_manager.client_s3.put_object.call_args_list}
+
+
+@pytest.mark.parametrize('key, archive_format, name', [
+    ('2025/04/01/17.csv', 'csv', 'migrated-20250401T17'),
+    ('2025/04/01/17-0002.parquet', 'parquet', 'migrated-20250401T17-0002'),
+    ('year=2025/month=04/day=01/hour=17/archive-20250402T174746-0001.csv', 'parquet',
+     'archive-20250402T174746-0001'),
+    ('year=2025/month=04/day=01/hour=17/archive-20250402T174746.csv', 'csv', None),
+    ('athena-results/query.csv', 'csv', None),
+])
+def test_migrated_name(key, archive_format, name):
+    assert get_migrated_name(key, archive_format) == name
+
+
+def test_legacy_archive_repartitioned(s3_manager, monkeypatch):
+    monkeypatch.delenv('ARCHIVE_FORMAT', raising=False)
+    monkeypatch.delenv('ARCHIVE_PLANT_BUCKETS', raising=False)
+    monkeypatch.setenv('S3_BUCKET', 'bucket')
+    list_keys(s3_manager, ['2025/04/02/17.csv',
+                           'year=2025/month=04/day=01/hour=15/archive-20250402T150000.csv'])
+    assert migrate_archive(s3_manager, 'bucket') == ['2025/04/02/17.csv']
+    written = get_written(s3_manager)
+    # The old key's hour is the run's, so the rows go to the hours they were recorded
+    assert sorted(written) == [
+        'year=2025/month=04/day=01/hour=16/migrated-20250402T17.csv',
+        'year=2025/month=04/day=01/hour=17/migrated-20250402T17.csv']
+    s3_manager.client_s3.delete_object.assert_called_once_with(
+        Bucket='bucket', Key='2025/04/02/17.csv')
+
+
+def test_csv_archive_converted_to_parquet(s3_manager, monkeypatch):
+    monkeypatch.setenv('ARCHIVE_FORMAT', 'parquet')
+    monkeypatch.delenv('ARCHIVE_PLANT_BUCKETS', raising=False)
+    monkeypatch.setenv('S3_BUCKET', 'bucket')
+    key = 'year=2025/month=04/day=01/hour=16/archive-20250402T150000.csv'
+    list_keys(s3_manager, [key])
+    migrate_archive(s3_manager, 'bucket')
+    written = get_written(s3_manager)
+    assert sorted(written) == [
+        'year=2025/month=04/day=01/hour=16/archive-20250402T150000.parquet',
+        'year=2025/month=04/day=01/hour=17/archive-20250402T150000.parquet']
+    data = read_archive(written[sorted(written)[0]], 'parquet')
+    assert data['plant_number'].tolist() == [8]
+    assert data['plant_last_watered'].tolist() == [pd.Timestamp('2025-04-01 13:54:32')]
+    assert data['plant_type_image_url'].isna().all()
+
+
+def test_dry_run_changes_nothing(s3_manager, monkeypatch):
+    monkeypatch.delenv('ARCHIVE_FORMAT', raising=False)
+    list_keys(s3_manager, ['2025/04/02/17.csv'])
+    assert migrate_archive(s3_manager, 'bucket', dry_run=True) == ['2025/04/02/17.csv']
+    s3_manager.client_s3.get_object.assert_not_called()
+    s3_manager.client_s3.put_object.assert_not_called()
+    s3_manager.client_s3.delete_object.assert_not_called()
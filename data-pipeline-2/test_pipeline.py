@@ -0,0 +1,34 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from pipeline import run_archive_pipeline
+
+
+@pytest.fixture
+def rds_manager():
+    rds_manager = MagicMock()
+    rds_manager.remove_archived_rows.side_effect = RuntimeError('delete failed')
+    return rds_manager
+
+
+@patch('pipeline.archive_dataframe', return_value=1)
+@patch('pipeline.make_s3_manager')
+def test_connection_closed_when_archive_fails(mock_s3_manager, mock_archive, rds_manager,
+                                              monkeypatch):
+    monkeypatch.delenv('ARCHIVE_CHUNK_ROWS', raising=False)
+    monkeypatch.delenv('ARCHIVE_SLICE_HOURS', raising=False)
+    with patch('pipeline.make_rds_manager', return_value=rds_manager):
+        with pytest.raises(RuntimeError):
+            run_archive_pipeline()
+    rds_manager.close_connection.assert_called_once()
+
+
+@patch('pipeline.archive_dataframe', return_value=1)
+@patch('pipeline.make_s3_manager')
+def test_connection_closed_when_chunk_fails(mock_s3_manager, mock_archive, rds_manager,
+                                            monkeypatch):
+    monkeypatch.setenv('ARCHIVE_CHUNK_ROWS', '10')
+    rds_manager.iter_data_to_be_archived.return_value = iter([('range', 'chunk')])
+    with patch('pipeline.make_rds_manager', return_value=rds_manager):
+        with pytest.raises(RuntimeError):
+            run_archive_pipeline()
+    rds_manager.close_connection.assert_called_once()
@@ -1,7 +1,11 @@
-from unittest.mock import patch
+from datetime import datetime
+from unittest.mock import MagicMock, PropertyMock, patch
 import pytest
 import pandas as pd
-from rds_manager import RDSManager
+from rds_manager import ArchiveRange, RDSManager
+
+
+RANGE = ArchiveRange(datetime(2025, 4, 1, 6, 30), datetime(2025, 4, 1, 12), 0, 40)
 
 
 class TestRDSManager:
@@ -15,14 +19,114 @@ class TestRDSManager:
     def test_correct_read_sql_input(self, mock_conn_function, mock_read_sql):
         mock_conn_function.return_value = 'FAKE CONN'
         rds_manager = RDSManager()
-        rds_manager.extract_data_to_be_archived()
-        mock_read_sql.assert_called_with(rds_manager.QUERY, 'FAKE CONN')
+        rds_manager.extract_data_to_be_archived(RANGE)
+        mock_read_sql.assert_called_with(rds_manager.RANGE_QUERY, 'FAKE CONN',
+                                         params=(datetime(2025, 4, 1, 6, 30),
+                                                 datetime(2025, 4, 1, 12), 0, 40))
+
+    def test_archive_range_captured(self):
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.fetchone.side_effect = [(40,), (datetime(2025, 4, 1, 6, 30),)]
+        rds_manager = RDSManager(mock_conn)
+        rds_manager.get_archive_cutoff = MagicMock(return_value=datetime(2025, 4, 1, 12))
+        assert rds_manager.get_archive_range() == RANGE
+
+    def test_archive_range_nothing_expired(self):
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.fetchone.side_effect = [(40,), (None,)]
+        rds_manager = RDSManager(mock_conn)
+        rds_manager.get_archive_cutoff = MagicMock(return_value=datetime(2025, 4, 1, 12))
+        assert rds_manager.get_archive_range() is None
+
+    def test_rows_deleted_in_batches(self):
+        mock_conn = MagicMock()
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.fetchone.return_value = (5,)
+        type(mock_cursor).rowcount = PropertyMock(side_effect=[2, 2, 1])
+        rds_manager = RDSManager(mock_conn)
+        assert rds_manager.remove_archived_rows(RANGE, 5, batch_rows=2) == 5
+        delete_calls = mock_cursor.execute.call_args_list[1:]
+        assert len(delete_calls) == 3
+        assert all(call.args == ('DELETE TOP (2) r FROM record AS r WHERE '
+                                 + RDSManager.RANGE_CONDITION + ';', tuple(RANGE))
+                   for call in delete_calls)
+        assert mock_conn.commit.call_count == 3
+
+    def test_changed_range_not_deleted(self):
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.fetchone.return_value = (6,)
+        rds_manager = RDSManager(mock_conn)
+        with pytest.raises(ValueError):
+            rds_manager.remove_archived_rows(RANGE, 5)
+        mock_conn.cursor.return_value.execute.assert_called_once()
+        mock_conn.commit.assert_not_called()
+
+    @patch('rds_manager.RDSManager._initiate_connection')
+    def test_borrowed_connection_not_closed(self, mock_conn_function):
+        mock_conn = MagicMock()
+        rds_manager = RDSManager(mock_conn)
+        rds_manager.close_connection()
+        mock_conn_function.assert_not_called()
+        mock_conn.close.assert_not_called()
+        mock_conn.rollback.assert_called_once()
 
-    @pytest.mark.parametrize("test_in, expected",
-                             [(1, "DELETE FROM record WHERE record_id IN (%s)"),
-                              (2, "DELETE FROM record WHERE record_id IN (%s,%s)"),
-                              (4, "DELETE FROM record WHERE record_id IN (%s,%s,%s,%s)")])
     @patch('rds_manager.RDSManager._initiate_connection')
-    def test_correct_get_delete_query_outputs(self, mock_conn_function, test_in, expected):
+    def test_own_connection_closed(self, mock_conn_function):
         rds_manager = RDSManager()
-        assert rds_manager._get_delete_query(test_in) == expected
+        rds_manager.close_connection()
+        mock_conn_function.return_value.close.assert_called_once()
+
+    @pytest.mark.parametrize("chunking", [{}, {'chunk_rows': 10, 'slice_hours': 1},
+                                          {'chunk_rows': 0}, {'slice_hours': -1}])
+    def test_invalid_chunking(self, chunking):
+        rds_manager = RDSManager(MagicMock())
+        with pytest.raises(ValueError):
+            next(rds_manager.iter_data_to_be_archived(**chunking))
+
+    @patch('pandas.read_sql')
+    def test_row_chunks_follow_last_record_id(self, mock_read_sql):
+        mock_read_sql.side_effect = [pd.DataFrame({'record_id': [1, 2]}),
+                                     pd.DataFrame({'record_id': [5]})]
+        rds_manager = RDSManager(MagicMock())
+        rds_manager.get_archive_range = MagicMock(return_value=RANGE)
+        chunks = list(rds_manager.iter_data_to_be_archived(chunk_rows=2))
+        assert [chunk['record_id'].tolist() for _, chunk in chunks] == [[1, 2], [5]]
+        # Each chunk's range covers its own record ids, so it can be deleted on its own
+        assert [chunk_range for chunk_range, _ in chunks] == [
+            RANGE._replace(last_record_id=2), RANGE._replace(after_record_id=2, last_record_id=5)]
+        # A short chunk is the last, so no further query is made
+        assert [call.kwargs['params'] for call in mock_read_sql.call_args_list] == \
+            [tuple(RANGE), tuple(RANGE._replace(after_record_id=2))]
+        assert 'TOP (2)' in mock_read_sql.call_args.args[0]
+
+    @patch('pandas.read_sql')
+    def test_chunks_fetched_lazily(self, mock_read_sql):
+        mock_read_sql.return_value = pd.DataFrame({'record_id': [1, 2]})
+        rds_manager = RDSManager(MagicMock())
+        rds_manager.get_archive_range = MagicMock(return_value=RANGE)
+        chunks = rds_manager.iter_data_to_be_archived(chunk_rows=2)
+        next(chunks)
+        assert mock_read_sql.call_count == 1
+
+    @patch('pandas.read_sql')
+    def test_time_slices_up_to_cutoff(self, mock_read_sql):
+        mock_read_sql.side_effect = [pd.DataFrame({'record_id': [1]}),
+                                     pd.DataFrame({'record_id': []}),
+                                     pd.DataFrame({'record_id': [2]})]
+        rds_manager = RDSManager(MagicMock())
+        rds_manager.get_archive_range = MagicMock(return_value=RANGE)
+        chunks = list(rds_manager.iter_data_to_be_archived(slice_hours=2.5))
+        # The empty slice is skipped
+        assert [chunk['record_id'].tolist() for _, chunk in chunks] == [[1], [2]]
+        assert [call.kwargs['params'] for call in mock_read_sql.call_args_list] == [
+            (datetime(2025, 4, 1, 6, 30), datetime(2025, 4, 1, 9), 0, 40),
+            (datetime(2025, 4, 1, 9), datetime(2025, 4, 1, 11, 30), 0, 40),
+            (datetime(2025, 4, 1, 11, 30), datetime(2025, 4, 1, 12), 0, 40)]
+        assert chunks[1][0] == RANGE._replace(start=datetime(2025, 4, 1, 11, 30))
+
+    @patch('pandas.read_sql')
+    def test_time_slices_nothing_expired(self, mock_read_sql):
+        rds_manager = RDSManager(MagicMock())
+        rds_manager.get_archive_range = MagicMock(return_value=None)
+        assert list(rds_manager.iter_data_to_be_archived(slice_hours=1)) == []
+        mock_read_sql.assert_not_called()
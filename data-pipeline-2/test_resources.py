@@ -0,0 +1,31 @@
+from unittest.mock import MagicMock, patch
+import pymssql
+from resources import ResourceManager
+
+
+class TestResourceManager:
+
+    @patch('resources.make_connection')
+    def test_rds_connection_reused_when_alive(self, mock_make_connection):
+        resources = ResourceManager()
+        first = resources.get_rds_connection()
+        second = resources.get_rds_connection()
+        assert first is second
+        mock_make_connection.assert_called_once()
+
+    @patch('resources.make_connection')
+    def test_rds_connection_replaced_when_dropped(self, mock_make_connection):
+        dropped, fresh = MagicMock(), MagicMock()
+        dropped.cursor.return_value.__enter__.return_value.execute.side_effect = \
+            pymssql.OperationalError('connection dropped')
+        mock_make_connection.side_effect = [dropped, fresh]
+        resources = ResourceManager()
+        assert resources.get_rds_connection() is dropped
+        assert resources.get_rds_connection() is fresh
+        dropped.close.assert_called_once()
+
+    @patch('resources.make_s3_client')
+    def test_s3_client_made_once(self, mock_make_client):
+        resources = ResourceManager()
+        assert resources.get_s3_client() is resources.get_s3_client()
+        mock_make_client.assert_called_once()
@@ -4,7 +4,7 @@ from zoneinfo import ZoneInfo
 import pytest
 import pandas as pd
 from freezegun import freeze_time
-from s3_manager import S3Manager
+from s3_manager import LocalDirectoryManager, S3Manager
 
 
 class TestS3Manager:
@@ -18,10 +18,44 @@ class TestS3Manager:
         # Assertions
         mock_client.assert_called_once()
         assert s3_manager.client_s3 == 'FAKE CLIENT'
-        assert s3_manager.key_s3 == '2025/04/01/17.csv'
+        assert s3_manager.run_name == 'archive-20250402T174746'
 
     @freeze_time(datetime(year=2025, month=3, day=2, hour=20, minute=47, second=46).astimezone(ZoneInfo("Europe/London")))
     @patch('s3_manager.S3Manager._get_s3_client')
     def test_get_bucket_key(self, mock_client):
         s3_manager = S3Manager()
-        assert s3_manager.key_s3 == '2025/03/01/20.csv'
+        assert s3_manager.get_key(datetime(2025, 3, 1, 20)) == \
+            'year=2025/month=03/day=01/hour=20/archive-20250302T204746.csv'
+
+    @freeze_time(datetime(year=2025, month=3, day=2, hour=20, minute=47, second=46).astimezone(ZoneInfo("Europe/London")))
+    @patch('s3_manager.S3Manager._get_s3_client')
+    def test_get_part_key_in_plant_bucket(self, mock_client):
+        s3_manager = S3Manager()
+        assert s3_manager.get_key(datetime(2025, 3, 1, 9), 'parquet', part=3, plant_bucket=2) == \
+            'year=2025/month=03/day=01/hour=09/plant_bucket=2/archive-20250302T204746-0003.parquet'
+
+    @patch('s3_manager.S3Manager._get_s3_client')
+    def test_given_client_reused(self, mock_client):
+        s3_manager = S3Manager('SHARED CLIENT')
+        mock_client.assert_not_called()
+        assert s3_manager.client_s3 == 'SHARED CLIENT'
+
+    @freeze_time(datetime(year=2025, month=3, day=2, hour=20, minute=47, second=46).astimezone(ZoneInfo("Europe/London")))
+    @patch('s3_manager.S3Manager._get_s3_client')
+    def test_archive_streamed_to_key(self, mock_client, monkeypatch):
+        monkeypatch.setenv('S3_BUCKET', 'bucket')
+        s3_manager = S3Manager()
+        with s3_manager.open_archive(datetime(2025, 3, 1, 20), 'parquet', 2) as sink:
+            sink.write(b'PAR1')
+        mock_client.return_value.put_object.assert_called_once_with(
+            Bucket='bucket', Key='year=2025/month=03/day=01/hour=20/archive-20250302T204746-0002.parquet',
+            Body=b'PAR1')
+
+    @freeze_time(datetime(year=2025, month=3, day=2, hour=20, minute=47, second=46).astimezone(ZoneInfo("Europe/London")))
+    def test_local_directory_archive(self, tmp_path):
+        s3_manager = LocalDirectoryManager(str(tmp_path))
+        assert s3_manager.client_s3 is None
+        with s3_manager.open_archive(datetime(2025, 3, 1, 20), plant_bucket=1) as sink:
+            sink.write(b'plant_number')
+        path = tmp_path / 'year=2025/month=03/day=01/hour=20/plant_bucket=1/archive-20250302T204746.csv'
+        assert path.read_bytes() == b'plant_number'
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlite_backend import SQLiteRDSManager, make_sqlite_connection, translate_schema
+
+
+@pytest.fixture
+def connection():
+    connection = make_sqlite_connection()
+    connection.executescript('''
+        INSERT INTO country (country_name, country_capital, continent_id)
+            VALUES ('Germany', 'Berlin', 4);
+        INSERT INTO city (city_name, city_latitude, city_longitude, country_id)
+            VALUES ('Oschatz', 51.30001, 13.10984, 1);
+        INSERT INTO botanist (botanist_name, botanist_email, botanist_phone)
+            VALUES ('Gertrude Jekyll', 'gertrude.jekyll@lnhm.co.uk', '001-481-273-3691x127');
+        INSERT INTO plant_type (plant_type_name) VALUES ('Palm Tree');
+        INSERT INTO plant (plant_type_id, plant_number, botanist_id, city_id)
+            VALUES (1, 8, 1, 1);
+    ''')
+    now = datetime.now()
+    connection.executemany(
+        '''INSERT INTO record (record_soil_moisture, record_temperature, record_timestamp,
+                               plant_id) VALUES (?, ?, ?, 1);''',
+        [(30.5, 11.2, now - timedelta(hours=30)),
+         (31.5, 11.4, now - timedelta(hours=25)),
+         (32.5, 11.6, now - timedelta(hours=1))])
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def test_translate_schema():
+    assert translate_schema("record_id SMALLINT IDENTITY(1,1) PRIMARY KEY,") == \
+        "record_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+
+
+def test_translate_schema_indexes():
+    assert translate_schema(
+        "record_id BIGINT IDENTITY(1,1) CONSTRAINT pk_record PRIMARY KEY NONCLUSTERED,") == \
+        "record_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    assert translate_schema("CREATE CLUSTERED INDEX ix ON record (record_timestamp);") == \
+        "CREATE INDEX ix ON record (record_timestamp);"
+    assert translate_schema(
+        "CREATE NONCLUSTERED INDEX ix ON record (plant_id) INCLUDE (record_timestamp);") == \
+        "CREATE INDEX ix ON record (plant_id);"
+    assert translate_schema("CREATE UNIQUE NONCLUSTERED INDEX ux ON plant (plant_number);") == \
+        "CREATE UNIQUE INDEX ux ON plant (plant_number);"
+
+
+def test_extract_expired_rows(connection):
+    rds_manager = SQLiteRDSManager(connection)
+    df = rds_manager.extract_data_to_be_archived(rds_manager.get_archive_range())
+    assert df['record_id'].tolist() == [1, 2]
+    assert df['continent_name'].tolist() == ['Europe', 'Europe']
+    assert df['record_timestamp'].iloc[0] < datetime.now() - timedelta(hours=24)
+
+
+def test_archive_range(connection):
+    archive_range = SQLiteRDSManager(connection).get_archive_range()
+    assert archive_range.after_record_id == 0
+    assert archive_range.last_record_id == 3
+    assert archive_range.start < archive_range.end < datetime.now() - timedelta(hours=23)
+
+
+def test_extract_in_row_chunks(connection):
+    rds_manager = SQLiteRDSManager(connection)
+    chunks = list(rds_manager.iter_data_to_be_archived(chunk_rows=1))
+    assert [chunk['record_id'].tolist() for _, chunk in chunks] == [[1], [2]]
+    assert list(chunks[0][1].columns) == list(
+        rds_manager.extract_data_to_be_archived(rds_manager.get_archive_range()).columns)
+
+
+def test_extract_in_time_slices(connection):
+    chunks = list(SQLiteRDSManager(connection).iter_data_to_be_archived(slice_hours=2))
+    # The first slice holds the oldest record, the next slices are empty until the second
+    assert [chunk['record_id'].tolist() for _, chunk in chunks] == [[1], [2]]
+
+
+@pytest.mark.parametrize('chunking', [{'chunk_rows': 1}, {'slice_hours': 2}])
+def test_chunks_deleted_as_they_are_archived(connection, chunking):
+    rds_manager = SQLiteRDSManager(connection)
+    for chunk_range, chunk in rds_manager.iter_data_to_be_archived(**chunking):
+        assert rds_manager.remove_archived_rows(chunk_range, len(chunk)) == len(chunk)
+    assert connection.execute('SELECT record_id FROM record;').fetchall() == [(3,)]
+
+
+def test_remove_archived_rows_in_batches(connection):
+    rds_manager = SQLiteRDSManager(connection)
+    archive_range = rds_manager.get_archive_range()
+    assert rds_manager.remove_archived_rows(archive_range, 2, batch_rows=1) == 2
+    assert connection.execute('SELECT record_id FROM record;').fetchall() == [(3,)]
+
+
+def test_rows_inserted_after_range_kept(connection):
+    rds_manager = SQLiteRDSManager(connection)
+    archive_range = rds_manager.get_archive_range()
+    archived = rds_manager.extract_data_to_be_archived(archive_range)
+    # A late row with an old timestamp, such as a replayed batch, is left for the next run
+    connection.execute(
+        """INSERT INTO record (record_soil_moisture, record_temperature, record_timestamp,
+                               plant_id) VALUES (33.5, 11.8, ?, 1);""",
+        (datetime.now() - timedelta(hours=28),))
+    rds_manager.remove_archived_rows(archive_range, len(archived))
+    assert connection.execute('SELECT record_id FROM record;').fetchall() == [(3,), (4,)]
+
+
+def test_changed_range_not_deleted(connection):
+    rds_manager = SQLiteRDSManager(connection)
+    archive_range = rds_manager.get_archive_range()
+    with pytest.raises(ValueError):
+        rds_manager.remove_archived_rows(archive_range, 1)
+    assert connection.execute('SELECT COUNT(*) FROM record;').fetchone() == (3,)
+
+
+def test_borrowed_connection_left_open(connection):
+    SQLiteRDSManager(connection).close_connection()
+    assert connection.execute('SELECT COUNT(*) FROM record;').fetchone() == (3,)
+
+
+def test_own_connection_from_path(tmp_path):
+    rds_manager = SQLiteRDSManager(path=str(tmp_path / 'plants.db'))
+    assert rds_manager.get_archive_range() is None
+    rds_manager.close_connection()